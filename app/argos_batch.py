@@ -0,0 +1,119 @@
+"""
+Batched decoding for an Argos package translation.
+
+Argos's translate() runs one CTranslate2 call per paragraph. ArgosBatcher
+runs any number of texts through the model in one translate_batch() call
+(CTranslate2 splits it into `max_batch_size` sentences at a time):
+
+  1. each text is split into paragraphs (ITranslation.split_into_paragraphs)
+     and each paragraph is handed to argostranslate's own
+     apply_packaged_translation() with a recording stand-in for the model,
+     so Argos does the sentence splitting and tokenization exactly as in
+     translate(); the recorder keeps the tokens and call options and stops
+     Argos before it decodes;
+  2. all recorded sentences go through the real model in one call;
+  3. each paragraph's results are detokenized with the package tokenizer
+     and joined the way translate() joins them.
+
+Steps 1 and 3 depend on how Argos works inside, so make_batcher() compares
+the batched result with translate() on a probe text first and raises if
+they differ; callers then fall back to translate().
+"""
+
+
+def _argos_translate():
+    from argostranslate import translate
+    return translate
+
+
+# Several sentences and paragraphs, so splitting, batching and joining are all exercised
+PROBE = "Good morning. How are you today?\nI hope the train is on time! See you at the office."
+
+
+class _Recorded(Exception):
+    """Raised by _RecordingModel to stop Argos once the model input is known."""
+
+
+class _RecordingModel:
+    def __init__(self):
+        self.tokens = None
+        self.target_prefix = None
+        self.options = None
+
+    def translate_batch(self, tokens, target_prefix=None, **options):
+        self.tokens = list(tokens)
+        self.target_prefix = target_prefix
+        self.options = options
+        raise _Recorded()
+
+
+class ArgosBatcher:
+    def __init__(self, package_translation):
+        self._T = _argos_translate()
+        self._package_translation = package_translation
+        self._pkg = package_translation.pkg
+
+    def translate(self, texts, max_batch_size=32):
+        """Argos translations of `texts` (no idiom handling), one model call for all of them."""
+        T = self._T
+        model = self._package_translation.translator
+        if model is None:
+            raise RuntimeError("Argos model not loaded; translate() once first")
+
+        # 1) Split and tokenize every paragraph the way Argos does
+        paragraphs = []   # (text index, first sentence, end)
+        tokens, prefixes, options = [], [], {}
+        for i, text in enumerate(texts):
+            for paragraph in T.ITranslation.split_into_paragraphs(text):
+                recorder = _RecordingModel()
+                try:
+                    T.apply_packaged_translation(self._pkg, paragraph, recorder, 1)
+                except _Recorded:
+                    pass
+                if recorder.tokens is None:
+                    raise RuntimeError("Argos did not call the model for a paragraph")
+                start = len(tokens)
+                tokens += recorder.tokens
+                prefixes += recorder.target_prefix or [None] * len(recorder.tokens)
+                options = recorder.options
+                paragraphs.append((i, start, len(tokens)))
+
+        # 2) One model call
+        results = []
+        if tokens:
+            has_prefix = any(p is not None for p in prefixes)
+            results = model.translate_batch(tokens, target_prefix=prefixes if has_prefix else None,
+                                            **{**options, "max_batch_size": max(1, int(max_batch_size))})
+
+        # 3) Detokenize per paragraph and join paragraphs like PackageTranslation.hypotheses()
+        parts = [[] for _ in texts]
+        for i, start, end in paragraphs:
+            translated = []
+            for result, prefix in zip(results[start:end], prefixes[start:end]):
+                hypothesis = list(result.hypotheses[0])
+                if prefix and hypothesis[:len(prefix)] == list(prefix):
+                    hypothesis = hypothesis[len(prefix):]
+                translated += hypothesis
+            value = self._pkg.tokenizer.decode(translated)
+            parts[i].append(value[1:] if value.startswith(" ") else value)
+        return [T.ITranslation.combine_paragraphs(p).lstrip("\n") for p in parts]
+
+
+def make_batcher(translation, max_batch_size=32):
+    """
+    ArgosBatcher for an Argos translation object (as returned by
+    Language.get_translation), or None for pivot and identity translations,
+    which have no single model to batch on. Raises RuntimeError if the
+    batched probe doesn't match translate().
+    """
+    T = _argos_translate()
+    package_translation = getattr(translation, "underlying", translation)
+    if not isinstance(package_translation, T.PackageTranslation):
+        return None
+    # translate() also loads the model the batcher uses
+    expected = translation.translate(PROBE)
+    batcher = ArgosBatcher(package_translation)
+    got = batcher.translate([PROBE], max_batch_size)[0]
+    if got != expected:
+        raise RuntimeError(f"batched probe differs from translate(): {got!r} != {expected!r}")
+    return batcher
@@ -1,54 +1,257 @@
-import numpy as np, math, time
-from faster_whisper import WhisperModel
+import numpy as np, math, threading, time
+
+
+# Process-wide model registry: (model_size, device, compute_type, cpu_threads) -> WhisperModel
+_models = {}
+_model_locks = {}
+_models_lock = threading.Lock()
+
+
+def default_compute_type(device):
+    return "float32" if device == "cuda" else "int8"
+
+
+def warm_up(model, sample_rate=16000):
+    """One short decode of silence so the first real phrase doesn't pay cold-start cost."""
+    segments, _ = model.transcribe(np.zeros(sample_rate, dtype="float32"), beam_size=1, vad_filter=False)
+    for _ in segments:
+        pass
+
+
+def get_model(model_size, device, compute_type=None, warm=True, on_progress=None, cpu_threads=0):
+    """
+    Return the shared WhisperModel for this key, loading it on first use.
+    Concurrent callers for the same key wait for one load instead of loading twice.
+    `on_progress(text, loading)` is told about the load and warm-up.
+    `cpu_threads` is CTranslate2's intra-op thread count (0 = its default).
+    """
+    if compute_type is None:
+        compute_type = default_compute_type(device)
+    key = (model_size, device, compute_type, cpu_threads)
+
+    with _models_lock:
+        model = _models.get(key)
+        if model is not None:
+            return model
+        key_lock = _model_locks.setdefault(key, threading.Lock())
+
+    with key_lock:
+        model = _models.get(key)
+        if model is not None:
+            return model
+
+        t0 = time.time()
+        if on_progress:
+            on_progress(f"Loading ASR model {model_size} ({device}, {compute_type})…", True)
+        from faster_whisper import WhisperModel  # heavy (ctranslate2, tokenizers); imported on first load
+        model = WhisperModel(model_size, device=device, compute_type=compute_type, cpu_threads=cpu_threads)
+        if warm:
+            if on_progress:
+                on_progress(f"Warming up ASR model {model_size}…", True)
+            warm_up(model)
+        if on_progress:
+            on_progress(f"ASR model {model_size} ready ({time.time() - t0:.1f}s)", False)
+
+        with _models_lock:
+            _models[key] = model
+        return model
+
+
+def loaded_models():
+    with _models_lock:
+        return list(_models.keys())
+
 
 class ASR:
-    def __init__(self, model_size, device, compute_type=None, language=None, beam_size=5, temperature=0.0):
-        if compute_type is None:
-            compute_type = "float32" if device == "cuda" else "int8"
-        self.model = WhisperModel(model_size, device=device, compute_type=compute_type)
+    def __init__(self, model_size, device, compute_type=None, language=None, beam_size=5, temperature=0.0,
+                 warm=True, on_progress=None, cpu_threads=0):
+        # Shared model: only the decode options below are per session
+        self.model = get_model(model_size, device, compute_type, warm=warm, on_progress=on_progress,
+                               cpu_threads=cpu_threads)
         self.language = language
         self.beam_size = beam_size
         self.temperature = temperature
 
-    def transcribe_np(self, pcm: np.ndarray):
-        """pcm mono float32 [-1,1]; returns dict with text, confidence, segments, timings"""
-        t0 = time.time()
+    def detect_language(self, pcm: np.ndarray, prefix_sec=2.0, sample_rate=16000):
+        """
+        {language: probability} for the first `prefix_sec` of the audio. Only
+        Whisper's language-ID step runs (one encoder pass), nothing is decoded.
+        """
+        prefix = np.asarray(pcm, dtype="float32").reshape(-1)[:int(prefix_sec * sample_rate)]
+        # transcribe() detects the language up front; its segments are lazy and never iterated here
+        _, info = self.model.transcribe(prefix, language=None, beam_size=1, vad_filter=False)
+        probs = getattr(info, "all_language_probs", None)
+        if probs:
+            return dict(probs)
+        return {info.language: getattr(info, "language_probability", 1.0)}
+
+    def transcribe_iter(self, pcm: np.ndarray, word_timestamps=False, language=None, **options):
+        """
+        Yield each segment as soon as Faster-Whisper decodes it:
+        {"start", "end", "text", "avg_logprob", "no_speech_prob", "words", "language"}.
+        `words` is a list of {"start", "end", "word"} with word_timestamps, else None.
+        `language` overrides the session's language for this call.
+        Extra options go straight to WhisperModel.transcribe.
+        """
+        segments, _ = self._transcribe(pcm, word_timestamps, language, **options)
+        yield from segments
 
+    def _transcribe(self, pcm, word_timestamps=False, language=None, **options):
+        """(lazy segment dicts, detected language) for transcribe_iter and transcribe_np."""
         # make sure it’s 1D float32 mono
         pcm_fixed = np.asarray(pcm, dtype="float32").reshape(-1)
 
+        options.setdefault("vad_filter", True)
         # call Faster-Whisper directly on the NumPy audio (no temp file, no soundfile)
         segments, info = self.model.transcribe(
             pcm_fixed,
-            language=self.language,
+            language=language or self.language,
             beam_size=self.beam_size,
             temperature=self.temperature,
-            vad_filter=True,
+            word_timestamps=word_timestamps,
+            **options,
         )
-        text = "".join([s.text for s in segments]).strip()
-        # Confidence proxy: average exp(avg_logprob) across segments (0..1)
-        probs = []
-        seg_list = []
+        language = getattr(info, "language", None)
+        return self._segment_dicts(segments, word_timestamps, language), language
+
+    @staticmethod
+    def _segment_dicts(segments, word_timestamps, language):
+        # segments is lazy: decoding happens as we iterate
         for s in segments:
-            seg_list.append({
+            words = None
+            if word_timestamps and getattr(s, "words", None):
+                words = [{"start": w.start, "end": w.end, "word": w.word} for w in s.words]
+            yield {
                 "start": s.start, "end": s.end, "text": s.text,
-                "avg_logprob": getattr(s, "avg_logprob", None)
-            })
-            if getattr(s, "avg_logprob", None) is not None:
-                probs.append(math.exp(s.avg_logprob))
-        # Safely handle confidence if avg_logprob is missing
-        if probs:
-            conf = float(sum(probs) / len(probs))
-        else:
-            # Fallback: use 1.0 or 1.0 - no_speech_prob if available
-            no_sp = getattr(info, "no_speech_prob", 0.0)
-            conf = float(1.0 - no_sp) if no_sp else 1.0
+                "avg_logprob": getattr(s, "avg_logprob", None),
+                "no_speech_prob": getattr(s, "no_speech_prob", None),
+                "words": words,
+                "language": language,
+            }
 
+    def transcribe_np(self, pcm: np.ndarray, language=None):
+        """pcm mono float32 [-1,1]; returns dict with text, confidence, segments, timings"""
+        t0 = time.time()
+        segments, detected = self._transcribe(pcm, language=language)
+        seg_list = list(segments)
         return {
-            "text": text,
-            "confidence": conf,
+            "text": "".join(s["text"] for s in seg_list).strip(),
+            "confidence": segments_confidence(seg_list),
             "segments": seg_list,
-            "language": getattr(info, "language", None),
+            "language": detected,
             "elapsed_sec": time.time() - t0
         }
 
+    def stream(self, sample_rate=16000, window_sec=10.0, interval_sec=1.0, language=None):
+        """Incremental transcriber for one growing phrase (see ASRStream)."""
+        return ASRStream(self, sample_rate=sample_rate, window_sec=window_sec, interval_sec=interval_sec,
+                         language=language)
+
+
+def segments_confidence(segments) -> float:
+    """Confidence proxy: average exp(avg_logprob) across segments (0..1)."""
+    probs = [math.exp(s["avg_logprob"]) for s in segments if s.get("avg_logprob") is not None]
+    if probs:
+        return float(sum(probs) / len(probs))
+    # Fallback: 1.0 - no_speech_prob if available, else 1.0
+    no_sp = [s["no_speech_prob"] for s in segments if s.get("no_speech_prob") is not None]
+    return float(1.0 - sum(no_sp) / len(no_sp)) if no_sp else 1.0
+
+
+def _norm_word(w: str) -> str:
+    return w.strip().lower().strip(".,!?;:\"'¿¡…")
+
+
+def strip_seam_overlap(previous: str, text: str, max_words: int = 4) -> str:
+    """Drop words at the start of `text` that repeat the end of `previous` (audio overlap at a forced cut)."""
+    prev, cur = previous.split(), text.split()
+    for n in range(min(max_words, len(prev), len(cur)), 0, -1):
+        if [_norm_word(w) for w in prev[-n:]] == [_norm_word(w) for w in cur[:n]]:
+            return " ".join(cur[n:])
+    return text
+
+
+class ASRStream:
+    """
+    Streaming transcription of one phrase while it is still being spoken.
+
+    update(pcm) is called with the phrase audio so far. Every `interval_sec`
+    of new audio it re-decodes a window of at most `window_sec` (starting
+    at the last committed word once the phrase outgrows the window, with the
+    committed text as prompt) and applies local agreement: words that two
+    consecutive decodes agree on are committed and never change again; the
+    rest is a tentative tail. finish(pcm) decodes whatever is not committed
+    yet and returns the same dict as ASR.transcribe_np.
+    """
+
+    def __init__(self, asr, sample_rate=16000, window_sec=10.0, interval_sec=1.0, language=None):
+        self.asr = asr
+        self.language = language or asr.language
+        self.sample_rate = sample_rate
+        self.window = int(window_sec * sample_rate)
+        self.interval = int(interval_sec * sample_rate)
+        self.committed = []      # [(start_sec, end_sec, word)]
+        self._previous = []      # words of the last decode past the committed ones
+        self._decoded_len = 0    # phrase length (samples) at the last decode
+        self._offset = 0         # window start (samples into the phrase)
+
+    @property
+    def committed_text(self) -> str:
+        return "".join(w for _, _, w in self.committed).strip()
+
+    def _decode(self, pcm):
+        """Decode the window; returns (words past the committed ones, segments)."""
+        end = len(pcm)
+        if end - self._offset > self.window and self.committed:
+            # Slide: drop audio that is already committed
+            self._offset = max(self._offset, int(self.committed[-1][1] * self.sample_rate))
+        window = np.asarray(pcm[self._offset:end], dtype="float32").reshape(-1)
+
+        prompt = self.committed_text[-200:] or None
+        segments = list(self.asr.transcribe_iter(window, word_timestamps=True, language=self.language,
+                                                 vad_filter=False, initial_prompt=prompt, condition_on_previous_text=False))
+
+        base = self._offset / self.sample_rate
+        last_end = self.committed[-1][1] if self.committed else 0.0
+        words = []
+        for s in segments:
+            for w in (s["words"] or []):
+                # Words ending before the last committed one were already committed
+                if w["end"] + base > last_end + 0.05:
+                    words.append((w["start"] + base, w["end"] + base, w["word"]))
+        self._decoded_len = end
+        return words, segments
+
+    def update(self, pcm):
+        """Returns {"committed", "tentative"} after a decode, or None if it is not time yet."""
+        if len(pcm) - self._decoded_len < self.interval:
+            return None
+        words, _ = self._decode(pcm)
+
+        # Local agreement: commit the common prefix of this decode and the previous one
+        n = 0
+        while (n < len(words) and n < len(self._previous)
+               and _norm_word(words[n][2]) == _norm_word(self._previous[n][2])):
+            n += 1
+        self.committed.extend(words[:n])
+        self._previous = words[n:]
+        return {
+            "committed": self.committed_text,
+            "tentative": "".join(w for _, _, w in self._previous).strip(),
+        }
+
+    def finish(self, pcm):
+        """Final transcript of the whole phrase."""
+        if not self.committed:
+            return self.asr.transcribe_np(pcm, language=self.language)
+
+        t0 = time.time()
+        words, segments = self._decode(pcm)
+        self.committed.extend(words)
+        return {
+            "text": self.committed_text,
+            "confidence": segments_confidence(segments),
+            "segments": segments,
+            "language": segments[0]["language"] if segments else None,
+            "elapsed_sec": time.time() - t0,
+        }
@@ -0,0 +1,125 @@
+"""
+ASR in worker processes, for CPU hosts with several independent streams
+(server clients, batch files, several mics): one WhisperModel decodes one
+phrase at a time and, in-process, competes with capture and Tk for the GIL.
+
+Each of the `workers` processes loads its own model (with asr.cpu_threads
+CTranslate2 threads) in the pool initializer. A phrase's PCM is copied once
+into a multiprocessing.shared_memory block and the worker decodes straight
+from it; only the block's name and length are pickled. Results are the dict
+ASR.transcribe_np returns.
+
+    pool = ASRPool(cfg["asr"], workers=4).start()
+    result = pool.submit(pcm, language="en").result()   # {"text", "confidence", "segments", ...}
+    pool.close()
+
+workers × cpu_threads should not exceed the physical cores.
+"""
+import functools
+import os
+import signal
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+
+# Per-process state, set up by _init_worker
+_worker = {}
+
+
+def make_asr(asr_cfg):
+    """The profile's ASR; the default model factory for worker processes."""
+    from .asr import ASR
+    return ASR(
+        model_size=asr_cfg["model_size"],
+        device=asr_cfg["device"],
+        compute_type=asr_cfg.get("compute_type"),
+        language=asr_cfg.get("language"),
+        beam_size=asr_cfg["beam_size"],
+        temperature=asr_cfg["temperature"],
+        warm=asr_cfg.get("warm_up", True),
+        cpu_threads=asr_cfg.get("cpu_threads", 0),
+    )
+
+
+def _init_worker(factory):
+    # Ctrl+C reaches the whole process group; the parent shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker["asr"] = factory()
+
+
+def _ready():
+    return os.getpid()
+
+
+def _run(method, name, length, kwargs):
+    """Call ASR.<method> on the audio in shared memory block `name`."""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        pcm = np.ndarray((length,), dtype=np.float32, buffer=shm.buf)
+        try:
+            return getattr(_worker["asr"], method)(pcm, **kwargs)
+        finally:
+            del pcm   # the block can't be closed while a view is alive
+    finally:
+        shm.close()
+
+
+def _release(shm):
+    shm.close()
+    shm.unlink()
+
+
+class ASRPool:
+    """
+    Drop-in for ASR.transcribe_np / detect_language across worker processes.
+    `factory` builds each worker's ASR (picklable, e.g. a functools.partial);
+    it defaults to the profile's model from `asr_cfg`.
+    """
+
+    def __init__(self, asr_cfg=None, workers=2, factory=None):
+        self.workers = max(1, int(workers))
+        self.language = (asr_cfg or {}).get("language")
+        factory = factory or functools.partial(make_asr, asr_cfg)
+        # spawn: workers start clean instead of forking a parent that may hold model threads
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=get_context("spawn"),
+                                         initializer=_init_worker, initargs=(factory,))
+
+    def start(self):
+        """Start every worker and wait until their models are loaded (otherwise the first phrases pay for it)."""
+        wait([self._pool.submit(_ready) for _ in range(self.workers)])
+        return self
+
+    def submit(self, pcm, language=None):
+        """Future of transcribe_np(pcm) in a worker."""
+        return self._call("transcribe_np", pcm, language=language or self.language)
+
+    def transcribe_np(self, pcm, language=None):
+        return self.submit(pcm, language).result()
+
+    def detect_language(self, pcm, prefix_sec=2.0, sample_rate=16000):
+        # Only the prefix is needed, so only the prefix is shared
+        prefix = np.asarray(pcm, dtype=np.float32).reshape(-1)[:int(prefix_sec * sample_rate)]
+        return self._call("detect_language", prefix, prefix_sec=prefix_sec, sample_rate=sample_rate).result()
+
+    def _call(self, method, pcm, **kwargs):
+        pcm = np.asarray(pcm, dtype=np.float32).reshape(-1)
+        shm = shared_memory.SharedMemory(create=True, size=max(pcm.nbytes, 1))
+        np.ndarray(pcm.shape, dtype=np.float32, buffer=shm.buf)[:] = pcm
+        try:
+            future = self._pool.submit(_run, method, shm.name, len(pcm), kwargs)
+        except Exception:
+            _release(shm)
+            raise
+        # The parent owns the block: it goes away once the worker is done with it
+        future.add_done_callback(lambda _: _release(shm))
+        return future
+
+    def close(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -1,11 +1,24 @@
-import queue, sys
-import sounddevice as sd
+from .ring_buffer import SPSCRingBuffer
 
 class AudioIn:
-    def __init__(self, samplerate, block_seconds, input_index=None):
-        self.q = queue.Queue()
+    """
+    Microphone capture. The PortAudio callback only copies into a
+    preallocated SPSCRingBuffer (no per-callback arrays or queue items), so
+    it keeps up even while ASR holds the GIL; get_block() returns
+    `block_seconds` of audio as a (blocksize, 1) view that stays valid until
+    the next call.
+
+    `overruns` counts callbacks PortAudio flagged (input overflow: audio lost
+    before it reached us); the ring's dropped_* counters count audio dropped
+    because the consumer fell more than `buffer_seconds` behind. See stats().
+    """
+
+    def __init__(self, samplerate, block_seconds, input_index=None, buffer_seconds=2.0):
+        import sounddevice as sd  # PortAudio is only loaded when capture starts
         self.samplerate = samplerate
         self.blocksize = int(samplerate * block_seconds)
+        self.ring = SPSCRingBuffer(max(int(samplerate * buffer_seconds), 2 * self.blocksize), self.blocksize)
+        self.overruns = 0
         self.stream = sd.InputStream(
             channels=1, samplerate=samplerate, dtype="float32",
             blocksize=self.blocksize, callback=self._cb,
@@ -13,9 +26,10 @@ class AudioIn:
         )
 
     def _cb(self, indata, frames, time_info, status):
+        # Runs on the PortAudio thread: no printing, no new arrays
         if status:
-            print(status, file=sys.stderr)
-        self.q.put(indata.copy().reshape(-1, 1))
+            self.overruns += 1
+        self.ring.write(indata[:frames, 0])
 
     def __enter__(self):
         self.stream.__enter__()
@@ -25,7 +39,26 @@ class AudioIn:
         self.stream.__exit__(exc_type, exc, tb)
 
     def get_block(self):
-        return self.q.get()
+        return self.ring.read_frame().reshape(-1, 1)
+
+    def stats(self):
+        return {
+            "overruns": self.overruns,
+            "dropped_blocks": self.ring.dropped_writes,
+            "dropped_sec": self.ring.dropped_samples / self.samplerate,
+        }
 
 def list_devices():
+    import sounddevice as sd
     return sd.query_devices()
+
+def read_audio(path, samplerate):
+    """Read an audio file as mono float32 at `samplerate` (linear resampling if needed)."""
+    import numpy as np
+    import soundfile as sf
+    audio, file_rate = sf.read(path, dtype="float32", always_2d=True)
+    audio = audio.mean(axis=1)
+    if file_rate != samplerate and len(audio):
+        n = int(round(len(audio) * samplerate / file_rate))
+        audio = np.interp(np.linspace(0, len(audio) - 1, n), np.arange(len(audio)), audio).astype(np.float32)
+    return audio
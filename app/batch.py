@@ -0,0 +1,213 @@
+"""
+Offline batch mode: ASR → translation → optional TTS-to-file over recorded audio.
+
+    python -m app.pipeline --input recordings/ --output results.jsonl --workers 2
+
+Files are spread over a process pool; every worker loads its models once in
+the pool initializer. Each finished file is appended to the JSONL output
+straight away, so an interrupted run resumes by skipping files already in
+the output (files that failed are retried).
+"""
+import json
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+AUDIO_EXTENSIONS = (".wav", ".flac", ".ogg", ".mp3")
+
+# Per-process state, set up by _init_worker
+_worker = {}
+
+
+def find_inputs(path):
+    """Audio files under `path` (a file or a directory, not recursive), sorted."""
+    if os.path.isfile(path):
+        return [os.path.abspath(path)]
+    return sorted(
+        os.path.abspath(os.path.join(path, name))
+        for name in os.listdir(path)
+        if name.lower().endswith(AUDIO_EXTENSIONS)
+    )
+
+
+def load_done(output_path):
+    """Files already processed successfully according to an existing JSONL output."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by the interruption
+            if "error" not in record:
+                done.add(record["file"])
+    return done
+
+
+def _init_worker(cfg, tts_dir):
+    from .asr import ASR
+    from .endpointer import make_endpointer
+    from .translate import configure_cache, get_translator
+    from . import tts as tts_mod
+
+    # Ctrl+C reaches the whole process group; the parent shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asr_cfg = cfg["asr"]
+    _worker["cfg"] = cfg
+    _worker["asr"] = ASR(
+        model_size=asr_cfg["model_size"],
+        device=asr_cfg["device"],
+        compute_type=asr_cfg.get("compute_type"),
+        language=asr_cfg["language"],
+        beam_size=asr_cfg["beam_size"],
+        temperature=asr_cfg["temperature"],
+        warm=False,
+        cpu_threads=asr_cfg.get("cpu_threads", 0),
+    )
+    # Memory-only cache: several processes must not share one SQLite file
+    configure_cache(max_entries=cfg["translate"].get("cache", {}).get("max_entries", 512))
+    _worker["translator"] = get_translator(cfg["translate"]["from_lang"], cfg["translate"]["to_lang"])
+    _worker["endpointer"] = make_endpointer(cfg["vad"], cfg["audio"]["sample_rate"])
+
+    _worker["tts_dir"] = tts_dir
+    if tts_dir:
+        _, voice_path, voice_config = tts_mod.resolve_voice(cfg.get("tts", {}), cfg["translate"]["to_lang"])
+        _worker["tts"] = (tts_mod.TTSEngine(max_voices=1), voice_path, voice_config)
+
+
+def _phrases(audio, sample_rate):
+    """Split a recording into phrases with the live pipeline's endpointer."""
+    endpointer = _worker["endpointer"]
+    endpointer.reset()
+    block = sample_rate  # 1 s blocks; boundaries are still frame-accurate
+    phrases = []
+    for i in range(0, len(audio), block):
+        phrases += [e for e in endpointer.push(audio[i:i + block]) if e["type"] == "phrase"]
+    last = endpointer.flush()
+    if last is not None:
+        phrases.append(last)
+    return [p for p in phrases if len(p["pcm"])]
+
+
+def _process_file(path):
+    import numpy as np
+    import soundfile as sf
+    from .audio_io import read_audio
+
+    cfg = _worker["cfg"]
+    sr = cfg["audio"]["sample_rate"]
+    t_start = time.perf_counter()
+    try:
+        audio = read_audio(path, sr)
+        duration = len(audio) / sr
+
+        t0 = time.perf_counter()
+        phrases = []
+        for p in _phrases(audio, sr):
+            out = _worker["asr"].transcribe_np(p["pcm"])
+            if out["text"]:
+                phrases.append({"start": p["start"] / sr, "end": p["end"] / sr,
+                                "text": out["text"], "confidence": out["confidence"]})
+        asr_sec = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        translations = _worker["translator"].translate_batch(
+            [p["text"] for p in phrases], max_batch_size=cfg["translate"].get("max_batch_size", 16))
+        for p, translated in zip(phrases, translations):
+            p["translation"] = translated
+        mt_sec = time.perf_counter() - t0
+
+        tts_sec, tts_path = 0.0, None
+        if _worker["tts_dir"] and phrases:
+            t0 = time.perf_counter()
+            engine, voice_path, voice_config = _worker["tts"]
+            chunks = [pcm for p in phrases for pcm in engine.synthesize(p["translation"], voice_path, voice_config)]
+            if chunks:
+                tts_path = os.path.join(_worker["tts_dir"], os.path.splitext(os.path.basename(path))[0] + "_tts.wav")
+                rate = engine.get_voice(voice_path, voice_config).config.sample_rate
+                sf.write(tts_path, np.concatenate(chunks), rate, subtype="PCM_16")
+            tts_sec = time.perf_counter() - t0
+
+        total = time.perf_counter() - t_start
+        return {
+            "file": path,
+            "duration_sec": duration,
+            "text": " ".join(p["text"] for p in phrases),
+            "translation": " ".join(p["translation"] for p in phrases),
+            "phrases": phrases,
+            "tts_path": tts_path,
+            "timings": {"asr_sec": asr_sec, "mt_sec": mt_sec, "tts_sec": tts_sec, "total_sec": total},
+            "rtf": total / duration if duration else None,
+            "pid": os.getpid(),
+        }
+    except Exception as e:
+        return {"file": path, "error": f"{type(e).__name__}: {e}",
+                "timings": {"total_sec": time.perf_counter() - t_start}}
+
+
+def run_batch(cfg, input_path, output_path, workers=1, tts_dir=None, log=print):
+    """Process every audio file under `input_path`; returns the aggregate stats dict."""
+    files = find_inputs(input_path)
+    done = load_done(output_path)
+    todo = [f for f in files if f not in done]
+    log(f"[Batch] {len(files)} file(s), {len(files) - len(todo)} already in {output_path}, "
+        f"{len(todo)} to do with {workers} worker(s)")
+    if not todo:
+        return {"files": 0}
+
+    if os.path.dirname(output_path):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    if tts_dir:
+        os.makedirs(tts_dir, exist_ok=True)
+
+    audio_sec = busy_sec = 0.0
+    ok = failed = 0
+    t_wall = time.perf_counter()
+    interrupted = False
+    # spawn: workers start clean instead of forking a parent that may hold model threads
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"),
+                               initializer=_init_worker, initargs=(cfg, tts_dir))
+    try:
+        with open(output_path, "a", encoding="utf-8") as out:
+            futures = [pool.submit(_process_file, f) for f in todo]
+            for i, future in enumerate(as_completed(futures), 1):
+                record = future.result()
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+
+                name = os.path.basename(record["file"])
+                if "error" in record:
+                    failed += 1
+                    log(f"[Batch] {i}/{len(todo)} {name}: {record['error']}")
+                    continue
+                ok += 1
+                audio_sec += record["duration_sec"]
+                busy_sec += record["timings"]["total_sec"]
+                rtf = f"{record['rtf']:.2f}" if record["rtf"] is not None else "-"
+                log(f"[Batch] {i}/{len(todo)} {name}: {record['duration_sec']:.1f}s audio, RTF {rtf}")
+    except KeyboardInterrupt:
+        interrupted = True
+        log("[Batch] Interrupted; run the same command again to resume.")
+    finally:
+        # After Ctrl+C, don't work through the files still queued: the finished ones are in the output
+        pool.shutdown(wait=not interrupted, cancel_futures=interrupted)
+
+    wall = time.perf_counter() - t_wall
+    stats = {
+        "files": ok,
+        "failed": failed,
+        "interrupted": interrupted,
+        "audio_sec": audio_sec,
+        "wall_sec": wall,
+        # Per-worker speed, and what the whole pool achieved (includes model loading)
+        "rtf_per_worker": busy_sec / audio_sec if audio_sec else None,
+        "rtf_wall": wall / audio_sec if audio_sec else None,
+    }
+    if audio_sec:
+        log(f"[Batch] {ok} ok, {failed} failed | {audio_sec:.1f}s audio in {wall:.1f}s | "
+            f"RTF {stats['rtf_per_worker']:.3f} per worker, {stats['rtf_wall']:.3f} overall")
+    return stats
@@ -7,6 +7,20 @@ def load_config(default_path="config/default.yaml"):
     parser.add_argument("--to", dest="to_lang", default=None)
     parser.add_argument("--tts", dest="tts_enabled", action="store_true")
     parser.add_argument("--no-tts", dest="tts_enabled", action="store_false")
+    parser.add_argument("--profile-startup", action="store_true", help="print an import-time breakdown at startup")
+    parser.add_argument("--source", default=None, help="mic, FILE, stdin, tcp://HOST:PORT or udp://HOST:PORT")
+    parser.add_argument("--source-speed", type=float, default=None, help="1 = real time, 0 = as fast as possible")
+    parser.add_argument("--metrics", action="store_true", help="record per-phrase stage timings (see metrics:)")
+    parser.add_argument("--conversation", action="store_true",
+                        help="two-way conversation: detect each phrase's language and translate it to the other one")
+    # Offline batch mode (app.pipeline)
+    parser.add_argument("--input", default=None, help="audio file or directory to process instead of the mic")
+    parser.add_argument("--output", default=None, help="JSONL results file (appended to; reruns resume)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--tts-out", dest="tts_dir", default=None, help="directory for translated speech WAVs")
+    # WebSocket server (app.server)
+    parser.add_argument("--host", default=None)
+    parser.add_argument("--port", type=int, default=None)
     parser.set_defaults(tts_enabled=None)
     args = parser.parse_args()
 
@@ -17,13 +31,33 @@ def load_config(default_path="config/default.yaml"):
     if args.from_lang: cfg["translate"]["from_lang"] = args.from_lang
     if args.to_lang:   cfg["translate"]["to_lang"]   = args.to_lang
     if args.tts_enabled is not None: cfg["tts"]["enabled"] = args.tts_enabled
+    if args.source: cfg["audio"]["source"] = args.source
+    if args.source_speed is not None: cfg["audio"]["source_speed"] = args.source_speed
+    if args.metrics: cfg.setdefault("metrics", {})["enabled"] = True
+    if args.conversation: cfg.setdefault("conversation", {})["enabled"] = True
+    batch = cfg.setdefault("batch", {})
+    if args.input:   batch["input"]   = args.input
+    if args.output:  batch["output"]  = args.output
+    if args.workers: batch["workers"] = args.workers
+    if args.tts_dir: batch["tts_dir"] = args.tts_dir
+    server = cfg.setdefault("server", {})
+    if args.host: server["host"] = args.host
+    if args.port: server["port"] = args.port
 
     # Expand “auto” device choice
     if cfg["asr"]["device"] == "auto":
-        try:
-            import torch
-            cfg["asr"]["device"] = "cuda" if torch.cuda.is_available() else "cpu"
-        except Exception:
-            cfg["asr"]["device"] = "cpu"
+        cfg["asr"]["device"] = "cuda" if cuda_available() else "cpu"
 
     return cfg
+
+
+def cuda_available():
+    """
+    CUDA check without torch: ask CTranslate2 (which Faster-Whisper and Argos
+    run on anyway) how many CUDA devices it can use.
+    """
+    try:
+        import ctranslate2
+        return ctranslate2.get_cuda_device_count() > 0
+    except Exception:
+        return False
@@ -0,0 +1,54 @@
+"""
+Conversation mode: two people, two languages, one microphone and one
+Whisper model. Each phrase's language is detected from a short prefix
+(ASR.detect_language) and the phrase is routed to the other language's
+Argos direction and Piper voice.
+
+A new phrase may come from either person, so it goes by its own detection
+(the more likely of the two configured languages), however the last one
+went. Only the pieces of one utterance split by a forced cut (the
+endpointer's "continued" phrases) keep the language of the piece before
+them: the speaker can't have changed mid-utterance, and a cut piece's
+prefix may be a single word.
+"""
+import threading
+
+
+class LanguageRouter:
+    def __init__(self, languages):
+        if len(languages) != 2:
+            raise ValueError(f"Conversation mode needs exactly two languages, got {list(languages)}")
+        self.languages = list(languages)
+        self._current = self.languages[0]     # language of the last phrase
+        self._lock = threading.Lock()
+
+    def target(self, lang):
+        """The language a phrase in `lang` is translated to."""
+        return self.languages[1] if lang == self.languages[0] else self.languages[0]
+
+    def current(self):
+        """Language of the last phrase (the first language before any)."""
+        with self._lock:
+            return self._current
+
+    def route(self, probs, continued=False):
+        """
+        Language of a phrase given its detection probabilities ({lang: prob},
+        any languages). `continued` pieces of a cut utterance keep the
+        previous piece's language; so does a phrase neither language scores on.
+        """
+        probs = {lang: probs.get(lang, 0.0) for lang in self.languages}
+        best = max(probs, key=probs.get)
+        with self._lock:
+            if continued or probs[best] <= 0:
+                return self._current
+            self._current = best
+            return best
+
+
+def from_config(section, from_lang, to_lang):
+    """Router for a profile's `conversation` section, or None when conversation mode is off."""
+    section = section or {}
+    if not section.get("enabled", False):
+        return None
+    return LanguageRouter(section.get("languages") or [from_lang, to_lang])
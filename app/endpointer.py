@@ -0,0 +1,162 @@
+import numpy as np
+
+from .ring_buffer import AudioRingBuffer
+from .vad import AdaptiveEnergyVAD, WebRTCVADWrapper
+
+
+class Endpointer:
+    """
+    Turns a stream of audio blocks into phrases.
+
+    Everything is measured in samples of the input stream, never wall-clock
+    time, so a slow ASR or TTS stage cannot stretch or shrink a pause. The
+    VAD decides speech per frame; a phrase ends once `pause_timeout` seconds
+    of non-speech follow the last speech frame, and its audio is cut at the end
+    of the VAD's hangover.
+
+    Audio lives in a preallocated ring buffer that always holds the last
+    `pre_roll` seconds, so each phrase starts that far before the detected
+    onset (the quiet start of the first word is not lost).
+
+    A phrase that reaches `max_phrase_sec` without a pause is cut at the
+    quietest frame of its last `cut_search_sec`, and the next phrase starts
+    `cut_overlap` seconds before the cut so a word split at the seam is heard
+    whole once (the duplicated text is removed after ASR). That bounds both
+    the ring buffer and the length of audio ASR gets in one go.
+
+    push(block) returns the events found in the block, in order:
+        {"type": "speech_start", "pos": n}
+        {"type": "phrase", "pcm": array, "start": n, "end": n, "detected": n,
+         "cut": bool, "continued": bool}
+    `start`/`end` are the stream positions of the phrase audio and `detected`
+    is the position at which the pause (or the length limit) was hit. `cut`
+    marks a phrase ended by the length limit and `continued` the one after it.
+    """
+
+    def __init__(self, vad, sample_rate, pause_timeout, pre_roll=0.3, max_phrase_sec=30.0,
+                 cut_search_sec=3.0, cut_overlap=0.2):
+        self.vad = vad
+        self.sample_rate = sample_rate
+        # The VAD's hangover frames already count towards the pause
+        hangover = vad.hangover_frames * vad.frame_len
+        self.pause_samples = max(0, int(pause_timeout * sample_rate) - hangover)
+        self.pre_roll_samples = int(pre_roll * sample_rate)
+        self.max_phrase_samples = int(max_phrase_sec * sample_rate)
+        self.cut_search_samples = min(int(cut_search_sec * sample_rate), self.max_phrase_samples // 2)
+        self.cut_overlap_samples = min(int(cut_overlap * sample_rate), self.cut_search_samples)
+
+        # Room for pre-roll/overlap + the longest phrase + the pause that closes it, plus a second of slack for the block in flight
+        lead = max(self.pre_roll_samples, self.cut_overlap_samples)
+        self.ring = AudioRingBuffer(lead + self.max_phrase_samples + int((pause_timeout + 1.0) * sample_rate))
+        self.reset()
+
+    def reset(self):
+        self.vad.reset()
+        self.ring.clear()
+        self.pos = 0              # samples pushed so far
+        self.speech_active = False
+        self._phrase_start = 0
+        self._last_speech_end = 0
+        self._continued = False
+
+    def push(self, block):
+        block = np.asarray(block, dtype=np.float32).reshape(-1)
+        mask = self.vad.speech_mask(block)
+        frame_len = self.vad.frame_len
+        frame_pos = self.pos + block.size - self.vad.carry_samples - len(mask) * frame_len
+
+        self.ring.write(block)
+
+        events = []
+        for is_speech in mask:
+            frame_end = frame_pos + frame_len
+            if is_speech:
+                if not self.speech_active:
+                    self.speech_active = True
+                    self._phrase_start = max(frame_pos - self.pre_roll_samples, self.ring.start)
+                    events.append({"type": "speech_start", "pos": frame_pos})
+                self._last_speech_end = frame_end
+
+                if frame_end - self._phrase_start >= self.max_phrase_samples:
+                    # Too long: hand this part over and keep going
+                    events.append(self._cut_phrase(frame_end))
+
+            elif self.speech_active and frame_end - self._last_speech_end >= self.pause_samples:
+                events.append(self._end_phrase(frame_end))
+            frame_pos = frame_end
+
+        self.pos += block.size
+        return events
+
+    @property
+    def phrase_start(self) -> int:
+        """Stream position where the phrase in progress starts (pre-roll included)."""
+        return self._phrase_start
+
+    def current_audio(self):
+        """Copy of the phrase in progress so far (None between phrases)."""
+        if not self.speech_active:
+            return None
+        return self.ring.read(self._phrase_start, self.pos)
+
+    def flush(self):
+        """Close the phrase in progress (end of input); returns it or None."""
+        if not self.speech_active:
+            return None
+        return self._end_phrase(self.pos)
+
+    def _end_phrase(self, detected, cut=False):
+        pcm = self.ring.read(self._phrase_start, self._last_speech_end)
+        event = {"type": "phrase", "pcm": pcm, "start": self._phrase_start, "end": self._last_speech_end,
+                 "detected": detected, "cut": cut, "continued": self._continued}
+        self.speech_active = False
+        self._continued = False
+        return event
+
+    def _cut_phrase(self, frame_end):
+        """End the phrase at its quietest recent frame; speech carries on in a new one."""
+        frame_len = self.vad.frame_len
+        n_frames = max(1, self.cut_search_samples // frame_len)
+        search_start = frame_end - n_frames * frame_len
+        frames = self.ring.read(search_start, frame_end).reshape(n_frames, frame_len)
+        quietest = int(np.argmin(np.mean(frames * frames, axis=1)))
+        cut = search_start + quietest * frame_len + frame_len // 2
+
+        self._last_speech_end = cut
+        event = self._end_phrase(frame_end, cut=True)
+
+        self.speech_active = True
+        self._continued = True
+        self._phrase_start = cut - self.cut_overlap_samples
+        self._last_speech_end = frame_end
+        return event
+
+
+def make_endpointer(vad_cfg, sample_rate, on_log=None):
+    """Endpointer configured from a profile's `vad` section."""
+    return Endpointer(make_vad(vad_cfg, sample_rate, on_log=on_log), sample_rate,
+                      vad_cfg["pause_timeout"],
+                      pre_roll=vad_cfg.get("pre_roll_ms", 300) / 1000.0,
+                      max_phrase_sec=vad_cfg.get("max_phrase_sec", 30.0),
+                      cut_search_sec=vad_cfg.get("cut_search_sec", 3.0),
+                      cut_overlap=vad_cfg.get("cut_overlap_ms", 200) / 1000.0)
+
+
+def make_vad(vad_cfg, sample_rate, on_log=None):
+    """VAD from a profile's `vad` section: WebRTC when asked for and available, else adaptive energy."""
+    frame_ms = vad_cfg.get("frame_ms", 30)
+    onset = vad_cfg.get("onset_frames", 2)
+    hangover = vad_cfg.get("hangover_frames", 8)
+    if vad_cfg.get("use_webrtc"):
+        try:
+            return WebRTCVADWrapper(sample_rate=sample_rate,
+                                    aggressiveness=vad_cfg.get("webrtc_aggressiveness", 2),
+                                    frame_ms=frame_ms, onset_frames=onset, hangover_frames=hangover)
+        except Exception as e:
+            if on_log:
+                on_log(f"[VAD] WebRTC unavailable ({e}), using energy gate.")
+    return AdaptiveEnergyVAD(sample_rate=sample_rate, frame_ms=frame_ms,
+                             min_gate=vad_cfg.get("energy_gate", 0.0005),
+                             snr_db=vad_cfg.get("snr_db", 9.0),
+                             floor_rise_sec=vad_cfg.get("floor_rise_sec", 10.0),
+                             onset_frames=onset, hangover_frames=hangover)
@@ -0,0 +1,475 @@
+import itertools
+import queue
+import threading
+import time
+
+import numpy as np
+
+from .audio_io import AudioIn
+from .endpointer import make_endpointer
+from .asr import ASR, segments_confidence, strip_seam_overlap
+from . import conversation
+from .metrics import Metrics
+from .recorder import SessionRecorder
+from . import sources
+from .translate import get_translator, configure_cache, split_sentences
+from .queues import BoundedQueue
+from . import tts as tts_mod
+
+
+class PipelineEngine:
+    """
+    Live translation pipeline shared by the CLI and the GUI.
+
+        capture + VAD  →  [asr queue]  →  ASR  →  [mt queue]  →  translation  →  TTS worker
+
+    Capture runs on the thread that calls run(); ASR and translation each
+    have a worker thread and TTS has its own TTSWorker, so ASR of phrase N+1
+    overlaps translation/TTS of phrase N. The queues between stages are
+    bounded; `pipeline.overflow` decides what happens when one is full
+    ("block" applies backpressure to the stage before it, "drop_oldest" /
+    "drop_newest" discard a phrase).
+
+    Everything the UI needs is reported through `emit(msg)` using the GUI
+    queue's message dicts: "audio_level", "status", "log", "conf",
+    "partial", "final", "transcript", "translation", "queue_depth" and
+    "model_status". "final" and "translation" carry the phrase "id" and
+    its "lang"; "translation" also the target language ("to").
+
+    With `conversation.enabled`, each phrase's language is detected and it
+    is translated into the other language of the pair with that language's
+    voice (see app/conversation.py); `voices` maps a target language to
+    (voice_path, voice_config) and defaults to the first preset for it.
+
+    `asr`, `translator`, `tts_engine` and `audio_source` stand in for the
+    engines built from the profile and the microphone (the latency benchmark
+    replays WAV files through fake engines this way).
+    """
+
+    def __init__(self, cfg, emit, voice_path=None, voice_config=None, speak=True,
+                 tts_engine=None, record_folder=None, asr=None, translator=None, audio_source=None, voices=None):
+        self.cfg = cfg
+        self.emit = emit
+        self.record_folder = record_folder
+
+        self.sr = cfg["audio"]["sample_rate"]
+        self.block_sec = cfg["audio"]["block_seconds"]
+        self.from_lang = cfg["translate"]["from_lang"]
+        self.to_lang = cfg["translate"]["to_lang"]
+
+        # VAD + endpointing (sample-count based)
+        self.endpointer = make_endpointer(cfg["vad"], self.sr,
+                                          on_log=lambda text: emit({"type": "log", "text": text}))
+
+        # ASR (the model itself is shared process-wide and only loaded once)
+        self.asr = asr or ASR(
+            model_size=cfg["asr"]["model_size"],
+            device=cfg["asr"]["device"],
+            compute_type=cfg["asr"].get("compute_type"),
+            language=cfg["asr"]["language"],
+            beam_size=cfg["asr"]["beam_size"],
+            temperature=cfg["asr"]["temperature"],
+            warm=cfg["asr"].get("warm_up", True),
+            cpu_threads=cfg["asr"].get("cpu_threads", 0),
+            on_progress=lambda text, loading: emit({"type": "model_status", "text": text, "loading": loading}),
+        )
+        # Streaming ASR: partial transcripts of the phrase in progress
+        self.streaming = cfg["asr"].get("streaming", False)
+        self.stream_window = cfg["asr"].get("stream_window_sec", 10.0)
+        self.stream_interval = cfg["asr"].get("stream_interval_sec", 1.0)
+        self._live = None              # (phrase start, audio so far), latest only
+        self._live_lock = threading.Lock()
+
+        # Conversation mode: the language of each phrase picks the direction
+        self.router = conversation.from_config(cfg.get("conversation"), self.from_lang, self.to_lang)
+        self.detect_sec = (cfg.get("conversation") or {}).get("detect_sec", 2.0)
+        self.max_batch_size = cfg["translate"].get("max_batch_size", 16)
+
+        # Translation: resolved once, shared with other sessions for the same pair
+        configure_cache(**cfg["translate"].get("cache", {}))
+        self.translator = translator or get_translator(self.from_lang, self.to_lang)
+        self.translators = {(self.from_lang, self.to_lang): self.translator}
+        if self.router is not None:
+            for src in self.router.languages:
+                dst = self.router.target(src)
+                if (src, dst) not in self.translators:
+                    self.translators[(src, dst)] = get_translator(src, dst)
+
+        # Per-phrase timing events (no-ops unless metrics.enabled)
+        self.metrics = Metrics.from_config(cfg.get("metrics"),
+                                           on_snapshot=lambda snapshot: emit({"type": "metrics", "value": snapshot}))
+
+        # Session recording: mic phrases + TTS into one file, written in the background
+        self.recorder = None
+        if record_folder:
+            rec = cfg.get("recording", {})
+            self.recorder = SessionRecorder(record_folder, self.sr, fmt=rec.get("format", "flac"),
+                                            queue_size=rec.get("queue_size", 64), on_event=emit)
+
+        # TTS
+        tts_section = cfg.get("tts", {})
+        self.speak = speak and tts_section.get("enabled", True)
+        self.voice_path = voice_path if voice_path is not None else tts_section.get("voice_path")
+        self.voice_config = voice_config if voice_config is not None else tts_section.get("voice_config")
+        self.voices = {self.to_lang: (self.voice_path, self.voice_config)}
+        if self.router is not None:
+            for lang in self.router.languages:
+                self.voices.setdefault(lang, tts_mod.resolve_voice(tts_section, lang)[1:])
+        self.voices.update(voices or {})
+        self.barge_in = tts_section.get("barge_in", False)
+
+        self._own_tts_engine = tts_engine is None
+        if tts_engine is None:
+            tts_engine = tts_mod.TTSEngine(max_voices=tts_section.get("voice_cache_size", 3))
+        else:
+            tts_engine.max_voices = tts_section.get("voice_cache_size", tts_engine.max_voices)
+        self.tts_engine = tts_engine
+        self.tts_worker = tts_mod.TTSWorker(
+            tts_engine,
+            max_queue=tts_section.get("queue_size", 3),
+            drop_policy=tts_section.get("drop_policy", "drop_oldest"),
+            on_event=emit,
+            metrics=self.metrics,
+            recorder=self.recorder,
+        )
+
+        # Audio input: a file/stdin/socket source from audio.source, else the microphone (created in run())
+        self.audio_source = audio_source or sources.from_config(cfg["audio"])
+
+        # Bounded queues between stages
+        pipe = cfg.get("pipeline", {})
+        overflow = pipe.get("overflow", "drop_oldest")
+        if not getattr(self.audio_source, "paced", True):
+            # Unpaced input can always wait for the pipeline; nothing needs dropping
+            overflow = "block"
+        self.asr_q = BoundedQueue(pipe.get("asr_queue_size", 4), overflow)
+        self.mt_q = BoundedQueue(pipe.get("mt_queue_size", 8), overflow)
+
+        self.stop_event = threading.Event()
+        self._threads = []
+        self._capture = None           # the running audio input, for its stats
+        self._asr_busy = threading.Event()
+        self._mt_busy = threading.Event()
+
+    # Stage plumbing
+    def queue_depths(self):
+        """Items waiting in front of each stage (and how many were dropped), plus mic capture losses."""
+        capture = self._capture.stats() if hasattr(self._capture, "stats") else {}
+        return {
+            "asr": self.asr_q.qsize(),
+            "mt": self.mt_q.qsize(),
+            "tts": self.tts_worker.jobs.qsize(),
+            "dropped": self.asr_q.dropped + self.mt_q.dropped + self.tts_worker.jobs.dropped,
+            "capture_overruns": capture.get("overruns", 0),
+            "capture_dropped": capture.get("dropped_blocks", 0),
+        }
+
+    def _put(self, q, item, stage):
+        """Hand an item to the next stage; with "block", wait but keep honoring stop."""
+        while not self.stop_event.is_set():
+            try:
+                if not q.put(item, timeout=0.1):
+                    self.emit({"type": "log", "text": f"[{stage}] Queue full; dropped phrase {item['id']}."})
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q):
+        while not self.stop_event.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
+
+    def _start_workers(self):
+        self.tts_worker.start()
+        for target, name in ((self._asr_loop, "asr-worker"), (self._mt_loop, "mt-worker")):
+            t = threading.Thread(target=target, name=name, daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _drain(self):
+        """Wait until every queued phrase has been transcribed, translated and spoken (or stop())."""
+        idle_polls = 0
+        # Several idle polls in a row: a worker may have just taken an item it hasn't marked busy yet
+        while not self.stop_event.is_set() and idle_polls < 3:
+            idle = (self.asr_q.empty() and self.mt_q.empty() and not self._asr_busy.is_set()
+                    and not self._mt_busy.is_set() and not self.tts_worker.busy)
+            idle_polls = idle_polls + 1 if idle else 0
+            time.sleep(0.1)
+
+    def _shutdown(self):
+        self.stop_event.set()
+        for t in self._threads:
+            t.join(timeout=2.0)
+        self.tts_worker.close()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self._own_tts_engine:
+            self.tts_engine.close()
+        self.metrics.close()
+
+    # Stage 1: capture + VAD (caller's thread)
+    def run(self, stop_event=None):
+        """Capture until `stop_event` (or stop()) is set; blocks the calling thread."""
+        if stop_event is not None:
+            self.stop_event = stop_event
+        if self.recorder is not None:
+            self.recorder.start()
+
+        self._start_workers()
+
+        phrase_idx = 0
+        live_pos = 0
+        interval = int(self.stream_interval * self.sr)
+        self.endpointer.reset()
+
+        try:
+            source = self.audio_source or AudioIn(self.sr, self.block_sec,
+                                                  input_index=self.cfg["audio"]["device_input_index"],
+                                                  buffer_seconds=self.cfg["audio"].get("capture_buffer_sec", 2.0))
+            with source as ain:
+                self._capture = ain
+                while not self.stop_event.is_set():
+                    block = ain.get_block()  # mono float32; None once a file/stream source ends
+
+                    if block is None:
+                        last = self.endpointer.flush()
+                        events = [last] if last is not None else []
+                    else:
+                        # Audio level
+                        rms = float(np.sqrt(np.mean(block**2))) if block.size > 0 else 0.0
+                        self.emit({"type": "audio_level", "value": min(100, rms * 4000)})
+                        self.emit({"type": "queue_depth", "value": self.queue_depths()})
+                        events = self.endpointer.push(block)
+
+                    for event in events:
+                        if event["type"] == "speech_start":
+                            # Barge-in: the user started talking again, stop the current playback
+                            if self.barge_in and self.tts_worker.busy:
+                                self.tts_worker.flush()
+                        elif len(event["pcm"]) > 0:
+                            # The phrase's last sample arrived this many seconds ago
+                            self.metrics.event(phrase_idx, "capture_end",
+                                               ago=(self.endpointer.pos - event["end"]) / self.sr)
+                            self.metrics.event(phrase_idx, "vad_flush", cut=event["cut"])
+                            if self.recorder is not None:
+                                self.recorder.add(phrase_idx, "mic", event["pcm"], self.sr,
+                                                  stream_start=event["start"] / self.sr,
+                                                  stream_end=event["end"] / self.sr)
+                            self._put(self.asr_q, {"id": phrase_idx, "pcm": event["pcm"], "start": event["start"],
+                                                   "cut": event["cut"], "continued": event["continued"],
+                                                   "t_end": time.time()}, "ASR")
+                            phrase_idx += 1
+
+                    if block is None:
+                        self.emit({"type": "log", "text": "[Audio] End of input; finishing queued phrases."})
+                        self._drain()
+                        break
+
+                    # Hand the phrase in progress to ASR for a partial transcript
+                    if self.streaming and self.endpointer.speech_active and self.endpointer.pos - live_pos >= interval:
+                        live_pos = self.endpointer.pos
+                        with self._live_lock:
+                            self._live = (self.endpointer.phrase_start, self.endpointer.current_audio())
+        finally:
+            self._shutdown()
+
+    # Stage 2: ASR
+    def _asr_loop(self):
+        stream = None         # (phrase start, ASRStream) of the phrase in progress
+        done_start = -1       # start of the last finished phrase
+        seam_text = ""        # transcript of the last phrase if it was cut mid-speech
+        while not self.stop_event.is_set():
+            try:
+                phrase = self.asr_q.get(timeout=0.05)
+            except queue.Empty:
+                # Idle: work on the phrase still being spoken
+                stream = self._asr_partial(stream, done_start)
+                continue
+
+            self._asr_busy.set()
+            self.metrics.event(phrase["id"], "asr_start")
+            queued = False        # segments of this phrase handed to MT without their "last" job
+            try:
+                t0 = time.time()
+                src = self._phrase_language(phrase)
+                dst = self.router.target(src) if self.router is not None else self.to_lang
+                segments, parts = [], []
+                for piece in self._decode_phrase(phrase, src, stream, segments):
+                    piece = piece.strip()
+                    if not parts and phrase["continued"] and seam_text:
+                        # The first words may repeat the overlap with the previous piece
+                        piece = strip_seam_overlap(seam_text, piece)
+                    if not piece:
+                        continue
+                    parts.append(piece)
+                    self.metrics.event(phrase["id"], "mt_enqueue")
+                    # Translation of this segment starts while the next one is decoded
+                    self._put(self.mt_q, {"id": phrase["id"], "text": piece, "src": src, "dst": dst,
+                                          "t_end": phrase["t_end"], "last": False}, "MT")
+                    queued = True
+                stream = None
+                done_start = phrase["start"]
+
+                text = " ".join(parts)
+                seam_text = text if phrase["cut"] else ""
+                self.metrics.event(phrase["id"], "asr_end", segments=len(segments), lang=src)
+                self.emit({"type": "final", "id": phrase["id"], "lang": src, "text": text})
+                if not text:
+                    self.emit({"type": "log", "text": "[ASR] (empty)"})
+                    self.metrics.finish(phrase["id"])
+                    continue
+
+                # Send latest confidence to GUI
+                conf = segments_confidence(segments)
+                self.emit({"type": "conf", "value": conf})
+                self.emit({"type": "transcript", "id": phrase["id"], "lang": src,
+                           "text": f"[{src}] {text} (conf={conf:.2f}, {time.time() - t0:.2f}s)"})
+
+                # End of phrase for the TTS stage
+                self._put(self.mt_q, {"id": phrase["id"], "text": "", "src": src, "dst": dst,
+                                      "t_end": phrase["t_end"], "last": True}, "MT")
+                queued = False
+            except Exception as e:
+                self.emit({"type": "log", "text": f"[ASR Error] {e}"})
+                if queued:
+                    # Close the segments already sent on, so TTS and metrics finish the phrase
+                    self._put(self.mt_q, {"id": phrase["id"], "text": "", "src": src, "dst": dst,
+                                          "t_end": phrase["t_end"], "last": True}, "MT")
+                else:
+                    self.metrics.finish(phrase["id"])
+            finally:
+                self._asr_busy.clear()
+
+    def _phrase_language(self, phrase):
+        if self.router is None:
+            return self.from_lang
+        try:
+            probs = self.asr.detect_language(phrase["pcm"], prefix_sec=self.detect_sec, sample_rate=self.sr)
+        except Exception as e:
+            self.emit({"type": "log", "text": f"[ASR] Language detection failed ({e}); keeping the last language."})
+            probs = {}
+        return self.router.route(probs, continued=phrase["continued"])
+
+    def _decode_phrase(self, phrase, language, stream, segments):
+        """Yield the phrase's text piece by piece as ASR decodes it; decoded segments are appended to `segments`."""
+        if stream is not None and stream[0] == phrase["start"] and stream[1].language == language:
+            # Partials already committed most of it; only the rest is decoded
+            out = stream[1].finish(phrase["pcm"])
+            segments.extend(out["segments"])
+            yield out["text"]
+            return
+        language = language if self.router is not None else None
+        for seg in self.asr.transcribe_iter(phrase["pcm"], language=language):
+            segments.append(seg)
+            yield seg["text"]
+
+    def _asr_partial(self, stream, done_start):
+        with self._live_lock:
+            live, self._live = self._live, None
+        if live is None or live[0] <= done_start:
+            return stream
+
+        start, pcm = live
+        try:
+            if stream is None or stream[0] != start:
+                # Conversation mode: partials assume the last speaker's language until the phrase is detected
+                language = self.router.current() if self.router is not None else None
+                stream = (start, self.asr.stream(self.sr, self.stream_window, self.stream_interval, language=language))
+            result = stream[1].update(pcm)
+            if result is not None:
+                self.emit({"type": "partial", "text": f"{result['committed']} {result['tentative']}".strip(),
+                           "committed": result["committed"], "tentative": result["tentative"]})
+        except Exception as e:
+            self.emit({"type": "log", "text": f"[ASR Error] {e}"})
+            stream = None
+        return stream
+
+    # Stage 3: translation (+ hand-off to TTS)
+    def _mt_loop(self):
+        while True:
+            job = self._get(self.mt_q)
+            if job is None:
+                return
+
+            self._mt_busy.set()
+            # Catch up on a backlog with one batched model call
+            backlog = [job]
+            while True:
+                try:
+                    backlog.append(self.mt_q.get(timeout=0))
+                except queue.Empty:
+                    break
+
+            try:
+                # Consecutive jobs of one direction share a model call
+                for _, jobs in itertools.groupby(backlog, key=lambda j: (j["src"], j["dst"])):
+                    jobs = list(jobs)
+                    try:
+                        if len(jobs) == 1:
+                            self._translate_streaming(jobs[0])
+                        else:
+                            self._translate_backlog(jobs)
+                    except Exception as e:
+                        self.emit({"type": "log", "text": f"[MT Error] {e}"})
+                        # Still close every phrase the error cut short, for TTS and metrics
+                        for job in jobs:
+                            if not job.get("finished"):
+                                self._finish_job(job, [])
+            finally:
+                self._mt_busy.clear()
+
+    # Jobs are ASR segments; the empty job with "last" closes the phrase for TTS
+    def _translate_streaming(self, job):
+        # Each sentence goes to TTS as soon as it is translated
+        parts = []
+        if job["text"]:
+            self.metrics.event(job["id"], "mt_start")
+            translator = self.translators[(job["src"], job["dst"])]
+            for sentence, is_last in translator.translate_sentences(job["text"]):
+                parts.append(sentence)
+                self._speak(job, sentence, is_last and job["last"])
+        self._finish_job(job, parts)
+
+    def _translate_backlog(self, jobs):
+        for job in jobs:
+            if job["text"]:
+                self.metrics.event(job["id"], "mt_start", batch=len(jobs))
+        split = [split_sentences(job["text"]) for job in jobs]
+        flat = [s for sentences in split for s in sentences]
+        translator = self.translators[(jobs[0]["src"], jobs[0]["dst"])]
+        translated = iter(translator.translate_batch(flat, max_batch_size=self.max_batch_size))
+        for job, sentences in zip(jobs, split):
+            parts = [next(translated) for _ in sentences]
+            for i, sentence in enumerate(parts):
+                self._speak(job, sentence, job["last"] and i == len(parts) - 1)
+            self._finish_job(job, parts)
+
+    def _finish_job(self, job, parts):
+        job["finished"] = True
+        if job["text"]:
+            self.metrics.event(job["id"], "mt_end")
+        if job["last"] and not self.speak:
+            # Otherwise TTS closes the phrase once it has been spoken
+            self.metrics.finish(job["id"])
+        if not parts:
+            if job["last"]:
+                self._speak(job, "", True)
+            return
+        self._emit_translation(job, " ".join(parts))
+
+    def _emit_translation(self, job, translated):
+        self.emit({"type": "translation", "id": job["id"], "lang": job["src"], "to": job["dst"],
+                   "text": f"[→ {job['dst']}] {translated} (Δt={time.time() - job['t_end']:.2f}s)"})
+
+    def _speak(self, job, sentence, is_last):
+        # An empty final sentence only marks the end of the phrase
+        if not self.speak or not (sentence or is_last):
+            return
+        voice_path, voice_config = self.voices[job["dst"]]
+        self.tts_worker.submit(sentence, voice_path, voice_config, phrase_id=job["id"], final=is_last)
@@ -1,20 +1,21 @@
+# First, so --profile-startup sees every import below
+from . import startup
+startup.maybe_enable()
+
 import threading
 import queue
 import time
 from datetime import timedelta
-import numpy as np
 import tkinter as tk
 from tkinter import ttk, filedialog
-import os
-import soundfile as sf
 import yaml
 
 # Imports from pipeline
 from .config import load_config
-from .audio_io import AudioIn
-from .vad import energy_vad, WebRTCVADWrapper
-from .asr import ASR
-from .translate import translate_text
+from .engine import PipelineEngine
+from .translate import cache_stats
+from . import asr as asr_mod
+from . import metrics as metrics_mod
 from . import tts as tts_mod
 
 # Config profiles
@@ -29,8 +30,12 @@ CONFIG_PROFILES = [
 LANG_DIRECTIONS = [
     ("English → Spanish", "en", "es"),
     ("Spanish → English", "es", "en"),
+    ("Conversation (English ↔ Spanish)", "en", "es"),
 ]
 
+# Directions where each phrase's language is detected and both ways are translated
+CONVERSATION_DIRECTIONS = {"Conversation (English ↔ Spanish)"}
+
 
 # Main GUI app
 class LLTApp(tk.Tk):
@@ -46,8 +51,14 @@ class LLTApp(tk.Tk):
         self.stop_event = threading.Event()
         self.session_start_time = None
 
+        # Shared across sessions so loaded voices survive Start/Stop and preset switches
+        self.tts_engine = tts_mod.TTSEngine()
+
         self._build_widgets()
 
+        # Start loading the selected profile's ASR model while the window is drawn
+        self._preload_asr()
+
         self.after(100, self._poll_queue)
         self.after(200, self._update_time)
 
@@ -79,7 +90,7 @@ class LLTApp(tk.Tk):
             textvariable=self.direction_var,
             values=dir_names,
             state="readonly",
-            width=20,
+            width=28,
         )
         self.direction_combo.current(0)
         self.direction_combo.pack(side=tk.LEFT, padx=5)
@@ -100,7 +111,7 @@ class LLTApp(tk.Tk):
         self.current_voice_presets = []
 
         # Bind profile combo and direction combo so that changing profile/direction refreshes voices
-        self.profile_combo.bind("<<ComboboxSelected>>", lambda e: self._refresh_voice_choices())
+        self.profile_combo.bind("<<ComboboxSelected>>", lambda e: (self._refresh_voice_choices(), self._preload_asr()))
         self.direction_combo.bind("<<ComboboxSelected>>", lambda e: self._refresh_voice_choices())
 
         self._refresh_voice_choices()
@@ -114,6 +125,15 @@ class LLTApp(tk.Tk):
         )
         self.mute_check.pack(side=tk.LEFT, padx=5)
 
+        # Diagnostics: record stage timings and show their percentiles
+        self.diag_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            top_frame,
+            text="Diagnostics",
+            variable=self.diag_var,
+            command=self._toggle_diagnostics,
+        ).pack(side=tk.LEFT, padx=5)
+
         # Start/Stop buttons
         self.start_button = ttk.Button(top_frame, text="Start", command=self.start_session)
         self.start_button.pack(side=tk.LEFT, padx=5)
@@ -135,6 +155,10 @@ class LLTApp(tk.Tk):
         self.conf_var = tk.StringVar(value="Conf: -")
         ttk.Label(status_frame, textvariable=self.conf_var).pack(side=tk.RIGHT)
 
+        # Pipeline queue depths (phrases waiting for ASR / MT / TTS)
+        self.queue_var = tk.StringVar(value="Queues: -")
+        ttk.Label(status_frame, textvariable=self.queue_var).pack(side=tk.RIGHT, padx=15)
+
         # Audio level bar
         audio_frame = ttk.Frame(self, padding=5)
         audio_frame.pack(side=tk.TOP, fill=tk.X)
@@ -151,9 +175,22 @@ class LLTApp(tk.Tk):
         )
         self.audio_bar.pack(side=tk.LEFT, padx=5)
 
+        # ASR model load progress
+        self.model_var = tk.StringVar(value="ASR model: not loaded")
+        ttk.Label(audio_frame, textvariable=self.model_var).pack(side=tk.RIGHT)
+        self.model_bar = ttk.Progressbar(audio_frame, orient="horizontal", mode="indeterminate", length=120)
+        self.model_bar.pack(side=tk.RIGHT, padx=5)
+
+        # Diagnostics panel (hidden until enabled)
+        self.diag_frame = ttk.LabelFrame(self, text="Diagnostics (recent phrases)", padding=5)
+        self.diag_text_var = tk.StringVar(value="No finished phrases yet.")
+        ttk.Label(self.diag_frame, textvariable=self.diag_text_var, font="TkFixedFont",
+                  justify=tk.LEFT).pack(side=tk.LEFT)
+
         # Text areas
         mid_frame = ttk.Frame(self, padding=10)
         mid_frame.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+        self.mid_frame = mid_frame
 
         # Make two equal-width columns
         mid_frame.columnconfigure(0, weight=1, uniform="cols")
@@ -169,6 +206,9 @@ class LLTApp(tk.Tk):
         scroll1 = ttk.Scrollbar(t_frame, command=self.transcription_text.yview)
         scroll1.pack(side=tk.RIGHT, fill=tk.Y)
         self.transcription_text.configure(yscrollcommand=scroll1.set)
+        # Live (not yet final) transcript of the phrase being spoken
+        self.transcription_text.tag_configure("partial", foreground="gray")
+        self.session_langs = ()   # conversation mode: (first, second) language of the session
 
         # Translation (right)
         tr_frame = ttk.LabelFrame(mid_frame, text="Translated Speech", padding=5)
@@ -180,6 +220,11 @@ class LLTApp(tk.Tk):
         scroll2.pack(side=tk.RIGHT, fill=tk.Y)
         self.translation_text.configure(yscrollcommand=scroll2.set)
 
+        # Conversation mode: one speaker on the left, the other on the right
+        for widget in (self.transcription_text, self.translation_text):
+            widget.tag_configure("side_0", foreground="#1f4e8c", justify="left")
+            widget.tag_configure("side_1", foreground="#2e7d32", justify="right")
+
         # Log area
         bottom_frame = ttk.Frame(self, padding=10)
         bottom_frame.pack(side=tk.BOTTOM, fill=tk.X)
@@ -214,6 +259,8 @@ class LLTApp(tk.Tk):
             if name == selected_dir:
                 src_lang, tgt_lang = src, tgt
                 break
+        conversation = selected_dir in CONVERSATION_DIRECTIONS
+        self.session_langs = (src_lang, tgt_lang) if conversation else ()
 
         # Find selected config profile
         selected_prof = self.profile_var.get()
@@ -241,7 +288,8 @@ class LLTApp(tk.Tk):
         # Start worker thread
         self.worker_thread = threading.Thread(
             target=run_translation_session,
-            args=(profile_path, src_lang, tgt_lang, self.ui_queue, self.stop_event, mute_tts, voice_preset_id),
+            args=(profile_path, src_lang, tgt_lang, self.ui_queue, self.stop_event, mute_tts, voice_preset_id,
+                  self.tts_engine, self.diag_var.get(), conversation),
             daemon=True,
         )
         self.worker_thread.start()
@@ -264,10 +312,16 @@ class LLTApp(tk.Tk):
                 t = msg.get("type")
 
                 if t == "transcript":
-                    self._append_text(self.transcription_text, msg["text"])
+                    self._append_text(self.transcription_text, msg["text"], self._side_tag(msg.get("lang")))
+
+                elif t == "partial":
+                    self._show_partial(msg["text"])
+
+                elif t == "final":
+                    self._show_partial("")
 
                 elif t == "translation":
-                    self._append_text(self.translation_text, msg["text"])
+                    self._append_text(self.translation_text, msg["text"], self._side_tag(msg.get("lang")))
 
                 elif t == "audio_level":
                     self.audio_level.set(msg["value"])
@@ -278,6 +332,23 @@ class LLTApp(tk.Tk):
                 elif t == "log":
                     self.log_var.set(msg["text"])
 
+                elif t == "queue_depth":
+                    d = msg["value"]
+                    text = f"Queues: ASR {d['asr']} | MT {d['mt']} | TTS {d['tts']} | dropped {d['dropped']}"
+                    if d.get("capture_overruns") or d.get("capture_dropped"):
+                        text += f" | mic overruns {d['capture_overruns']}, dropped {d['capture_dropped']}"
+                    self.queue_var.set(text)
+
+                elif t == "model_status":
+                    self.model_var.set(msg["text"])
+                    if msg["loading"]:
+                        self.model_bar.start(15)
+                    else:
+                        self.model_bar.stop()
+
+                elif t == "metrics":
+                    self._show_metrics(msg["value"])
+
                 elif t == "conf": # Update confidence display
                     try:
                         self.conf_var.set(f"Conf: {msg['value']:.2f}")
@@ -299,11 +370,44 @@ class LLTApp(tk.Tk):
         self.after(200, self._update_time)
 
 
+    def _toggle_diagnostics(self):
+        if self.diag_var.get():
+            self.diag_frame.pack(side=tk.TOP, fill=tk.X, padx=10, before=self.mid_frame)
+            if self.worker_thread and self.worker_thread.is_alive():
+                self.log_var.set("Diagnostics start with the next session.")
+        else:
+            self.diag_frame.pack_forget()
+
+    def _show_metrics(self, snapshot):
+        lines = []
+        for name, _, _ in metrics_mod.STAGES:
+            s = snapshot.get(name)
+            if s:
+                lines.append(f"{name:<20} p50 {s['p50'] * 1e3:6.0f} ms  p95 {s['p95'] * 1e3:6.0f} ms  "
+                             f"p99 {s['p99'] * 1e3:6.0f} ms  (n={s['n']})")
+        self.diag_text_var.set("\n".join(lines) or "No finished phrases yet.")
+
+    def _side_tag(self, lang):
+        """Text tag for the speaker of a `lang` phrase in conversation mode (None otherwise)."""
+        if lang in self.session_langs:
+            return f"side_{self.session_langs.index(lang)}"
+        return None
+
     @staticmethod
-    def _append_text(widget, text):
-        widget.insert(tk.END, text + "\n")
+    def _append_text(widget, text, tag=None):
+        widget.insert(tk.END, text + "\n", tag)
         widget.see(tk.END)
 
+    def _show_partial(self, text):
+        # Replace the live line at the end of the transcription box
+        widget = self.transcription_text
+        ranges = widget.tag_ranges("partial")
+        if ranges:
+            widget.delete(ranges[0], ranges[-1])
+        if text:
+            widget.insert(tk.END, f"… {text}\n", "partial")
+            widget.see(tk.END)
+
     def save_transcript(self):
         """Save both transcription and translation to a .txt file."""
         transcript = self.transcription_text.get("1.0", tk.END).strip()
@@ -337,6 +441,33 @@ class LLTApp(tk.Tk):
         except Exception as e:
             self.log_var.set(f"Error saving file: {e}")
 
+    def _preload_asr(self):
+        """Load (and warm up) the selected profile's ASR model in the background."""
+        selected_prof = self.profile_var.get()
+        profile_path = CONFIG_PROFILES[0][1]
+        for name, path in CONFIG_PROFILES:
+            if selected_prof == name:
+                profile_path = path
+                break
+
+        def on_progress(text, loading):
+            self.ui_queue.put({"type": "model_status", "text": text, "loading": loading})
+
+        def load():
+            # Reading the profile may probe CUDA, so it happens off the Tk thread too
+            try:
+                asr = load_config(default_path=profile_path)["asr"]
+                if not asr.get("preload", True):
+                    return
+                # Sessions pick the same model up from the registry; language is not part of the key
+                asr_mod.get_model(asr["model_size"], asr["device"], asr.get("compute_type"),
+                                  warm=asr.get("warm_up", True), on_progress=on_progress,
+                                  cpu_threads=asr.get("cpu_threads", 0))
+            except Exception as e:
+                on_progress(f"ASR model failed to load: {e}", False)
+
+        threading.Thread(target=load, name="asr-preload", daemon=True).start()
+
     def _refresh_voice_choices(self):
         """Reload available TTS voices based on selected profile + target language."""
         # Determine selected config profile path
@@ -380,67 +511,28 @@ class LLTApp(tk.Tk):
             self.voice_var.set("")
 
 # Worker thread pipeline logic
-def run_translation_session(profile_path, src_lang, tgt_lang, ui, stop_event, mute_tts, voice_preset_id=None):
+def run_translation_session(profile_path, src_lang, tgt_lang, ui, stop_event, mute_tts, voice_preset_id=None,
+                            tts_engine=None, diagnostics=False, conversation=False):
 
     # Load chosen profile
     cfg = load_config(default_path=profile_path)
 
-    # Folder and counter for saving mic audio
-    record_folder = "recordings"
-    os.makedirs(record_folder, exist_ok=True)
-    phrase_idx = 0
-
     # Override direction
     cfg["translate"]["from_lang"] = src_lang
     cfg["translate"]["to_lang"] = tgt_lang
-
-    sr = cfg["audio"]["sample_rate"]
-    block_sec = cfg["audio"]["block_seconds"]
-    gate = cfg["vad"]["energy_gate"]
-    pause_timeout = cfg["vad"]["pause_timeout"]
-
-    # VAD
-    vad_webrtc = None
-    if cfg["vad"]["use_webrtc"]:
-        try:
-            vad_webrtc = WebRTCVADWrapper(sample_rate=sr, aggressiveness=2)
-        except Exception:
-            ui.put({"type": "log", "text": "[VAD] WebRTC unavailable, using energy gate."})
-
-    # ASR
-    asr = ASR(
-        model_size=cfg["asr"]["model_size"],
-        device=cfg["asr"]["device"],
-        language=src_lang,
-        beam_size=cfg["asr"]["beam_size"],
-        temperature=cfg["asr"]["temperature"],
-    )
-
+    cfg["asr"]["language"] = src_lang
+    if diagnostics:
+        cfg.setdefault("metrics", {})["enabled"] = True
+    if conversation:
+        # One model for both speakers; each phrase is routed by its detected language
+        conv = cfg.setdefault("conversation", {})
+        conv["enabled"] = True
+        conv["languages"] = [src_lang, tgt_lang]
+
+    # Voice preset for the target language
     tts_section = cfg.get("tts", {})
-    tts_enabled = tts_section.get("enabled", True)
-
-    # Base fallback
-    voice_path = tts_section.get("voice_path")
-    voice_cfg = tts_section.get("voice_config")
-
-    # Try to resolve from presets
-    presets_by_lang = tts_section.get("presets", {})
-    lang_presets = presets_by_lang.get(tgt_lang, []) if isinstance(presets_by_lang, dict) else []
-
-    chosen = None
-    if voice_preset_id:
-        for p in lang_presets:
-            if p.get("id") == voice_preset_id:
-                chosen = p
-                break
-
-    # If no preset explicitly chosen (edge case), pick first for that language
-    if chosen is None and lang_presets:
-        chosen = lang_presets[0]
-
+    chosen, voice_path, voice_cfg = tts_mod.resolve_voice(tts_section, tgt_lang, voice_preset_id)
     if chosen is not None:
-        voice_path = chosen.get("voice_path", voice_path)
-        voice_cfg = chosen.get("voice_config", voice_cfg)
         ui.put({"type": "log", "text": f"[TTS] Using voice preset: {chosen.get('label', chosen.get('id'))}"})
     else:
         ui.put({"type": "log", "text": "[TTS] No matching preset; using fallback voice."})
@@ -448,94 +540,40 @@ def run_translation_session(profile_path, src_lang, tgt_lang, ui, stop_event, mu
     if not voice_path or not voice_cfg:
         ui.put({"type": "log", "text": "[TTS] Missing voice_path/voice_config; TTS may fail."})
 
-    ui.put({"type": "status", "text": f"Ready ({src_lang} → {tgt_lang})"})
-    ui.put({"type": "log", "text": "Listening… speak and pause to process."})
-
-    buffered = []
-    last_voice = None
-    speech_active = False
-
-    with AudioIn(sr, block_sec, input_index=cfg["audio"]["device_input_index"]) as ain:
-        try:
-            while not stop_event.is_set():
-
-                block = ain.get_block()
-
-                # Audio level
-                if block is not None and block.size > 0:
-                    rms = float(np.sqrt(np.mean(block**2)))
-                else:
-                    rms = 0.0
-                level = min(100, rms * 4000)
-                ui.put({"type": "audio_level", "value": level})
-
-                # VAD
-                is_voice = vad_webrtc.is_speech(block) if vad_webrtc else energy_vad(block, gate)
-
-                if is_voice:
-                    speech_active = True
-                    last_voice = time.time()
-                    buffered.append(block)
-
-                elif speech_active and last_voice and (time.time() - last_voice >= pause_timeout):
-                    pcm = np.concatenate(buffered, axis=0) if buffered else None
-                    buffered.clear()
-                    speech_active = False
+    try:
+        engine = PipelineEngine(
+            cfg, emit=ui.put,
+            voice_path=voice_path, voice_config=voice_cfg, speak=not mute_tts,
+            tts_engine=tts_engine,
+            record_folder="recordings",  # Folder for saving mic + TTS audio
+        )
+    except Exception as e:
+        ui.put({"type": "log", "text": f"[Error] {e}"})
+        ui.put({"type": "status", "text": "Error"})
+        return
 
-                    if pcm is None or len(pcm) == 0:
-                        continue
+    arrow = "↔" if conversation else "→"
+    ui.put({"type": "status", "text": f"Ready ({src_lang} {arrow} {tgt_lang})"})
+    ui.put({"type": "log", "text": "Listening… speak and pause to process."})
 
-                    try:
-                        file_path = os.path.join(record_folder, f"mic_phrase_{phrase_idx:03d}.wav")
-                        sf.write(file_path, pcm, sr)  # pcm is float32, sr is sample rate
-                        phrase_idx += 1
-                        ui.put({"type": "log", "text": f"Saved mic audio: {file_path}"})
-                    except Exception as e:
-                        ui.put({"type": "log", "text": f"Error saving mic audio: {e}"})
-
-                    # ASR
-                    t0 = time.time()
-                    out = asr.transcribe_np(pcm)
-                    text = out["text"]
-                    conf = out["confidence"]
-
-                    if not text:
-                        continue
-
-                    # Send latest confidence to GUI
-                    ui.put({"type": "conf", "value": conf})
-
-                    ui.put({"type": "transcript",
-                            "text": f"[{src_lang}] {text} (conf={conf:.2f})"})
-
-                    # Translation
-                    translated = translate_text(text, src_lang, tgt_lang)
-                    ui.put({"type": "translation",
-                            "text": f"[→ {tgt_lang}] {translated} (Δt={time.time()-t0:.2f}s)"})
-
-                    # TTS
-                    if tts_enabled and translated and not mute_tts:
-                        ui.put({"type": "status", "text": "Speaking…"})
-
-                        # Build filename for TTS audio for this phrase
-                        tts_path = os.path.join(record_folder, f"tts_phrase_{phrase_idx - 1:03d}.wav")
-
-                        try:
-                            # Save TTS audio to file
-                            tts_mod.speak(translated, voice_path, voice_cfg, save_path=tts_path)
-                            ui.put({"type": "log", "text": f"Saved TTS audio: {tts_path}"})
-                        except Exception as e:
-                            ui.put({"type": "log", "text": f"[TTS Error] {e}"})
-                        ui.put({"type": "status", "text": "Running…"})
-        except Exception as e:
-            ui.put({"type": "log", "text": f"[Error] {e}"})
-            ui.put({"type": "status", "text": "Error"})
+    try:
+        engine.run(stop_event)
+    except Exception as e:
+        ui.put({"type": "log", "text": f"[Error] {e}"})
+        ui.put({"type": "status", "text": "Error"})
 
-    ui.put({"type": "log", "text": "Session stopped."})
+    stats = cache_stats()
+    ui.put({"type": "log", "text": f"Session stopped. (translation cache: {stats['hits']} hits, "
+                                   f"{stats['misses']} misses, {stats['evictions']} evictions)"})
     ui.put({"type": "status", "text": "Idle"})
 
 
 
 if __name__ == "__main__":
     app = LLTApp()
+    if startup.maybe_enable():
+        def startup_report():
+            startup.mark("window shown")
+            startup.report()
+        app.after_idle(startup_report)
     app.mainloop()
@@ -0,0 +1,120 @@
+_END = None  # trie key marking "an idiom ends here"; never collides with a character
+
+
+def normalize_quotes(s: str) -> str:
+    """
+    Normalize curly quotes to straight quotes so Whisper output and JSON keys match better.
+    """
+    return (
+        s.replace("’", "'")
+         .replace("‘", "'")
+         .replace("“", '"')
+         .replace("”", '"')
+    )
+
+
+def _lower_same_length(s: str) -> str:
+    """Lowercase without changing string length, so match offsets stay valid for `s`."""
+    lowered = s.lower()
+    if len(lowered) == len(s):
+        return lowered
+    # A few characters (e.g. "İ") expand when lowercased; leave those alone
+    return "".join(c.lower() if len(c.lower()) == 1 else c for c in s)
+
+
+class IdiomMatcher:
+    """
+    Precompiled matcher for one idiom dictionary (one language direction).
+
+    Idiom keys are normalized (quotes, case) once and stored in a character
+    trie. A scan tries the trie only at word starts and keeps the longest
+    idiom that also ends on a word boundary, then resumes after it, so a
+    single pass finds every non-overlapping, longest, whole-word match. The
+    cost depends on the text length and the longest idiom, not on how many
+    idioms there are.
+
+    items[i] = (normalized_idiom, idiom_translation); i is the number used in
+    the __IDIOM_i__ placeholders.
+    """
+
+    def __init__(self, idioms: dict):
+        # Normalize keys so matching is easier (later duplicates win, like a dict)
+        normalized = {}
+        for k, v in idioms.items():
+            normalized[_lower_same_length(normalize_quotes(k)).strip()] = v
+        normalized.pop("", None)
+
+        # Longest first, so placeholder numbers match the old sorted order
+        self.items = sorted(normalized.items(), key=lambda kv: len(kv[0]), reverse=True)
+
+        self._root = {}
+        for i, (key, _trans) in enumerate(self.items):
+            node = self._root
+            for ch in key:
+                node = node.setdefault(ch, {})
+            node[_END] = i
+
+    def __len__(self):
+        return len(self.items)
+
+    def find(self, text: str):
+        """
+        Return [(start, end, item_index), ...] for every match in `text`,
+        left to right. Offsets refer to normalize_quotes(text).
+        """
+        lower_text = _lower_same_length(normalize_quotes(text))
+        n = len(lower_text)
+        root = self._root
+        matches = []
+
+        i = 0
+        while i < n:
+            # Only start at a word boundary
+            if i > 0 and lower_text[i - 1].isalnum():
+                i += 1
+                continue
+
+            node = root
+            best = None
+            j = i
+            while j < n:
+                node = node.get(lower_text[j])
+                if node is None:
+                    break
+                j += 1
+                if _END in node and (j == n or not lower_text[j].isalnum()):
+                    best = (j, node[_END])
+
+            if best is None:
+                i += 1
+                continue
+
+            end, idx = best
+            matches.append((i, end, idx))
+            i = end
+
+        return matches
+
+    def tag(self, text: str) -> str:
+        """
+        Replace every matched idiom in `text` with an __IDIOM_i__ placeholder.
+        """
+        new_text = normalize_quotes(text)
+        matches = self.find(text)
+        if not matches:
+            return new_text
+
+        parts = []
+        pos = 0
+        for start, end, idx in matches:
+            parts.append(new_text[pos:start])
+            parts.append(f"__IDIOM_{idx}__")
+            pos = end
+        parts.append(new_text[pos:])
+        return "".join(parts)
+
+    def translation(self, idx: int):
+        """Translation for placeholder number `idx`, or None if out of range."""
+        if 0 <= idx < len(self.items):
+            return self.items[idx][1]
+        return None
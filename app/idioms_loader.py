@@ -1,16 +1,21 @@
 import json
 from pathlib import Path
 
-def load_idiom_dict() -> dict:
+def idioms_path() -> Path:
     """
-    Load idioms from app/idioms/idioms.json and return as a dictionary.
+    Path of the idiom dictionary file.
     """
     # Path to this file: app/idiom_loader.py
     # We need to go to: app/idioms/idioms.json
     here = Path(__file__).resolve().parent
-    idioms_path = here / "idioms" / "idioms.json"
+    return here / "idioms" / "idioms.json"
 
-    with idioms_path.open("r", encoding="utf-8") as f:
+
+def load_idiom_dict() -> dict:
+    """
+    Load idioms from app/idioms/idioms.json and return as a dictionary.
+    """
+    with idioms_path().open("r", encoding="utf-8") as f:
         return json.load(f)
 
 
@@ -0,0 +1,209 @@
+"""
+Per-phrase timing events for the live pipeline.
+
+Stages call `metrics.event(phrase_id, name)` as a phrase passes through
+them (capture_end, vad_flush, asr_start/asr_end, mt_enqueue, mt_start/mt_end,
+tts_submit, tts_start, tts_first_chunk, tts_end) and `metrics.finish(phrase_id)`
+when nothing more will happen to it. Durations between the events (stage
+times and queue waits, see STAGES) are kept for the last `window` phrases
+for rolling percentiles.
+
+Outputs, all optional:
+  - a rotating JSONL log with every event and a "phrase" summary line, written
+    by a background thread so the pipeline never waits on disk;
+  - a Prometheus textfile (node_exporter textfile collector format),
+    rewritten at most every `textfile_interval_sec`;
+  - `on_snapshot(snapshot)` after each phrase, e.g. for the GUI diagnostics panel.
+
+When disabled, event() and finish() return straight away.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# (name, from event, to event): what a phrase's summary and the percentiles report
+STAGES = (
+    ("endpoint", "capture_end", "vad_flush"),
+    ("asr_queue_wait", "vad_flush", "asr_start"),
+    ("asr", "asr_start", "asr_end"),
+    ("mt_queue_wait", "mt_enqueue", "mt_start"),
+    ("mt", "mt_start", "mt_end"),
+    ("tts_queue_wait", "tts_submit", "tts_start"),
+    ("tts_first_chunk", "tts_submit", "tts_first_chunk"),
+    ("tts_playback", "tts_first_chunk", "tts_end"),
+    ("time_to_first_audio", "capture_end", "tts_first_chunk"),
+)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Phrases that never finish (dropped by a full queue) are forgotten after this many
+_MAX_OPEN = 64
+
+
+class Metrics:
+    def __init__(self, enabled=False, log_path=None, max_bytes=5_000_000, backups=3,
+                 textfile_path=None, textfile_interval_sec=5.0, window=200, on_snapshot=None):
+        self.enabled = enabled
+        self.window = window
+        self.on_snapshot = on_snapshot
+        self.textfile_path = textfile_path
+        self.textfile_interval = textfile_interval_sec
+        self.session = time.strftime("%Y%m%dT%H%M%S")
+
+        self._lock = threading.Lock()
+        self._open = {}                                       # phrase id -> {event: perf_counter}
+        self._recent = {name: deque(maxlen=window) for name, _, _ in STAGES}
+        self._totals = {name: [0, 0.0] for name, _, _ in STAGES}   # count, sum (whole session)
+        self._phrases = 0
+        self._textfile_written = 0.0
+
+        self._listener = None
+        self._log = None
+        if enabled and log_path:
+            if os.path.dirname(log_path):
+                os.makedirs(os.path.dirname(log_path), exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backups,
+                                                           encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            records = queue.SimpleQueue()
+            self._listener = logging.handlers.QueueListener(records, handler)
+            self._listener.start()
+            self._log = logging.getLogger(f"llt.metrics.{id(self)}")
+            self._log.propagate = False
+            self._log.setLevel(logging.INFO)
+            self._log.addHandler(logging.handlers.QueueHandler(records))
+
+    @classmethod
+    def from_config(cls, section, on_snapshot=None):
+        """Metrics from a profile's `metrics` section (missing section = disabled)."""
+        section = section or {}
+        return cls(
+            enabled=section.get("enabled", False),
+            log_path=section.get("log_path"),
+            max_bytes=section.get("max_bytes", 5_000_000),
+            backups=section.get("backups", 3),
+            textfile_path=section.get("prometheus_textfile"),
+            textfile_interval_sec=section.get("textfile_interval_sec", 5.0),
+            window=section.get("window", 200),
+            on_snapshot=on_snapshot,
+        )
+
+    def event(self, phrase_id, name, ago=0.0, **fields):
+        """
+        Record that `name` happened to a phrase (`ago` seconds in the past).
+        A repeated event keeps its first time, except *_end events, which keep the last.
+        """
+        if not self.enabled:
+            return
+        t = time.perf_counter() - ago
+        with self._lock:
+            marks = self._open.get(phrase_id)
+            if marks is None:
+                marks = self._open[phrase_id] = {}
+                if len(self._open) > _MAX_OPEN:
+                    self._open.pop(next(iter(self._open)))
+            if name.endswith("_end") or name not in marks:
+                marks[name] = t
+        self._write({"ts": time.time() - ago, "session": self.session, "phrase": phrase_id,
+                     "event": name, **fields})
+
+    def finish(self, phrase_id, outcome=None):
+        """
+        Close a phrase: summarize its stage times and update the outputs.
+        `outcome` ("cancelled", "error") marks a phrase that stopped short;
+        the stages it did complete still count.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            marks = self._open.pop(phrase_id, None)
+            if marks is None:
+                return
+            stages = {}
+            for name, start, end in STAGES:
+                if start in marks and end in marks:
+                    sec = max(0.0, marks[end] - marks[start])
+                    stages[name] = sec
+                    self._recent[name].append(sec)
+                    self._totals[name][0] += 1
+                    self._totals[name][1] += sec
+            self._phrases += 1
+        record = {"ts": time.time(), "session": self.session, "phrase": phrase_id, "event": "phrase",
+                  "stages": {name: round(sec, 4) for name, sec in stages.items()}}
+        if outcome is not None:
+            record["outcome"] = outcome
+        self._write(record)
+
+        snapshot = self.snapshot()
+        if self.textfile_path and time.time() - self._textfile_written >= self.textfile_interval:
+            self._textfile_written = time.time()
+            try:
+                self.write_textfile(snapshot)
+            except OSError:
+                pass
+        if self.on_snapshot:
+            self.on_snapshot(snapshot)
+
+    def snapshot(self):
+        """{stage: {"n", "p50", "p95", "p99"}} in seconds over the last `window` phrases."""
+        with self._lock:
+            recent = {name: list(values) for name, values in self._recent.items() if values}
+        out = {}
+        for name, values in recent.items():
+            p = np.percentile(values, [q * 100 for q in QUANTILES])
+            out[name] = {"n": len(values), "p50": float(p[0]), "p95": float(p[1]), "p99": float(p[2])}
+        return out
+
+    def write_textfile(self, snapshot=None):
+        """Write the Prometheus textfile (atomically, via a temp file)."""
+        snapshot = self.snapshot() if snapshot is None else snapshot
+        with self._lock:
+            totals = {name: tuple(v) for name, v in self._totals.items()}
+            phrases = self._phrases
+        lines = [
+            "# HELP llt_stage_seconds Pipeline stage time per phrase (quantiles over recent phrases).",
+            "# TYPE llt_stage_seconds summary",
+        ]
+        for name, _, _ in STAGES:
+            for q, key in zip(QUANTILES, ("p50", "p95", "p99")):
+                if name in snapshot:
+                    lines.append(f'llt_stage_seconds{{stage="{name}",quantile="{q}"}} {snapshot[name][key]:.6f}')
+            count, total = totals[name]
+            lines.append(f'llt_stage_seconds_sum{{stage="{name}"}} {total:.6f}')
+            lines.append(f'llt_stage_seconds_count{{stage="{name}"}} {count}')
+        lines += [
+            "# HELP llt_phrases_total Phrases that went through the pipeline.",
+            "# TYPE llt_phrases_total counter",
+            f"llt_phrases_total {phrases}",
+        ]
+        tmp = self.textfile_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, self.textfile_path)
+
+    def _write(self, record):
+        if self._log is not None:
+            self._log.info(json.dumps(record))
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+            self._log.handlers.clear()
+            self._log = None
+        if self.enabled and self.textfile_path:
+            try:
+                self.write_textfile()
+            except OSError:
+                pass
+
+
+# Shared no-op instance for code that has no Metrics of its own
+DISABLED = Metrics()
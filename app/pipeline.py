@@ -1,86 +1,60 @@
-import time, numpy as np
+# First, so --profile-startup sees every import below
+from . import startup
+startup.maybe_enable()
+
 from .config import load_config
-from .audio_io import AudioIn
-from .vad import energy_vad, WebRTCVADWrapper
-from .asr import ASR
-from .translate import translate_text
-from . import tts as tts_mod
+from .engine import PipelineEngine
+from .translate import cache_stats
+
+_last_depths = None
+
+def _print_event(msg):
+    # Console view of the engine's GUI messages
+    global _last_depths
+    t = msg.get("type")
+    if t in ("log", "model_status", "transcript", "translation"):
+        print(msg["text"])
+    elif t == "partial" and msg["text"]:
+        print(f"[…] {msg['text']}")
+    elif t == "queue_depth":
+        depths = msg["value"]
+        # Only worth printing when something is backed up or audio was lost
+        if depths != _last_depths and (depths["asr"] or depths["mt"] or depths["tts"]):
+            print(f"[Queues] asr={depths['asr']} mt={depths['mt']} tts={depths['tts']} dropped={depths['dropped']}")
+        lost = (depths["capture_overruns"], depths["capture_dropped"])
+        if _last_depths and lost != (_last_depths["capture_overruns"], _last_depths["capture_dropped"]):
+            print(f"[Audio] mic overruns={lost[0]} dropped blocks={lost[1]}")
+        _last_depths = depths
 
 def main():
     cfg = load_config()
-    sr = cfg["audio"]["sample_rate"]
-    block_sec = cfg["audio"]["block_seconds"]
-    gate = cfg["vad"]["energy_gate"]
-    pause_timeout = cfg["vad"]["pause_timeout"]
-
-    # VAD
-    vad_webrtc = None
-    if cfg["vad"]["use_webrtc"]:
-        try:
-            vad_webrtc = WebRTCVADWrapper(sample_rate=sr, aggressiveness=2)
-        except Exception:
-            print("[VAD] webrtcvad not available; falling back to energy gate")
 
-    # ASR
-    asr = ASR(
-        model_size=cfg["asr"]["model_size"],
-        device=cfg["asr"]["device"],
-        language=cfg["asr"]["language"],
-        beam_size=cfg["asr"]["beam_size"],
-        temperature=cfg["asr"]["temperature"],
-    )
+    batch = cfg.get("batch", {})
+    if batch.get("input"):
+        from .batch import run_batch
+        run_batch(cfg, batch["input"], batch.get("output", "recordings/batch_results.jsonl"),
+                  workers=batch.get("workers", 1), tts_dir=batch.get("tts_dir"))
+        return
 
     from_lang = cfg["translate"]["from_lang"]
     to_lang   = cfg["translate"]["to_lang"]
 
-    tts_enabled = cfg["tts"]["enabled"]
-    voice_path  = cfg["tts"]["voice_path"]
-    voice_cfg   = cfg["tts"]["voice_config"]
+    startup.mark("config loaded")
+    engine = PipelineEngine(cfg, emit=_print_event)
+    startup.mark("engine ready (models loaded)")
+    startup.report()
 
-    print(f"[Ready] {from_lang} → {to_lang} | sr={sr} | model={cfg['asr']['model_size']} | device={cfg['asr']['device']}")
+    direction = " ↔ ".join(engine.router.languages) if engine.router is not None else f"{from_lang} → {to_lang}"
+    print(f"[Ready] {direction} | sr={engine.sr} | model={cfg['asr']['model_size']} | device={cfg['asr']['device']}"
+          f" | source={cfg['audio'].get('source', 'mic')}")
     print("Ctrl+C to exit.\n")
 
-    buffered = []
-    last_voice_time = None
-    speech_active = False
-
-    with AudioIn(sr, block_sec, input_index=cfg["audio"]["device_input_index"]) as ain:
-        try:
-            while True:
-                block = ain.get_block()  # mono float32
-                is_voice = (vad_webrtc.is_speech(block) if vad_webrtc else energy_vad(block, gate))
-
-                if is_voice:
-                    speech_active = True
-                    last_voice_time = time.time()
-                    buffered.append(block)
-                elif speech_active and last_voice_time and (time.time() - last_voice_time) >= pause_timeout:
-                    # flush phrase
-                    pcm = np.concatenate(buffered, axis=0) if buffered else None
-                    buffered.clear()
-                    speech_active = False
-                    if pcm is None or len(pcm) == 0:
-                        continue
-
-                    t0 = time.time()
-                    asr_out = asr.transcribe_np(pcm)
-                    text = asr_out["text"]
-                    conf = asr_out["confidence"]
-                    if not text:
-                        print("[ASR] (empty)")
-                        continue
-
-                    print(f"[ASR {from_lang}] {text}  (conf={conf:.2f}, {asr_out['elapsed_sec']:.2f}s)")
-                    translated = translate_text(text, from_lang, to_lang)
-                    print(f"[→ {to_lang}] {translated}  (end-to-end {(time.time()-t0):.2f}s)")
-
-                    if tts_enabled and translated:
-                        try:
-                            tts_mod.speak(translated, voice_path, voice_cfg)
-                        except Exception as e:
-                            print("[TTS] error:", e)
-        except KeyboardInterrupt:
-            print("\n[Exit] Bye!")
+    try:
+        engine.run()  # returns by itself when a file/stream source ends
+    except KeyboardInterrupt:
+        print()
+    print(f"[Cache] {cache_stats()}")
+    print("[Exit] Bye!")
 
 if __name__ == "__main__":
     main()
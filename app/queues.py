@@ -0,0 +1,74 @@
+import queue
+import threading
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "drop_newest")
+
+
+class BoundedQueue:
+    """
+    Thread-safe FIFO with a fixed capacity and an explicit overflow policy.
+
+    policy:
+        "block"        put() waits for space (backpressure on the producer)
+        "drop_oldest"  the oldest queued item is discarded to make room
+        "drop_newest"  the incoming item is discarded
+
+    `on_drop(item)` is called with every item a drop policy discards.
+    """
+
+    def __init__(self, maxsize, policy="drop_oldest", on_drop=None):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {policy!r}; expected one of {OVERFLOW_POLICIES}")
+        self.maxsize = max(1, int(maxsize))
+        self.policy = policy
+        self.dropped = 0
+        self.on_drop = on_drop
+        self._q = queue.Queue(maxsize=self.maxsize)
+        self._lock = threading.Lock()
+
+    def put(self, item, timeout=None):
+        """Add an item. Returns False if the incoming item was dropped by the policy."""
+        if self.policy == "block":
+            self._q.put(item, timeout=timeout)
+            return True
+
+        with self._lock:
+            try:
+                self._q.put_nowait(item)
+                return True
+            except queue.Full:
+                self.dropped += 1
+                if self.policy == "drop_newest":
+                    dropped, accepted = item, False
+                else:
+                    # drop_oldest: make room, then enqueue
+                    try:
+                        dropped = self._q.get_nowait()
+                    except queue.Empty:
+                        dropped = None
+                    self._q.put_nowait(item)
+                    accepted = True
+        if dropped is not None and self.on_drop is not None:
+            self.on_drop(dropped)
+        return accepted
+
+    def get(self, timeout=None):
+        """Remove and return the next item; raises queue.Empty on timeout."""
+        return self._q.get(timeout=timeout)
+
+    def clear(self):
+        """Discard all queued items and return how many were removed."""
+        removed = 0
+        with self._lock:
+            while True:
+                try:
+                    self._q.get_nowait()
+                    removed += 1
+                except queue.Empty:
+                    return removed
+
+    def qsize(self):
+        return self._q.qsize()
+
+    def empty(self):
+        return self._q.empty()
@@ -0,0 +1,167 @@
+"""
+Session recording: mic phrases and TTS audio appended to one compressed
+file per session, written by a background thread.
+
+    recordings/session_20250101_120000.flac    mono audio at the pipeline's sample rate
+    recordings/session_20250101_120000.jsonl   index: a header line, then one line per segment
+
+Each index line after the header is {"phrase", "kind" ("mic" | "tts"),
+"offset", "frames", "time"} plus, for mic phrases, the phrase's position
+in the input stream ("stream_start" / "stream_end", seconds). TTS audio is
+resampled to the recording's rate; a phrase's TTS may span several segments.
+
+add() never blocks: segments go through a bounded queue and are dropped
+(and counted) if the disk can't keep up, so recording can't hold up ASR.
+
+Extract phrases later with extract() or from the command line:
+    python -m app.recorder recordings/session_20250101_120000.flac --phrase 3 --out phrase3.wav
+    python -m app.recorder recordings/session_20250101_120000.flac --export recordings/phrases/
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+import soundfile as sf
+
+from .queues import BoundedQueue
+
+FORMATS = {"flac": ("FLAC", "PCM_16", ".flac"), "ogg": ("OGG", "VORBIS", ".ogg")}
+
+
+def _resample(pcm, from_rate, to_rate):
+    pcm = np.asarray(pcm).reshape(-1)
+    if pcm.dtype == np.int16:
+        pcm = pcm.astype(np.float32) / 32768.0
+    if from_rate == to_rate or not len(pcm):
+        return pcm.astype(np.float32, copy=False)
+    n = int(round(len(pcm) * to_rate / from_rate))
+    return np.interp(np.linspace(0, len(pcm) - 1, n), np.arange(len(pcm)), pcm).astype(np.float32)
+
+
+class SessionRecorder:
+    def __init__(self, folder, sample_rate, fmt="flac", queue_size=64, on_event=None):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown recording format {fmt!r}; expected one of {', '.join(FORMATS)}")
+        self.folder = folder
+        self.sample_rate = sample_rate
+        self.format = fmt
+        self.on_event = on_event or (lambda msg: None)
+
+        base = os.path.join(folder, time.strftime("session_%Y%m%d_%H%M%S"))
+        self.path = base + FORMATS[fmt][2]
+        self.index_path = base + ".jsonl"
+        self.segments = 0
+
+        self._jobs = BoundedQueue(queue_size, "drop_newest")
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="recorder", daemon=True)
+
+    @property
+    def dropped(self):
+        return self._jobs.dropped
+
+    def start(self):
+        os.makedirs(self.folder, exist_ok=True)
+        self._thread.start()
+        return self
+
+    def add(self, phrase_id, kind, pcm, sample_rate, **timings):
+        """Queue audio for phrase `phrase_id` (kind "mic" or "tts"); returns False if it was dropped."""
+        return self._jobs.put({"phrase": phrase_id, "kind": kind, "pcm": pcm, "sample_rate": sample_rate,
+                               "time": time.time(), **timings})
+
+    def _run(self):
+        container, subtype, _ = FORMATS[self.format]
+        offset = 0
+        with sf.SoundFile(self.path, "w", samplerate=self.sample_rate, channels=1,
+                          format=container, subtype=subtype) as out, \
+                open(self.index_path, "w", encoding="utf-8") as index:
+            index.write(json.dumps({"recording": os.path.basename(self.path), "sample_rate": self.sample_rate,
+                                    "format": self.format, "started": time.time()}) + "\n")
+            while True:
+                try:
+                    job = self._jobs.get(timeout=0.2)
+                except queue.Empty:
+                    if self._stop.is_set():
+                        break
+                    continue
+                try:
+                    audio = _resample(job.pop("pcm"), job.pop("sample_rate"), self.sample_rate)
+                    if not len(audio):
+                        continue
+                    out.write(audio)
+                    index.write(json.dumps({**job, "offset": offset, "frames": len(audio)}) + "\n")
+                    index.flush()
+                    offset += len(audio)
+                    self.segments += 1
+                except Exception as e:
+                    self.on_event({"type": "log", "text": f"[Recorder Error] {e}"})
+
+    def close(self, timeout=5.0):
+        """Write what is queued, then close the file."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        if self.segments:
+            lost = f", {self.dropped} dropped" if self.dropped else ""
+            self.on_event({"type": "log", "text": f"Recorded {self.segments} segments to {self.path}{lost}"})
+
+
+def index_path_for(recording_path):
+    return os.path.splitext(recording_path)[0] + ".jsonl"
+
+
+def load_index(recording_path):
+    """(header, segments) from a recording's sidecar index."""
+    with open(index_path_for(recording_path), "r", encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    return lines[0], lines[1:]
+
+
+def extract(recording_path, phrase_id, kind="mic"):
+    """Audio of one phrase as (float32 samples, sample_rate); empty if the phrase isn't recorded."""
+    header, segments = load_index(recording_path)
+    parts = []
+    with sf.SoundFile(recording_path) as f:
+        for seg in segments:
+            if seg["phrase"] == phrase_id and seg["kind"] == kind:
+                f.seek(seg["offset"])
+                parts.append(f.read(seg["frames"], dtype="float32"))
+    audio = np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+    return audio, header["sample_rate"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract phrases from a session recording")
+    parser.add_argument("recording")
+    parser.add_argument("--phrase", type=int, default=None)
+    parser.add_argument("--kind", choices=("mic", "tts"), default="mic")
+    parser.add_argument("--out", default=None, help="WAV file for --phrase")
+    parser.add_argument("--export", default=None, help="write every phrase of --kind to this folder as WAVs")
+    args = parser.parse_args()
+
+    header, segments = load_index(args.recording)
+    if args.phrase is not None:
+        audio, rate = extract(args.recording, args.phrase, args.kind)
+        out = args.out or f"{args.kind}_phrase_{args.phrase:03d}.wav"
+        sf.write(out, audio, rate)
+        print(f"{out}: {len(audio) / rate:.2f}s")
+    elif args.export:
+        os.makedirs(args.export, exist_ok=True)
+        phrases = sorted({seg["phrase"] for seg in segments if seg["kind"] == args.kind})
+        for phrase_id in phrases:
+            audio, rate = extract(args.recording, phrase_id, args.kind)
+            sf.write(os.path.join(args.export, f"{args.kind}_phrase_{phrase_id:03d}.wav"), audio, rate)
+        print(f"Wrote {len(phrases)} phrase(s) to {args.export}")
+    else:
+        for seg in segments:
+            print(f"phrase {seg['phrase']:4d} {seg['kind']:<3} {seg['offset'] / header['sample_rate']:9.2f}s "
+                  f"+{seg['frames'] / header['sample_rate']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
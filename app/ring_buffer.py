@@ -0,0 +1,124 @@
+import threading
+import time
+
+import numpy as np
+
+
+class AudioRingBuffer:
+    """
+    Fixed-capacity mono float32 ring buffer addressed by stream position.
+
+    Writes copy into one preallocated array, so memory stays constant however
+    long the session runs. Positions count every sample ever written; only the
+    last `capacity` samples can be read back.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = int(capacity)
+        self._buf = np.zeros(self.capacity, dtype=np.float32)
+        self.end = 0  # stream position just after the newest sample
+
+    @property
+    def start(self) -> int:
+        """Oldest stream position still held."""
+        return max(0, self.end - self.capacity)
+
+    def clear(self):
+        self.end = 0
+
+    def write(self, samples: np.ndarray):
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        n = samples.size
+        if n >= self.capacity:
+            # Only the newest `capacity` samples survive
+            self.end += n - self.capacity
+            samples = samples[-self.capacity:]
+            n = self.capacity
+
+        i = self.end % self.capacity
+        first = min(n, self.capacity - i)
+        self._buf[i:i + first] = samples[:first]
+        self._buf[:n - first] = samples[first:]
+        self.end += n
+
+    def read(self, start: int, stop: int) -> np.ndarray:
+        """Samples [start, stop) as one new contiguous array (clamped to what is held)."""
+        start = max(start, self.start)
+        stop = min(stop, self.end)
+        if stop <= start:
+            return np.zeros(0, dtype=np.float32)
+
+        n = stop - start
+        i = start % self.capacity
+        first = min(n, self.capacity - i)
+        out = np.empty(n, dtype=np.float32)
+        out[:first] = self._buf[i:i + first]
+        out[first:] = self._buf[:n - first]
+        return out
+
+
+class SPSCRingBuffer:
+    """
+    Single-producer/single-consumer float32 ring for audio capture.
+
+    The producer (the PortAudio callback) copies into one preallocated array
+    and then publishes its new position; the consumer reads fixed-size frames
+    as views into the same array. Each position is written by one thread
+    only, so the data path needs no lock; an Event just wakes the consumer.
+
+    A frame stays valid until the consumer's next read_frame(). When the
+    consumer falls so far behind that a write does not fit, the write is
+    dropped and counted (`dropped_writes`, `dropped_samples`).
+    """
+
+    def __init__(self, capacity: int, frame_size: int):
+        self.frame_size = int(frame_size)
+        # Whole frames, so a frame never wraps around the end and is always a view
+        self.capacity = -(-int(capacity) // self.frame_size) * self.frame_size
+        self._buf = np.zeros(self.capacity, dtype=np.float32)
+        self._write = 0   # producer only
+        self._read = 0    # consumer only; the held frame is released on the next read
+        self._held = 0
+        self._ready = threading.Event()
+        self.dropped_writes = 0
+        self.dropped_samples = 0
+
+    def available(self) -> int:
+        """Samples written but not read yet."""
+        return self._write - self._read - self._held
+
+    def write(self, samples: np.ndarray) -> bool:
+        """Producer side. Returns False if the ring was full and `samples` were dropped."""
+        n = len(samples)
+        if n > self.capacity - (self._write - self._read):
+            self.dropped_writes += 1
+            self.dropped_samples += n
+            return False
+
+        i = self._write % self.capacity
+        first = min(n, self.capacity - i)
+        self._buf[i:i + first] = samples[:first]
+        if first < n:
+            self._buf[:n - first] = samples[first:]
+        self._write += n
+        self._ready.set()
+        return True
+
+    def read_frame(self, timeout=None):
+        """Consumer side: the next `frame_size` samples as a view, or None after `timeout` seconds."""
+        self._read += self._held
+        self._held = 0
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._write - self._read < self.frame_size:
+            self._ready.clear()
+            if self._write - self._read >= self.frame_size:
+                break  # written between the check and clear()
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            self._ready.wait(remaining)
+
+        i = self._read % self.capacity
+        self._held = self.frame_size
+        return self._buf[i:i + self.frame_size]
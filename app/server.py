@@ -0,0 +1,470 @@
+"""
+WebSocket translation server: many clients (earpieces, phones, the load
+generator in benchmarks/server_load.py) stream audio to one box that holds
+the models.
+
+    python -m app.server --host 0.0.0.0 --port 8765 --profile config/gpu_fast.yaml
+
+Protocol, one session per connection (JSON text frames unless noted):
+
+    client → {"type": "start", "from": "en", "to": "es", "tts": false,
+              "conversation": false, "voice": "<preset id>"}     optional, before any audio
+    client → binary frames: mono PCM at audio.sample_rate in server.pcm_format
+    client → {"type": "end"}    no more audio: queued phrases are finished, then "done"
+
+    server → {"type": "ready", "session", "sample_rate", "pcm_format"}
+             {"type": "final", "id", "lang", "text", "end_sec"}
+             {"type": "translation", "id", "lang", "to", "text", "end_sec"}
+             {"type": "tts", "id", "sample_rate", "samples"}, then one binary frame of s16le PCM
+             {"type": "dropped", "id", "stage"}, {"type": "error", "text"}, {"type": "done"}
+
+`end_sec` is where the phrase ends in the client's audio stream.
+
+Every session shares one Whisper model, one Translator per direction and
+one Piper engine. A Scheduler runs each stage on its own thread:
+
+    ASR   one phrase at a time, round-robin over sessions, so a talkative
+          client can't starve the others; with asr.workers > 1, that many
+          phrases at once in an ASRPool (one model per worker process);
+    MT    takes every pending transcript (waiting up to mt_batch_wait_ms for
+          more when there is only one) and translates each direction in one
+          batched model call;
+    TTS   round-robin over sessions; audio is sent back, not played.
+
+Backpressure is per session: once a session has `client_queue` phrases
+waiting for ASR the server stops reading its socket ("block": TCP slows that
+client down, nobody else) or drops its oldest phrase ("drop_oldest").
+Outgoing messages are queued per session; when a client reads too slowly
+its TTS audio is dropped first, transcripts and translations never are.
+"""
+import asyncio
+import itertools
+import json
+import queue
+import threading
+
+import numpy as np
+
+from .asr import ASR, strip_seam_overlap
+from .asr_pool import ASRPool
+from .config import load_config
+from . import conversation
+from .endpointer import make_endpointer
+from .queues import BoundedQueue
+from .sources import PCM_FORMATS
+from .translate import get_translator, configure_cache, split_sentences
+from . import tts as tts_mod
+
+
+class Session:
+    """One connected client: its endpointer, queues and outbox."""
+
+    def __init__(self, sid, cfg, loop):
+        server = cfg.get("server", {})
+        self.id = sid
+        self.cfg = cfg
+        self.loop = loop
+        self.sr = cfg["audio"]["sample_rate"]
+        self.dtype = PCM_FORMATS[server.get("pcm_format", "s16le")]
+        self.from_lang = cfg["translate"]["from_lang"]
+        self.to_lang = cfg["translate"]["to_lang"]
+        self.speak = False
+        self.router = None
+        self.voices = {}
+        self.endpointer = make_endpointer(cfg["vad"], self.sr)
+
+        self.phrases = BoundedQueue(server.get("client_queue", 4), server.get("overflow", "block"))
+        self.speech = BoundedQueue(cfg.get("tts", {}).get("queue_size", 3), "drop_oldest")
+        self.outbox = asyncio.Queue()
+        self.send_queue = server.get("send_queue", 64)
+
+        self.started = False
+        self.closed = False
+        self.asr_busy = False      # a phrase of this session is being transcribed
+        self.seam_text = ""
+        self.phrase_idx = 0
+        self.stats = {"phrases": 0, "dropped": 0, "tts_dropped": 0}
+        self._inflight = 0
+        self._lock = threading.Lock()
+
+    def configure(self, options):
+        """Apply the client's "start" message."""
+        self.from_lang = options.get("from", self.from_lang)
+        self.to_lang = options.get("to", self.to_lang)
+        # Conversation mode: the router is per session, so forced cuts stay in their session's language
+        if options.get("conversation"):
+            self.router = conversation.LanguageRouter([self.from_lang, self.to_lang])
+        tts_section = self.cfg.get("tts", {})
+        self.speak = bool(options.get("tts", False))
+        for lang in (self.to_lang, self.from_lang):
+            preset = options.get("voice") if lang == self.to_lang else None
+            self.voices[lang] = tts_mod.resolve_voice(tts_section, lang, preset)[1:]
+
+    def target(self, lang):
+        return self.router.target(lang) if self.router is not None else self.to_lang
+
+    # Called from scheduler threads
+    def send(self, msg, audio=None):
+        if not self.closed:
+            self.loop.call_soon_threadsafe(self._enqueue, msg, audio)
+
+    def _enqueue(self, msg, audio):
+        if audio is not None and self.outbox.qsize() >= self.send_queue:
+            self.stats["tts_dropped"] += 1
+            return
+        self.outbox.put_nowait((msg, audio))
+
+    def begin_phrase(self):
+        with self._lock:
+            self._inflight += 1
+
+    def end_phrase(self):
+        with self._lock:
+            self._inflight -= 1
+
+    @property
+    def inflight(self):
+        with self._lock:
+            return self._inflight
+
+
+class Scheduler:
+    """Shared ASR, MT and TTS stages working for every session."""
+
+    def __init__(self, cfg, asr, tts_engine, translator_for=get_translator, asr_threads=1):
+        server = cfg.get("server", {})
+        self.asr = asr
+        self.asr_threads = asr_threads
+        self.tts_engine = tts_engine
+        self.translator_for = translator_for     # (from_lang, to_lang) -> Translator
+        self.detect_sec = cfg.get("conversation", {}).get("detect_sec", 2.0)
+        self.batch_wait = server.get("mt_batch_wait_ms", 20) / 1000.0
+        self.max_batch = server.get("mt_max_batch", 32)
+        self.max_batch_size = cfg["translate"].get("max_batch_size", 16)
+
+        self.sessions = []
+        self._rr = {"asr": 0, "tts": 0}        # round-robin position per stage
+        self._mt_jobs = []
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        stages = [(self._asr_loop, f"server-asr-{i}") for i in range(self.asr_threads)]
+        for target, name in stages + [(self._mt_loop, "server-mt"), (self._tts_loop, "server-tts")]:
+            t = threading.Thread(target=target, name=name, daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self):
+        self._stop.set()
+        with self._wake:
+            self._wake.notify_all()
+        for t in self._threads:
+            t.join(timeout=2.0)
+
+    def add(self, session):
+        with self._lock:
+            self.sessions.append(session)
+
+    def remove(self, session):
+        session.closed = True
+        with self._lock:
+            if session in self.sessions:
+                self.sessions.remove(session)
+            self._mt_jobs = [job for job in self._mt_jobs if job["session"] is not session]
+
+    def notify(self):
+        with self._wake:
+            self._wake.notify_all()
+
+    def _next(self, stage, attr):
+        """(session, item) from the next session in round-robin order with work for `stage`, or (None, None)."""
+        with self._wake:
+            while not self._stop.is_set():
+                n = len(self.sessions)
+                for i in range(n):
+                    session = self.sessions[(self._rr[stage] + i) % n]
+                    if stage == "asr" and session.asr_busy:
+                        # A session's phrases are transcribed in order, one at a time
+                        continue
+                    try:
+                        item = getattr(session, attr).get(timeout=0)
+                    except queue.Empty:
+                        continue
+                    self._rr[stage] = (self._rr[stage] + i + 1) % n
+                    if stage == "asr":
+                        session.asr_busy = True
+                    return session, item
+                self._wake.wait(timeout=0.1)
+        return None, None
+
+    # ASR
+    def _asr_loop(self):
+        while not self._stop.is_set():
+            session, phrase = self._next("asr", "phrases")
+            if session is None:
+                continue
+            try:
+                self._transcribe(session, phrase)
+            except Exception as e:
+                session.send({"type": "error", "text": f"[ASR Error] {e}"})
+                session.end_phrase()
+            finally:
+                with self._wake:
+                    session.asr_busy = False
+                    self._wake.notify_all()
+
+    def _transcribe(self, session, phrase):
+        src = session.from_lang
+        if session.router is not None:
+            probs = self.asr.detect_language(phrase["pcm"], prefix_sec=self.detect_sec, sample_rate=session.sr)
+            src = session.router.route(probs, continued=phrase["continued"])
+
+        text = self.asr.transcribe_np(phrase["pcm"], language=src)["text"]
+        if phrase["continued"] and session.seam_text:
+            text = strip_seam_overlap(session.seam_text, text)
+        session.seam_text = text if phrase["cut"] else ""
+
+        session.send({"type": "final", "id": phrase["id"], "lang": src, "text": text, "end_sec": phrase["end_sec"]})
+        if not text or session.closed:
+            session.end_phrase()
+            return
+        with self._wake:
+            self._mt_jobs.append({"session": session, "id": phrase["id"], "text": text, "src": src,
+                                  "dst": session.target(src), "end_sec": phrase["end_sec"]})
+            self._wake.notify_all()
+
+    # MT
+    def _mt_loop(self):
+        while not self._stop.is_set():
+            with self._wake:
+                if not self._mt_jobs:
+                    self._wake.wait(timeout=0.1)
+                    continue
+                if len(self._mt_jobs) == 1:
+                    # Give other sessions' transcripts a moment to join this model call
+                    self._wake.wait(timeout=self.batch_wait)
+                jobs, self._mt_jobs = self._mt_jobs[:self.max_batch], self._mt_jobs[self.max_batch:]
+
+            # One model call per direction, then results go out in arrival order, so a
+            # conversation session's replies keep their order across directions
+            directions = {}
+            for job in jobs:
+                directions.setdefault((job["src"], job["dst"]), []).append(job)
+            for (src, dst), group in directions.items():
+                try:
+                    self._translate(src, dst, group)
+                except Exception as e:
+                    for job in group:
+                        job["error"] = e
+            for job in jobs:
+                try:
+                    if "error" in job:
+                        raise job["error"]
+                    self._deliver(job)
+                except Exception as e:
+                    if job.get("ended"):
+                        continue   # already closed (or handed to TTS) before the error
+                    job["session"].send({"type": "error", "text": f"[MT Error] {e}"})
+                    self._end_phrase(job)
+
+    @staticmethod
+    def _end_phrase(job):
+        job["ended"] = True
+        job["session"].end_phrase()
+
+    def _translate(self, src, dst, jobs):
+        """Translate one direction's jobs in one model call; each job gets its "translation"."""
+        split = [split_sentences(job["text"]) for job in jobs]
+        flat = [s for sentences in split for s in sentences]
+        translated = iter(self.translator_for(src, dst).translate_batch(flat, max_batch_size=self.max_batch_size))
+        for job, sentences in zip(jobs, split):
+            job["translation"] = " ".join(next(translated) for _ in sentences)
+
+    def _deliver(self, job):
+        session, text = job["session"], job["translation"]
+        session.send({"type": "translation", "id": job["id"], "lang": job["src"], "to": job["dst"], "text": text,
+                      "end_sec": job["end_sec"]})
+        if not session.speak or not text or session.closed:
+            self._end_phrase(job)
+            return
+        dropped = session.speech.dropped
+        # From here on _tts_loop (or the drop below) ends the phrase
+        job["ended"] = True
+        session.speech.put({"id": job["id"], "text": text, "lang": job["dst"]})
+        if session.speech.dropped > dropped:
+            # drop_oldest: the phrase pushed out will never be spoken
+            session.stats["tts_dropped"] += 1
+            session.end_phrase()
+        self.notify()
+
+    # TTS
+    def _tts_loop(self):
+        while not self._stop.is_set():
+            session, job = self._next("tts", "speech")
+            if session is None:
+                continue
+            try:
+                if job["lang"] not in session.voices:
+                    session.send({"type": "error", "text": f"[TTS Error] no voice for language '{job['lang']}'"})
+                    continue
+                voice_path, voice_config = session.voices[job["lang"]]
+                sample_rate = self.tts_engine.get_voice(voice_path, voice_config).config.sample_rate
+                chunks = list(self.tts_engine.synthesize(job["text"], voice_path, voice_config))
+                if chunks:
+                    pcm = np.concatenate(chunks).astype("<i2")
+                    session.send({"type": "tts", "id": job["id"], "sample_rate": sample_rate,
+                                  "samples": len(pcm)}, pcm.tobytes())
+            except Exception as e:
+                session.send({"type": "error", "text": f"[TTS Error] {e}"})
+            finally:
+                session.end_phrase()
+
+
+class TranslationServer:
+    """
+    Accepts sessions and feeds them to the shared Scheduler. `asr`,
+    `translator_for` and `tts_engine` stand in for the profile's models
+    (benchmarks/server_load.py --stub serves the fake engines this way);
+    `asr` may be an ASRPool, which transcribes asr.workers phrases at once.
+    """
+
+    def __init__(self, cfg, asr=None, translator_for=None, tts_engine=None):
+        server = cfg.get("server", {})
+        self.cfg = cfg
+        self.host = server.get("host", "127.0.0.1")
+        self.port = server.get("port", 8765)
+        self.max_clients = server.get("max_clients", 16)
+
+        configure_cache(**cfg["translate"].get("cache", {}))
+        workers = cfg["asr"].get("workers", 1)
+        if asr is None and workers > 1:
+            print(f"[Server] starting {workers} ASR worker processes…")
+            asr = ASRPool(cfg["asr"], workers=workers).start()
+        self.asr = asr or ASR(
+            model_size=cfg["asr"]["model_size"],
+            device=cfg["asr"]["device"],
+            compute_type=cfg["asr"].get("compute_type"),
+            language=cfg["asr"]["language"],
+            beam_size=cfg["asr"]["beam_size"],
+            temperature=cfg["asr"]["temperature"],
+            warm=cfg["asr"].get("warm_up", True),
+            cpu_threads=cfg["asr"].get("cpu_threads", 0),
+            on_progress=lambda text, loading: print(text),
+        )
+        self.tts_engine = tts_engine or tts_mod.TTSEngine(
+            max_voices=cfg.get("tts", {}).get("voice_cache_size", 3))
+        self.scheduler = Scheduler(cfg, self.asr, self.tts_engine, translator_for or get_translator,
+                                   asr_threads=getattr(self.asr, "workers", 1))
+        self._ids = itertools.count(1)
+
+    async def handler(self, ws):
+        if len(self.scheduler.sessions) >= self.max_clients:
+            await ws.send(json.dumps({"type": "error", "text": f"Server full ({self.max_clients} clients)"}))
+            return
+
+        session = Session(next(self._ids), self.cfg, asyncio.get_running_loop())
+        session.configure({})
+        self.scheduler.add(session)
+        writer = asyncio.create_task(self._writer(ws, session))
+        print(f"[Server] session {session.id} connected ({len(self.scheduler.sessions)} active)")
+        session.send({"type": "ready", "session": session.id, "sample_rate": session.sr,
+                      "pcm_format": self.cfg.get("server", {}).get("pcm_format", "s16le")})
+        ended = False
+        try:
+            async for message in ws:
+                if isinstance(message, bytes):
+                    session.started = True
+                    samples = np.frombuffer(message[:len(message) - len(message) % session.dtype.itemsize],
+                                            dtype=session.dtype)
+                    samples = samples.astype(np.float32) / 32768.0 if session.dtype.kind == "i" \
+                        else samples.astype(np.float32)
+                    for event in session.endpointer.push(samples):
+                        await self._submit(session, event)
+                    continue
+
+                msg = json.loads(message)
+                if msg.get("type") == "start" and not session.started:
+                    session.configure(msg)
+                elif msg.get("type") == "end":
+                    event = session.endpointer.flush()
+                    if event is not None:
+                        await self._submit(session, event)
+                    ended = True
+                    break
+
+            if ended:
+                while session.inflight > 0:
+                    await asyncio.sleep(0.05)
+                session.send({"type": "done"})
+        except Exception as e:
+            # A client that disconnects mid-stream lands here too
+            print(f"[Server] session {session.id}: {e}")
+        finally:
+            session.loop.call_soon_threadsafe(session.outbox.put_nowait, (None, None))
+            if ended:
+                await asyncio.gather(writer, return_exceptions=True)
+            else:
+                writer.cancel()
+            self.scheduler.remove(session)
+            s = session.stats
+            print(f"[Server] session {session.id} closed: {s['phrases']} phrases, {s['dropped']} dropped, "
+                  f"{s['tts_dropped']} TTS dropped ({len(self.scheduler.sessions)} active)")
+
+    async def _submit(self, session, event):
+        if event["type"] != "phrase" or not len(event["pcm"]):
+            return
+        if session.phrases.policy == "block":
+            # Backpressure: stop reading this client's socket until ASR catches up with it
+            while session.phrases.qsize() >= session.phrases.maxsize:
+                await asyncio.sleep(0.01)
+        phrase = {"id": session.phrase_idx, "pcm": event["pcm"], "cut": event["cut"],
+                  "continued": event["continued"], "end_sec": event["end"] / session.sr}
+        session.phrase_idx += 1
+        session.stats["phrases"] += 1
+        session.begin_phrase()
+        dropped = session.phrases.dropped
+        if not session.phrases.put(phrase, timeout=0) or session.phrases.dropped > dropped:
+            session.stats["dropped"] += 1
+            session.end_phrase()
+            session.send({"type": "dropped", "id": phrase["id"], "stage": "asr"})
+        self.scheduler.notify()
+
+    async def _writer(self, ws, session):
+        while True:
+            msg, audio = await session.outbox.get()
+            if msg is None:
+                return
+            await ws.send(json.dumps(msg))
+            if audio is not None:
+                await ws.send(audio)
+
+    async def serve(self, stop=None):
+        import websockets  # only the server needs it
+        self.scheduler.start()
+        try:
+            async with websockets.serve(self.handler, self.host, self.port, max_size=2 ** 22):
+                print(f"[Server] listening on ws://{self.host}:{self.port} "
+                      f"(max {self.max_clients} clients; Ctrl+C to stop)")
+                await (stop or asyncio.Future())
+        finally:
+            self.scheduler.stop()
+            self.tts_engine.close()
+            if isinstance(self.asr, ASRPool):
+                self.asr.close()
+
+
+def main():
+    cfg = load_config()
+    server = TranslationServer(cfg)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+    print("[Exit] Bye!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Audio sources other than the microphone, for headless runs, CI and
+reproducible sessions.
+
+Every source follows AudioIn's contract: it is a context manager and
+get_block() returns the next `block_seconds` of mono float32 audio at the
+pipeline's sample rate, shaped (blocksize, 1). Unlike the mic, a source can
+end: get_block() then returns None and the engine flushes what is left.
+
+`speed` paces the blocks: 1.0 hands them out in real time like the mic, 2.0
+twice as fast, 0 as fast as they are read. Sources that are not paced
+(`paced` is False) make the engine block on full queues instead of dropping
+phrases.
+
+Source specs (`--source` / audio.source):
+    mic                      the sounddevice microphone (AudioIn)
+    file:PATH or PATH        a WAV/FLAC/OGG file, resampled if needed
+    stdin                    raw PCM on standard input
+    tcp://HOST:PORT          raw PCM from the first client that connects
+    udp://HOST:PORT          raw PCM datagrams; an empty datagram ends the stream
+
+Raw PCM is little-endian int16 (or float32 with audio.source_format) mono at
+the pipeline's sample rate, e.g.
+    ffmpeg -i talk.mp3 -f s16le -ac 1 -ar 16000 - | python -m app.pipeline --source stdin
+"""
+import socket
+import sys
+import time
+
+import numpy as np
+
+from .audio_io import read_audio
+
+PCM_FORMATS = {"s16le": np.dtype("<i2"), "f32le": np.dtype("<f4")}
+
+
+class AudioSource:
+    """Base class: subclasses implement _read(n) returning up to n float32 samples, or None at the end."""
+
+    def __init__(self, samplerate, block_seconds, speed=1.0):
+        self.samplerate = samplerate
+        self.blocksize = int(samplerate * block_seconds)
+        self.speed = speed
+        self._t0 = None
+        self._blocks = 0
+
+    @property
+    def paced(self):
+        return bool(self.speed)
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def get_block(self):
+        block = self._read(self.blocksize)
+        if block is None:
+            return None
+        if len(block) < self.blocksize:
+            block = np.concatenate((block, np.zeros(self.blocksize - len(block), dtype=np.float32)))
+        self._pace()
+        return block.reshape(-1, 1)
+
+    def _pace(self):
+        now = time.perf_counter()
+        if self._t0 is None:
+            self._t0 = now
+        self._blocks += 1
+        if self.speed:
+            # Like the mic: a block is ready once its last sample has been "captured"
+            wait = self._t0 + self._blocks * self.blocksize / self.samplerate / self.speed - now
+            if wait > 0:
+                time.sleep(wait)
+
+    def _read(self, n):
+        raise NotImplementedError
+
+
+class FileSource(AudioSource):
+    """An audio file (anything soundfile reads), decoded and resampled up front."""
+
+    def __init__(self, path, samplerate, block_seconds, speed=1.0):
+        super().__init__(samplerate, block_seconds, speed)
+        self.path = path
+        self._audio = None
+        self._pos = 0
+
+    def open(self):
+        self._audio = read_audio(self.path, self.samplerate)
+        self._pos = 0
+
+    def _read(self, n):
+        if self._pos >= len(self._audio):
+            return None
+        block = self._audio[self._pos:self._pos + n]
+        self._pos += n
+        return block
+
+
+class _PCMSource(AudioSource):
+    """Raw PCM from a byte stream; _recv(nbytes) returns up to nbytes, b"" at the end."""
+
+    def __init__(self, samplerate, block_seconds, speed=0.0, pcm_format="s16le"):
+        super().__init__(samplerate, block_seconds, speed)
+        if pcm_format not in PCM_FORMATS:
+            raise ValueError(f"Unknown PCM format {pcm_format!r}; use one of {', '.join(PCM_FORMATS)}")
+        self.dtype = PCM_FORMATS[pcm_format]
+        self._pending = b""
+        self._ended = False
+
+    def _read(self, n):
+        want = n * self.dtype.itemsize
+        while len(self._pending) < want and not self._ended:
+            data = self._recv(want - len(self._pending))
+            if not data:
+                self._ended = True
+            self._pending += data
+        usable = len(self._pending) - len(self._pending) % self.dtype.itemsize
+        raw, self._pending = self._pending[:min(want, usable)], self._pending[min(want, usable):]
+        if not raw:
+            return None
+        samples = np.frombuffer(raw, dtype=self.dtype)
+        if self.dtype.kind == "i":
+            return samples.astype(np.float32) / 32768.0
+        return samples.astype(np.float32)
+
+    def _recv(self, nbytes):
+        raise NotImplementedError
+
+
+class StdinSource(_PCMSource):
+    def __init__(self, samplerate, block_seconds, speed=0.0, pcm_format="s16le", stream=None):
+        super().__init__(samplerate, block_seconds, speed, pcm_format)
+        self.stream = stream or sys.stdin.buffer
+
+    def _recv(self, nbytes):
+        return self.stream.read(nbytes)
+
+
+class SocketSource(_PCMSource):
+    """
+    Raw PCM over a local socket. TCP accepts one client and ends when it
+    disconnects; UDP reads datagrams and ends on an empty one. The source
+    listens on __enter__, so start it before the sender.
+    """
+
+    def __init__(self, url, samplerate, block_seconds, speed=0.0, pcm_format="s16le"):
+        super().__init__(samplerate, block_seconds, speed, pcm_format)
+        self.kind, self.address = parse_socket_url(url)
+        self._server = None
+        self._conn = None
+
+    def open(self):
+        if self.kind == "tcp":
+            self._server = socket.create_server(self.address)
+            self._conn, _ = self._server.accept()
+        else:
+            self._conn = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            # UDP has no flow control: a large buffer rides out a busy pipeline
+            self._conn.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+            self._conn.bind(self.address)
+
+    def close(self):
+        for s in (self._conn, self._server):
+            if s is not None:
+                s.close()
+        self._conn = self._server = None
+
+    def _recv(self, nbytes):
+        if self.kind == "tcp":
+            return self._conn.recv(nbytes)
+        # A datagram is read whole; anything past `nbytes` stays pending for the next block
+        data, _ = self._conn.recvfrom(65536)
+        return data
+
+
+def parse_socket_url(url):
+    """"tcp://host:port" / "udp://host:port" -> ("tcp" | "udp", (host, port))."""
+    kind, _, rest = url.partition("://")
+    host, _, port = rest.rpartition(":")
+    if kind not in ("tcp", "udp") or not port.isdigit():
+        raise ValueError(f"Bad socket source {url!r}; expected tcp://HOST:PORT or udp://HOST:PORT")
+    return kind, (host or "127.0.0.1", int(port))
+
+
+def open_source(spec, samplerate, block_seconds, speed=None, pcm_format="s16le"):
+    """
+    Source for a spec (see module docstring), or None for "mic". `speed`
+    defaults to real time for files and to unpaced for streams, whose
+    sender sets the pace.
+    """
+    if not spec or spec == "mic":
+        return None
+    if spec == "stdin":
+        return StdinSource(samplerate, block_seconds, speed=speed or 0.0, pcm_format=pcm_format)
+    if spec.startswith(("tcp://", "udp://")):
+        return SocketSource(spec, samplerate, block_seconds, speed=speed or 0.0, pcm_format=pcm_format)
+    path = spec[len("file:"):] if spec.startswith("file:") else spec
+    return FileSource(path, samplerate, block_seconds, speed=1.0 if speed is None else speed)
+
+
+def from_config(audio_cfg):
+    """open_source() for a profile's `audio` section."""
+    return open_source(audio_cfg.get("source", "mic"), audio_cfg["sample_rate"], audio_cfg["block_seconds"],
+                       speed=audio_cfg.get("source_speed"), pcm_format=audio_cfg.get("source_format", "s16le"))
@@ -0,0 +1,98 @@
+"""
+Startup profiling for `--profile-startup`.
+
+enable() wraps the import machinery and records how long every module
+takes to import the first time (including its own imports), plus named
+milestones such as "window shown". report() prints the breakdown, so a new
+heavy import on the startup path shows up immediately.
+"""
+import builtins
+import sys
+import threading
+import time
+
+_t0 = time.perf_counter()
+_enabled = False
+_original_import = builtins.__import__
+_lock = threading.Lock()
+_local = threading.local()
+_imports = []      # [thread name, depth, module, seconds] in start order
+_milestones = []   # (label, seconds since start)
+
+
+def requested(argv=None) -> bool:
+    return "--profile-startup" in (sys.argv if argv is None else argv)
+
+
+def _resolve(name, globals_, level):
+    if level and globals_:
+        package = globals_.get("__package__") or ""
+        base = package.rsplit(".", level - 1)[0] if level > 1 else package
+        return f"{base}.{name}" if name else base
+    return name
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    module = _resolve(name, globals, level)
+    loaded = sys.modules.get(module)
+    if loaded is not None:
+        # `from pkg import submodule` still loads the submodule the first time
+        missing = [x for x in (fromlist or ()) if x != "*" and not hasattr(loaded, x)]
+        if not missing:
+            return _original_import(name, globals, locals, fromlist, level)
+        module = ", ".join(f"{module}.{x}" for x in missing)
+
+    depth = getattr(_local, "depth", 0)
+    entry = [threading.current_thread().name, depth, module, None]
+    with _lock:
+        _imports.append(entry)
+    _local.depth = depth + 1
+    t0 = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        _local.depth = depth
+        entry[3] = time.perf_counter() - t0
+
+
+def enable():
+    """Start recording imports (idempotent)."""
+    global _enabled
+    if not _enabled:
+        _enabled = True
+        builtins.__import__ = _timed_import
+
+
+def maybe_enable(argv=None) -> bool:
+    """enable() if --profile-startup was passed; returns whether profiling is on."""
+    if requested(argv):
+        enable()
+    return _enabled
+
+
+def mark(label):
+    """Record a milestone (time since this module was imported)."""
+    if _enabled:
+        with _lock:
+            _milestones.append((label, time.perf_counter() - _t0))
+
+
+def report(min_ms=5.0, max_depth=2, file=None):
+    """Print imports slower than `min_ms` (nested up to `max_depth`) and the milestones."""
+    if not _enabled:
+        return
+    file = file or sys.stderr
+    with _lock:
+        imports, milestones = [tuple(e) for e in _imports], list(_milestones)
+
+    print("[startup] import time (cumulative, first import only):", file=file)
+    for thread, depth, module, sec in imports:
+        if sec is None or sec * 1e3 < min_ms or depth > max_depth:
+            continue
+        where = "" if thread == "MainThread" else f"  [{thread}]"
+        print(f"[startup] {sec * 1e3:9.1f}ms  {'  ' * depth}{module}{where}", file=file)
+
+    total = sum(sec for _, depth, _, sec in imports if depth == 0 and sec is not None)
+    print(f"[startup] {total * 1e3:9.1f}ms  total top-level imports", file=file)
+    for label, sec in milestones:
+        print(f"[startup] {sec * 1e3:9.1f}ms  {label}", file=file)
@@ -1,14 +1,53 @@
-from argostranslate import translate as T, package as P
+import atexit
+import hashlib
+import os
 import re
+import sqlite3
+import threading
+from collections import OrderedDict
 
-from .idioms_loader import load_idiom_dict
+from .idioms_loader import load_idiom_dict, idioms_path
+from .idiom_matcher import IdiomMatcher, normalize_quotes
 
-# Load idioms once at import time
-IDIOMS = load_idiom_dict()
+# Idiom dictionary section for each supported direction
+IDIOM_SECTIONS = {
+    ("en", "es"): "en_to_es",
+    ("es", "en"): "es_to_en",
+}
+
+# The cache's writer thread commits pending entries at least this often (and every `commit_every` puts)
+_COMMIT_SEC = 5.0
+
+# One precompiled matcher per direction, built on first use
+_idiom_matchers = None
+_idiom_lock = threading.Lock()
+
+
+def _argos_translate():
+    # argostranslate pulls in ctranslate2, sentencepiece, stanza…; import it only when translating
+    from argostranslate import translate
+    return translate
+
+
+def _argos_package():
+    from argostranslate import package
+    return package
+
+
+def _get_idiom_matchers():
+    global _idiom_matchers
+    with _idiom_lock:
+        if _idiom_matchers is None:
+            idioms = load_idiom_dict()
+            _idiom_matchers = {
+                pair: IdiomMatcher(idioms.get(section, {}))
+                for pair, section in IDIOM_SECTIONS.items()
+            }
+        return _idiom_matchers
 
 
 def ensure_pack(from_code, to_code):
-    packs = {(p.from_code, p.to_code) for p in P.get_installed_packages()}
+    packs = {(p.from_code, p.to_code) for p in _argos_package().get_installed_packages()}
     if (from_code, to_code) not in packs:
         raise RuntimeError(
             f"Argos package {from_code}->{to_code} is not installed. "
@@ -18,92 +57,388 @@ def ensure_pack(from_code, to_code):
         )
 
 
-def _normalize_quotes(s: str) -> str:
+def get_idiom_matcher(from_lang: str, to_lang: str):
     """
-    Normalize curly quotes to straight quotes so Whisper output and JSON keys match better.
+    Return the precompiled IdiomMatcher for this direction, or None if there
+    are no idioms for it.
     """
-    return (
-        s.replace("’", "'")
-         .replace("‘", "'")
-         .replace("“", '"')
-         .replace("”", '"')
+    matcher = _get_idiom_matchers().get((from_lang, to_lang))
+    if matcher is None or len(matcher) == 0:
+        return None
+    return matcher
+
+
+def cache_fingerprint() -> str:
+    """
+    Identify everything a cached translation depends on: the idiom
+    dictionary and the installed Argos version + language packages.
+    """
+    from importlib.metadata import version, PackageNotFoundError
+
+    h = hashlib.sha1()
+    h.update(idioms_path().read_bytes())
+    try:
+        h.update(version("argostranslate").encode())
+    except PackageNotFoundError:
+        h.update(b"argostranslate:unknown")
+    packs = sorted(
+        (p.from_code, p.to_code, str(getattr(p, "package_version", "")))
+        for p in _argos_package().get_installed_packages()
     )
+    h.update(repr(packs).encode())
+    return h.hexdigest()
 
 
-def _get_idiom_items(from_lang: str, to_lang: str):
+class TranslationCache:
     """
-    Return a sorted list of idioms for this direction:
-    items[i] = (normalized_idiom, idiom_translation).
+    Cache of finished translations keyed by (from_lang, to_lang, normalized text).
+
+    A size-bounded LRU lives in memory. With `persist_path`, entries are also
+    stored in SQLite so they survive restarts; the database is emptied when
+    `fingerprint` (see cache_fingerprint) no longer matches the one it was
+    written with. New entries are written by a background thread with its
+    own connection, `commit_every` at a time, at least every _COMMIT_SEC and
+    on close(), so a miss on the MT thread never waits for SQLite to sync and
+    no write transaction stays open (other processes can share the file; it
+    is in WAL mode). A crash loses at most the entries not written yet.
+    SQLite errors are reported and the cache carries on as a miss.
     """
-    if from_lang == "en" and to_lang == "es":
-        base = IDIOMS.get("en_to_es", {})
-    elif from_lang == "es" and to_lang == "en":
-        base = IDIOMS.get("es_to_en", {})
-    else:
-        return []
 
-    # Normalize keys so matching is easier
-    normalized = {}
-    for k, v in base.items():
-        norm_key = _normalize_quotes(k).lower()
-        normalized[norm_key] = v
+    def __init__(self, max_entries=512, persist_path=None, fingerprint=None, commit_every=32):
+        self.max_entries = max(0, int(max_entries))
+        self.persist_path = persist_path
+        self.commit_every = max(1, int(commit_every))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._mem = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._pending = {}         # entries the writer thread hasn't stored yet
+        self._wake = threading.Condition(self._lock)
+        self._closing = False
+        self._writer = None
+
+        if persist_path:
+            self._open_db(persist_path, fingerprint or cache_fingerprint())
+            self._writer = threading.Thread(target=self._write_loop, name="translation-cache", daemon=True)
+            self._writer.start()
+            atexit.register(self.close)
+
+    @staticmethod
+    def key(text, from_lang, to_lang):
+        # Quote style and whitespace don't change the translation
+        return from_lang, to_lang, " ".join(normalize_quotes(text).split())
 
-    # Sort by length so longer idioms match first
-    items = sorted(normalized.items(), key=lambda kv: len(kv[0]), reverse=True)
-    return items
+    def _open_db(self, path, fingerprint):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        db = sqlite3.connect(path, check_same_thread=False)
+        # Readers don't wait for the writer, in this process or another one
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            "from_lang TEXT, to_lang TEXT, source TEXT, translated TEXT, "
+            "PRIMARY KEY (from_lang, to_lang, source))"
+        )
+        row = db.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+        if row is None or row[0] != fingerprint:
+            # Idioms or Argos packages changed: old translations may be stale
+            db.execute("DELETE FROM translations")
+            db.execute("INSERT OR REPLACE INTO meta VALUES ('fingerprint', ?)", (fingerprint,))
+        db.commit()
+        self._db = db
+
+    def get(self, text, from_lang, to_lang):
+        """Return the cached translation or None."""
+        k = self.key(text, from_lang, to_lang)
+        with self._lock:
+            if k in self._mem:
+                self._mem.move_to_end(k)
+                self.hits += 1
+                return self._mem[k]
+
+            translated = self._pending.get(k)
+            if translated is None and self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT translated FROM translations WHERE from_lang = ? AND to_lang = ? AND source = ?", k
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    print(f"[Cache] read failed ({e}); treating it as a miss.")
+                    row = None
+                translated = row[0] if row is not None else None
+            if translated is not None:
+                self.hits += 1
+                self._remember(k, translated)
+                return translated
+
+            self.misses += 1
+            return None
+
+    def put(self, text, from_lang, to_lang, translated):
+        k = self.key(text, from_lang, to_lang)
+        with self._lock:
+            self._remember(k, translated)
+            if self._writer is not None:
+                self._pending[k] = translated
+                if len(self._pending) >= self.commit_every:
+                    self._wake.notify()
+
+    def _write_loop(self):
+        try:
+            db = sqlite3.connect(self.persist_path)
+        except sqlite3.Error as e:
+            print(f"[Cache] can't write {self.persist_path} ({e}); new translations stay in memory.")
+            with self._lock:
+                self._writer = None
+                self._pending.clear()
+            return
+        while True:
+            with self._lock:
+                if not self._closing and len(self._pending) < self.commit_every:
+                    self._wake.wait(timeout=_COMMIT_SEC)
+                batch, self._pending = self._pending, {}
+                closing = self._closing
+            if batch:
+                try:
+                    with db:   # one short transaction
+                        db.executemany("INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?)",
+                                       [(*k, v) for k, v in batch.items()])
+                except sqlite3.Error as e:
+                    print(f"[Cache] write failed ({e}); {len(batch)} translation(s) not persisted.")
+            if closing:
+                break
+        db.close()
+
+    def _remember(self, k, translated):
+        if self.max_entries == 0:
+            return
+        self._mem[k] = translated
+        self._mem.move_to_end(k)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._mem),
+            }
 
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            self._pending.clear()
+            if self._db is not None:
+                try:
+                    with self._db:
+                        self._db.execute("DELETE FROM translations")
+                except sqlite3.Error as e:
+                    print(f"[Cache] clear failed ({e}).")
 
-def _tag_idioms_with_items(text: str, items):
+    def close(self):
+        """Write the pending entries and close the database."""
+        atexit.unregister(self.close)
+        writer, self._writer = self._writer, None
+        if writer is not None:
+            with self._lock:
+                self._closing = True
+                self._wake.notify()
+            writer.join()
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+# Shared by every translate_text call; memory-only until configure_cache() says otherwise
+_cache = TranslationCache()
+
+
+def configure_cache(max_entries=512, persist_path=None, commit_every=32):
     """
-    Replace known idioms in `text` with __IDIOM_i__ placeholders,
-    where i is the index in `items`.
+    Replace the shared translation cache (keeps the current one if the
+    settings are unchanged, so repeated sessions keep their hits).
     """
-    new_text = _normalize_quotes(text)
-    lower_text = new_text.lower()
+    global _cache
+    if (_cache.max_entries == max(0, int(max_entries)) and _cache.persist_path == persist_path
+            and _cache.commit_every == max(1, int(commit_every))):
+        return _cache
+    _cache.close()
+    _cache = TranslationCache(max_entries=max_entries, persist_path=persist_path, commit_every=commit_every)
+    return _cache
 
-    for i, (idiom_norm, _idiom_trans) in enumerate(items):
-        idx = lower_text.find(idiom_norm)
-        if idx == -1:
-            continue
 
-        placeholder = f"__IDIOM_{i}__"
-        end = idx + len(idiom_norm)
+def cache_stats():
+    return _cache.stats()
 
-        # Replace in both strings so indices stay in sync
-        new_text = new_text[:idx] + placeholder + new_text[end:]
-        lower_text = lower_text[:idx] + placeholder.lower() + lower_text[end:]
 
-    return new_text
+# Sentence end: . ! ? or … (optionally followed by closing quotes/brackets), then whitespace
+_SENTENCE_END = re.compile(r'(?:(?<=[.!?…])|(?<=[.!?…]["\')\]»]))\s+')
 
 
-def translate_text(text, from_lang, to_lang):
+def split_sentences(text: str):
     """
-    Translate text using Argos, with idiom handling for EN↔ES.
+    Split text into sentences on terminal punctuation, keeping the punctuation.
     """
-    ensure_pack(from_lang, to_lang)
+    return [s.strip() for s in _SENTENCE_END.split(text.strip()) if s.strip()]
 
-    # 1) Idiom list for this direction
-    items = _get_idiom_items(from_lang, to_lang)
 
-    if not items:
-        # No idioms for this language pair -> normal Argos
-        return T.translate(text, from_lang, to_lang)
+class Translator:
+    """
+    Argos translation for one language pair, resolved once and reused.
 
-    # 2) Tag idioms in source
-    tagged_text = _tag_idioms_with_items(text, items)
+    Creating it checks that the package is installed and looks up the Argos
+    translation object; both are kept for the session, so translating a
+    phrase doesn't rescan installed packages or languages. Use
+    get_translator() to share one instance per pair.
+    """
 
-    # 3) Argos translation on tagged text
-    raw_translated = T.translate(tagged_text, from_lang, to_lang)
+    def __init__(self, from_lang, to_lang):
+        ensure_pack(from_lang, to_lang)
+        self.from_lang = from_lang
+        self.to_lang = to_lang
 
-    # 4) Restore idioms:
-    #    Accept "__IDIOM_24__", "_IDIOM_24_", "__IDIOM_24_", etc.
-    def repl(match: re.Match) -> str:
-        idx = int(match.group(1))
-        if 0 <= idx < len(items):
-            return items[idx][1]  # idiom_translation
-        return match.group(0)     # fallback
+        languages = {lang.code: lang for lang in _argos_translate().get_installed_languages()}
+        source, target = languages.get(from_lang), languages.get(to_lang)
+        self._translation = source.get_translation(target) if source and target else None
+        if self._translation is None:
+            raise RuntimeError(f"Argos has no translation {from_lang}->{to_lang}.")
 
-    # _+ before and after = "one or more underscores".
-    final_translated = re.sub(r"_+IDIOM_(\d+)_+", repl, raw_translated)
+        self.matcher = get_idiom_matcher(from_lang, to_lang)
+        self._batcher = None
+        self._batcher_checked = False
+        self._batcher_lock = threading.Lock()
 
-    return final_translated
+    def translate(self, text):
+        """
+        Translate text using Argos, with idiom handling for EN↔ES.
+        Repeated phrases are answered from the translation cache.
+        """
+        cached = _cache.get(text, self.from_lang, self.to_lang)
+        if cached is not None:
+            return cached
+
+        translated = self._translate_uncached(text)
+        _cache.put(text, self.from_lang, self.to_lang, translated)
+        return translated
+
+    def translate_sentences(self, text):
+        """
+        Yield (translated_sentence, is_last) one sentence at a time, so callers
+        (e.g. TTS) can start on the first sentence before the rest is translated.
+        """
+        sentences = split_sentences(text)
+        for i, sentence in enumerate(sentences):
+            yield self.translate(sentence), i == len(sentences) - 1
+
+    def translate_batch(self, texts, max_batch_size=32):
+        """
+        Translate many texts at once, e.g. a backlog of phrases. Idioms are
+        tagged/restored and the cache consulted per item, but everything that
+        needs the model goes through CTranslate2 in one call, decoded
+        `max_batch_size` sentences at a time (see app.argos_batch). The
+        result is the same as calling translate() on each text in turn.
+        """
+        results = [None] * len(texts)
+        todo = {}  # text -> indexes into texts (duplicates translated once)
+        for i, text in enumerate(texts):
+            cached = _cache.get(text, self.from_lang, self.to_lang)
+            if cached is not None:
+                results[i] = cached
+            else:
+                todo.setdefault(text, []).append(i)
+
+        raw = self._translate_many([self._tag(text) for text in todo], max_batch_size)
+        for (text, indexes), raw_translated in zip(todo.items(), raw):
+            translated = self._restore(raw_translated)
+            for i in indexes:
+                results[i] = translated
+            _cache.put(text, self.from_lang, self.to_lang, translated)
+        return results
+
+    def _translate_many(self, texts, max_batch_size):
+        """Raw Argos translations of `texts`: batched when the package allows it, else one by one."""
+        batcher = self._get_batcher(max_batch_size) if texts else None
+        if batcher is None:
+            return [self._translation.translate(t) for t in texts]
+        return batcher.translate(texts, max_batch_size)
+
+    def _get_batcher(self, max_batch_size):
+        with self._batcher_lock:
+            if not self._batcher_checked:
+                self._batcher_checked = True
+                from .argos_batch import make_batcher
+                try:
+                    self._batcher = make_batcher(self._translation, max_batch_size)
+                except Exception as e:
+                    print(f"[Translate] batched decoding off for {self.from_lang}->{self.to_lang} ({e}); "
+                          f"translating one text at a time.")
+            return self._batcher
+
+    def _tag(self, text):
+        if self.matcher is None:
+            return text
+        return self.matcher.tag(text)
+
+    def _restore(self, raw_translated):
+        matcher = self.matcher
+        if matcher is None:
+            return raw_translated
+
+        # Accept "__IDIOM_24__", "_IDIOM_24_", "__IDIOM_24_", etc.
+        def repl(match: re.Match) -> str:
+            idiom_trans = matcher.translation(int(match.group(1)))
+            if idiom_trans is not None:
+                return idiom_trans
+            return match.group(0)     # fallback
+
+        # _+ before and after = "one or more underscores".
+        return re.sub(r"_+IDIOM_(\d+)_+", repl, raw_translated)
+
+    def _translate_uncached(self, text):
+        # 1) Tag idioms in source, 2) Argos translation, 3) restore idioms
+        return self._restore(self._translation.translate(self._tag(text)))
+
+
+_translators = {}
+_translators_lock = threading.Lock()
+
+
+def get_translator(from_lang, to_lang):
+    """
+    Return the process-wide Translator for this pair, creating it on first use.
+    """
+    with _translators_lock:
+        translator = _translators.get((from_lang, to_lang))
+        if translator is None:
+            translator = Translator(from_lang, to_lang)
+            _translators[(from_lang, to_lang)] = translator
+        return translator
+
+
+def translate_sentences(text, from_lang, to_lang):
+    """
+    Sentence-by-sentence translation; see Translator.translate_sentences.
+    """
+    return get_translator(from_lang, to_lang).translate_sentences(text)
+
+
+def translate_text(text, from_lang, to_lang):
+    """
+    Translate text using Argos, with idiom handling for EN↔ES.
+    """
+    return get_translator(from_lang, to_lang).translate(text)
+
+
+def translate_batch(texts, from_lang, to_lang, max_batch_size=32):
+    """
+    Translate a list of texts; same output as translate_text() on each item.
+    """
+    return get_translator(from_lang, to_lang).translate_batch(texts, max_batch_size=max_batch_size)
@@ -1,71 +1,543 @@
-from piper.voice import PiperVoice
-import sounddevice as sd
+import queue
+import threading
+import time
+from collections import OrderedDict
+
 import numpy as np
 import soundfile as sf
 
-def speak(text, voice_path, voice_config, save_path=None):
+from . import metrics as metrics_mod
+from .queues import BoundedQueue
+
+# Playback is written in slices this long so a cancel (barge-in) takes effect quickly
+_CANCEL_SLICE_SEC = 0.1
+
+
+def _chunk_to_pcm(chunk):
     """
-        Speak the given text using Piper, and optionally save the TTS audio
-        to a WAV file if save_path is provided.
+    Extract mono int16 samples from a Piper AudioChunk (or None if the
+    chunk carries no audio we understand).
+    """
+    pcm = None  # default
 
-        text:        string to synthesize
-        voice_path:  path to the Piper voice .onnx file
-        voice_config:path to the Piper voice .json config
-        save_path:   optional path to write a .wav file for this TTS output
+    # Try int16 array sources first
+    if hasattr(chunk, "audio_int16_array"):
+        pcm = chunk.audio_int16_array
+    elif hasattr(chunk, "_audio_int16_array"):
+        pcm = chunk._audio_int16_array
+    # Try byte sources
+    elif hasattr(chunk, "audio_int16_bytes"):
+        pcm = np.frombuffer(chunk.audio_int16_bytes, dtype=np.int16)
+    elif hasattr(chunk, "_audio_int16_bytes"):
+        pcm = np.frombuffer(chunk._audio_int16_bytes, dtype=np.int16)
+    # Float fallback
+    elif hasattr(chunk, "audio_float_array"):
+        pcm = (np.array(chunk.audio_float_array) * 32767).astype(np.int16)
+
+    if pcm is None:
+        return None
+
+    # Normalize shape
+    return np.asarray(pcm).reshape(-1)
+
+
+class TTSEngine:
     """
-    # Load Piper voice
-    voice = PiperVoice.load(voice_path, config_path=voice_config)
-
-    # Prepare output audio stream
-    stream = sd.OutputStream(
-        samplerate=voice.config.sample_rate,
-        channels=1,
-        dtype="int16",
-    )
-    stream.start()
-
-    # Collect chunks for saving (if requested)
-    all_chunks = []  # list of np.int16 arrays
-
-    try:
-        # Piper version yields AudioChunk objects
-        for chunk in voice.synthesize(text):
-            pcm = None  # default
-
-            # Try int16 array sources first
-            if hasattr(chunk, "audio_int16_array"):
-                pcm = chunk.audio_int16_array
-            elif hasattr(chunk, "_audio_int16_array"):
-                pcm = chunk._audio_int16_array
-            # Try byte sources
-            elif hasattr(chunk, "audio_int16_bytes"):
-                pcm = np.frombuffer(chunk.audio_int16_bytes, dtype=np.int16)
-            elif hasattr(chunk, "_audio_int16_bytes"):
-                pcm = np.frombuffer(chunk._audio_int16_bytes, dtype=np.int16)
-            # Float fallback
-            elif hasattr(chunk, "audio_float_array"):
-                pcm = (np.array(chunk.audio_float_array) * 32767).astype(np.int16)
-
-            # If nothing worked, skip chunk
-            if pcm is None:
-                continue
+    Long-lived Piper engine.
+
+    Keeps the most recently used voices loaded (LRU keyed by voice/config
+    path) and reuses a single output stream across phrases, so only the first
+    phrase for a voice pays the ONNX load and audio-device open.
+    """
+
+    def __init__(self, max_voices=3):
+        self.max_voices = max(1, int(max_voices))
+        self._voices = OrderedDict()  # (voice_path, voice_config) -> PiperVoice
+        self._lock = threading.Lock()
+        self._stream = None
+        self._stream_rate = None
+
+    def get_voice(self, voice_path, voice_config):
+        """Return a loaded PiperVoice, loading it (and evicting the LRU voice) if needed."""
+        key = (voice_path, voice_config)
+        with self._lock:
+            voice = self._voices.get(key)
+            if voice is not None:
+                self._voices.move_to_end(key)
+                return voice
+
+        from piper.voice import PiperVoice  # onnxruntime: imported on first voice load
+        voice = PiperVoice.load(voice_path, config_path=voice_config)
+
+        with self._lock:
+            self._voices[key] = voice
+            self._voices.move_to_end(key)
+            while len(self._voices) > self.max_voices:
+                self._voices.popitem(last=False)
+        return voice
+
+    def loaded_voices(self):
+        with self._lock:
+            return list(self._voices.keys())
+
+    def _get_stream(self, sample_rate):
+        """Return the shared output stream, reopening it only if the sample rate changes."""
+        if self._stream is not None and self._stream_rate == sample_rate:
+            return self._stream
+
+        import sounddevice as sd
+        self._close_stream()
+        stream = sd.OutputStream(
+            samplerate=sample_rate,
+            channels=1,
+            dtype="int16",
+        )
+        stream.start()
+        self._stream = stream
+        self._stream_rate = sample_rate
+        return stream
 
-            # Normalize shape
-            pcm = np.asarray(pcm).reshape(-1)
+    def _close_stream(self):
+        if self._stream is not None:
+            try:
+                self._stream.stop()
+                self._stream.close()
+            finally:
+                self._stream = None
+                self._stream_rate = None
 
-            if pcm.size > 0:
+    def synthesize(self, text, voice_path, voice_config):
+        """Yield int16 PCM chunks (one per Piper sentence) for `text`."""
+        if not text.strip():
+            return
+        voice = self.get_voice(voice_path, voice_config)
+        for chunk in voice.synthesize(text):
+            pcm = _chunk_to_pcm(chunk)
+            if pcm is not None and pcm.size > 0:
+                yield pcm
+
+    def play(self, pcm, sample_rate, cancel_event=None):
+        """
+        Write int16 samples to the shared output stream. Returns True if
+        `cancel_event` cut playback short.
+        """
+        stream = self._get_stream(sample_rate)
+        try:
+            if cancel_event is None:
                 stream.write(pcm)
+                return False
+
+            slice_len = max(1, int(sample_rate * _CANCEL_SLICE_SEC))
+            for start in range(0, pcm.size, slice_len):
+                if cancel_event.is_set():
+                    return True
+                stream.write(pcm[start:start + slice_len])
+            return False
+        except Exception:
+            # A failed write can leave the device in a bad state; reopen next time
+            self._close_stream()
+            raise
+
+    def speak(self, text, voice_path, voice_config, save_path=None, cancel_event=None):
+        """
+        Speak `text` on the shared output stream, optionally saving the TTS
+        audio to a WAV file. If `cancel_event` is set during playback, the
+        remaining audio is skipped.
+
+        Returns a dict with timings:
+            first_audio_sec: time from call to the first chunk reaching the device
+            total_sec:       time from call to the end of playback
+            samples:         number of samples played
+            cancelled:       True if playback was cut short by cancel_event
+        """
+        t0 = time.perf_counter()
+        voice = self.get_voice(voice_path, voice_config)
+        sample_rate = voice.config.sample_rate
+        self._get_stream(sample_rate)
+
+        first_audio_sec = None
+        samples = 0
+        cancelled = False
+
+        # Collect chunks for saving (if requested)
+        all_chunks = []  # list of np.int16 arrays
+
+        try:
+            for pcm in self.synthesize(text, voice_path, voice_config):
+                if cancel_event is not None and cancel_event.is_set():
+                    cancelled = True
+                    break
+                if first_audio_sec is None:
+                    first_audio_sec = time.perf_counter() - t0
+
+                cancelled = self.play(pcm, sample_rate, cancel_event)
+                samples += pcm.size
 
                 # If we are saving, keep a copy
                 if save_path is not None:
                     all_chunks.append(pcm.copy())
-    finally:
-        stream.stop()
-        stream.close()
+                if cancelled:
+                    break
+        finally:
+            # After playback, write to file if requested
+            if save_path is not None and all_chunks:
+                _save_wav(save_path, all_chunks, sample_rate)
+
+        return {
+            "first_audio_sec": first_audio_sec,
+            "total_sec": time.perf_counter() - t0,
+            "samples": samples,
+            "cancelled": cancelled,
+        }
+
+    def close(self):
+        self._close_stream()
+        with self._lock:
+            self._voices.clear()
+
+
+def _save_wav(path, chunks, sample_rate):
+    full_pcm = np.concatenate(chunks)
+    # full_pcm is int16, so write directly as PCM_16
+    sf.write(path, full_pcm, sample_rate, subtype="PCM_16")
+
+
+class _PhraseSlot:
+    """The sentence jobs of one phrase, queued in TTSWorker as one item."""
+
+    def __init__(self, phrase_id, cancel):
+        self.phrase_id = phrase_id
+        self.cancel = cancel
+        self.sentences = queue.Queue()
+        self._discarded = False
+        self._lock = threading.Lock()
+
+    def add(self, job):
+        """Add a sentence job; False once the phrase has been discarded."""
+        with self._lock:
+            if self._discarded:
+                return False
+            self.sentences.put(job)
+            return True
+
+    def discard(self):
+        """Take no more jobs; returns the ones still waiting."""
+        with self._lock:
+            self._discarded = True
+            jobs = []
+            while True:
+                try:
+                    jobs.append(self.sentences.get_nowait())
+                except queue.Empty:
+                    return jobs
+
+
+class TTSWorker:
+    """
+    Speaks queued text in order without blocking audio capture.
+
+    Two threads form a small pipeline: the synthesis thread turns queued
+    jobs into audio while the playback thread plays the previous one, so
+    synthesis of sentence N+1 overlaps playback of sentence N.
+
+    A phrase may be submitted as several sentence jobs sharing a
+    `phrase_id`, ending with the job marked `final`; `save_path` collects the
+    audio of all of them into one WAV, written when the final job has played.
+
+    Phrases wait in a bounded queue, all sentences of a phrase in one slot,
+    so `max_queue` counts phrases and a phrase is spoken whole or not at all.
+    When playback falls behind, `drop_policy` decides which phrase is
+    discarded ("drop_oldest" or "drop_newest"); sentences that arrive later
+    for a discarded phrase are discarded too. flush() implements barge-in:
+    pending phrases are dropped and whatever is being synthesized or played
+    is cut short.
+
+    on_event receives the same message dicts the GUI queue uses
+    ({"type": "status"|"log", "text": ...}). `metrics` (app.metrics.Metrics)
+    gets tts_submit / tts_start / tts_first_chunk / tts_end per phrase and
+    closes the phrase once its final job has played, or as "cancelled" /
+    "dropped" / "error" when it never will. `recorder`
+    (app.recorder.SessionRecorder) gets every chunk played for a phrase.
+    """
+
+    def __init__(self, engine, max_queue=3, drop_policy="drop_oldest", on_event=None, metrics=None,
+                 recorder=None):
+        if drop_policy == "block":
+            raise ValueError("TTSWorker must not block the capture loop; use drop_oldest or drop_newest")
+        self.engine = engine
+        self.jobs = BoundedQueue(max_queue, drop_policy, on_drop=self._dropped)
+        self.on_event = on_event or (lambda msg: None)
+        self.metrics = metrics or metrics_mod.DISABLED
+        self.recorder = recorder
+
+        # Synthesized audio waiting for the speaker; small so synthesis runs at most a sentence ahead
+        self._audio = queue.Queue(maxsize=2)
+        # Replaced on every flush(); each job keeps the event that was current when it was submitted
+        self._cancel = threading.Event()
+        self._stop = threading.Event()
+        self._submit_lock = threading.Lock()
+        self._open = None          # slot of the phrase still being submitted
+        self._current = None       # slot the synthesis thread is working on
+        self._synth_busy = threading.Event()
+        self._play_busy = threading.Event()
 
-        # After playback, write to file if requested
-        if save_path is not None and all_chunks:
-            full_pcm = np.concatenate(all_chunks)
-            # full_pcm is int16, so write directly as PCM_16
-            sf.write(save_path, full_pcm, voice.config.sample_rate, subtype="PCM_16")
+        self._threads = [
+            threading.Thread(target=self._synth_loop, name="tts-synth", daemon=True),
+            threading.Thread(target=self._play_loop, name="tts-play", daemon=True),
+        ]
 
+    def start(self):
+        for t in self._threads:
+            t.start()
+        return self
+
+    @property
+    def busy(self):
+        """True while anything is queued, being synthesized or playing."""
+        return (self._synth_busy.is_set() or self._play_busy.is_set() or self._current is not None
+                or not self.jobs.empty() or not self._audio.empty())
+
+    def submit(self, text, voice_path, voice_config, save_path=None, phrase_id=None, final=True):
+        """Queue text for playback. Returns False if it was dropped."""
+        job = {
+            "text": text, "voice_path": voice_path, "voice_config": voice_config,
+            "save_path": save_path, "phrase_id": phrase_id, "final": final,
+            "cancel": self._cancel, "t_submit": time.perf_counter(),
+        }
+        self.metrics.event(phrase_id, "tts_submit")
+        with self._submit_lock:
+            slot = self._open
+            if slot is None or phrase_id is None or slot.phrase_id != phrase_id or slot.cancel is not job["cancel"]:
+                slot = _PhraseSlot(phrase_id, job["cancel"])
+                self.jobs.put(slot)    # may drop this phrase or an older one (see _dropped)
+            accepted = slot.add(job)
+            self._open = None if final else slot
+        if not accepted:
+            self._abandon(job, "dropped")
+        return accepted
+
+    def _dropped(self, slot):
+        # Called by the job queue for a phrase its policy discarded
+        self.on_event({"type": "log", "text": "[TTS] Falling behind; dropped phrase."})
+        for job in slot.discard():
+            self._abandon(job, "dropped")
+
+    def flush(self):
+        """Barge-in: drop every pending phrase and stop the current one."""
+        with self._submit_lock:
+            cancel, self._cancel = self._cancel, threading.Event()
+            cancel.set()
+            self._open = None
+        removed = 0
+        while True:
+            try:
+                slot = self.jobs.get(timeout=0)
+            except queue.Empty:
+                break
+            removed += 1
+            for job in slot.discard():
+                self._abandon(job, "cancelled")
+        while True:
+            try:
+                job, pcm, _ = self._audio.get_nowait()
+            except queue.Empty:
+                break
+            if pcm is None:
+                self._abandon(job, "cancelled")
+        return removed
+
+    def _abandon(self, job, outcome):
+        # The job's end marker will never reach the player, so close its phrase here
+        if job["final"]:
+            self.metrics.finish(job["phrase_id"], outcome=outcome)
+
+    def _put_audio(self, item, cancel):
+        # Block while the speaker is behind, but give up on flush/stop
+        while not (cancel.is_set() or self._stop.is_set()):
+            try:
+                self._audio.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _synth_loop(self):
+        while not self._stop.is_set():
+            try:
+                slot = self.jobs.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            self._current = slot
+            try:
+                while not self._stop.is_set():
+                    try:
+                        job = slot.sentences.get(timeout=0.1)
+                    except queue.Empty:
+                        with self._submit_lock:
+                            # Flushed, or the phrase ended without a final job: nothing more is coming
+                            if slot.sentences.empty() and (slot.cancel.is_set() or slot is not self._open):
+                                break
+                        continue
+                    self._synthesize(job)
+                    if job["final"]:
+                        break
+            finally:
+                outcome = "cancelled" if slot.cancel.is_set() or self._stop.is_set() else "dropped"
+                for job in slot.discard():
+                    self._abandon(job, outcome)
+                self._current = None
+
+    def _synthesize(self, job):
+        cancel = job["cancel"]
+        if cancel.is_set():
+            self._abandon(job, "cancelled")
+            return
+
+        self._synth_busy.set()
+        self.metrics.event(job["phrase_id"], "tts_start")
+        outcome = "cancelled"
+        try:
+            sample_rate = self.engine.get_voice(job["voice_path"], job["voice_config"]).config.sample_rate
+            for pcm in self.engine.synthesize(job["text"], job["voice_path"], job["voice_config"]):
+                if not self._put_audio((job, pcm, sample_rate), cancel):
+                    break
+            # End-of-job marker so the player knows when to save and close the phrase
+            if self._put_audio((job, None, sample_rate), cancel):
+                outcome = None
+        except Exception as e:
+            outcome = "error"
+            self.on_event({"type": "log", "text": f"[TTS Error] {e}"})
+        finally:
+            if outcome is not None:
+                self._abandon(job, outcome)
+            self._synth_busy.clear()
+
+    def _play_loop(self):
+        last_phrase = object()
+        save_path, save_chunks, save_rate = None, [], None
+
+        def write_pending():
+            nonlocal save_path, save_chunks
+            if save_path is not None and save_chunks:
+                try:
+                    _save_wav(save_path, save_chunks, save_rate)
+                    self.on_event({"type": "log", "text": f"Saved TTS audio: {save_path}"})
+                except Exception as e:
+                    self.on_event({"type": "log", "text": f"[TTS Error] {e}"})
+            save_path, save_chunks = None, []
+
+        while not self._stop.is_set():
+            try:
+                job, pcm, sample_rate = self._audio.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            if job["save_path"] != save_path:
+                write_pending()
+                save_path, save_rate = job["save_path"], sample_rate
+
+            if pcm is None:
+                if job["final"]:
+                    write_pending()
+                    self.metrics.event(job["phrase_id"], "tts_end")
+                    self.metrics.finish(job["phrase_id"])
+                if self.jobs.empty() and self._audio.empty() and not self._synth_busy.is_set():
+                    self.on_event({"type": "status", "text": "Running…"})
+                continue
+
+            cancel = job["cancel"]
+            if cancel.is_set():
+                continue
+
+            # First audio of a new phrase: report time from submit to sound
+            if job["phrase_id"] is None or job["phrase_id"] != last_phrase:
+                last_phrase = job["phrase_id"]
+                self.metrics.event(job["phrase_id"], "tts_first_chunk")
+                self.on_event({"type": "status", "text": "Speaking…"})
+                self.on_event({"type": "log", "phrase_id": job["phrase_id"],
+                               "text": f"[TTS] first audio {time.perf_counter() - job['t_submit']:.2f}s"})
+
+            self._play_busy.set()
+            try:
+                cancelled = self.engine.play(pcm, sample_rate, cancel)
+                if save_path is not None:
+                    save_chunks.append(pcm.copy())
+                if self.recorder is not None and job["phrase_id"] is not None and not cancelled:
+                    self.recorder.add(job["phrase_id"], "tts", pcm, sample_rate)
+                if cancelled:
+                    self.on_event({"type": "log", "text": "[TTS] Interrupted (barge-in)."})
+            except Exception as e:
+                self.on_event({"type": "log", "text": f"[TTS Error] {e}"})
+            finally:
+                self._play_busy.clear()
+
+        write_pending()
+
+    def close(self, timeout=2.0):
+        """Stop the worker; the job in progress is cancelled."""
+        self.flush()
+        self._stop.set()
+        for t in self._threads:
+            if t.is_alive():
+                t.join(timeout=timeout)
+
+
+def resolve_voice(tts_section, lang, preset_id=None):
+    """
+    Pick the voice for `lang` from the profile's tts section.
+
+    Returns (preset, voice_path, voice_config): the preset with `preset_id`
+    (or the first preset for the language), falling back to the section's
+    voice_path/voice_config when there is none (preset is then None).
+    """
+    # Base fallback
+    voice_path = tts_section.get("voice_path")
+    voice_cfg = tts_section.get("voice_config")
+
+    # Try to resolve from presets
+    presets_by_lang = tts_section.get("presets", {})
+    lang_presets = presets_by_lang.get(lang, []) if isinstance(presets_by_lang, dict) else []
+
+    chosen = None
+    if preset_id:
+        for p in lang_presets:
+            if p.get("id") == preset_id:
+                chosen = p
+                break
+
+    # If no preset explicitly chosen (edge case), pick first for that language
+    if chosen is None and lang_presets:
+        chosen = lang_presets[0]
+
+    if chosen is not None:
+        voice_path = chosen.get("voice_path", voice_path)
+        voice_cfg = chosen.get("voice_config", voice_cfg)
+
+    return chosen, voice_path, voice_cfg
+
+
+_default_engine = None
+
+
+def get_default_engine():
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = TTSEngine()
+    return _default_engine
+
+
+def speak(text, voice_path, voice_config, save_path=None):
+    """
+        Speak the given text using Piper, and optionally save the TTS audio
+        to a WAV file if save_path is provided.
+
+        Uses a shared TTSEngine, so the voice and output stream stay open
+        between calls.
+
+        text:        string to synthesize
+        voice_path:  path to the Piper voice .onnx file
+        voice_config:path to the Piper voice .json config
+        save_path:   optional path to write a .wav file for this TTS output
+    """
+    return get_default_engine().speak(text, voice_path, voice_config, save_path=save_path)
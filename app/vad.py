@@ -1,23 +1,150 @@
+import math
+
 import numpy as np
 
 def energy_vad(block: np.ndarray, gate: float) -> bool:
     # block: mono float32 [-1,1]
     return float(np.mean(block**2)) > gate
 
+
+def float_to_pcm16(block: np.ndarray) -> np.ndarray:
+    """Mono float32 [-1,1] → int16, in one vectorized pass."""
+    return (np.clip(block.reshape(-1), -1.0, 1.0) * 32767.0).astype(np.int16)
+
+
+class _FrameVAD:
+    """
+    Shared frame handling for the VADs below.
+
+    Each block is cut into `frame_ms` frames (samples left over at the end of
+    a block are carried into the next one). Subclasses decide speech per
+    frame in raw_mask(); speech_mask() smooths those decisions: speech starts
+    after `onset_frames` consecutive speech frames and keeps going for
+    `hangover_frames` non-speech frames after the last one.
+    """
+
+    def __init__(self, sample_rate, frame_ms, onset_frames, hangover_frames):
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self.frame_len = sample_rate * frame_ms // 1000
+        self.onset_frames = max(1, int(onset_frames))
+        self.hangover_frames = max(0, int(hangover_frames))
+        self.reset()
+
+    def reset(self):
+        self._carry = None
+        self._triggered = False
+        self._speech_run = 0
+        self._silence_run = 0
+
+    @property
+    def carry_samples(self) -> int:
+        """Samples waiting for the next block to complete a frame."""
+        return 0 if self._carry is None else self._carry.size
+
+    def _frames(self, samples: np.ndarray) -> np.ndarray:
+        """(n_frames, frame_len) view of carry + samples; keeps the remainder as the new carry."""
+        if self._carry is not None and self._carry.size:
+            samples = np.concatenate((self._carry, samples))
+        n_frames = samples.size // self.frame_len
+        used = n_frames * self.frame_len
+        self._carry = samples[used:].copy()
+        return samples[:used].reshape(n_frames, self.frame_len)
+
+    def raw_mask(self, block: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def speech_mask(self, block: np.ndarray) -> np.ndarray:
+        """Smoothed speech/non-speech flag for every complete frame."""
+        raw = self.raw_mask(block)
+        mask = np.zeros_like(raw)
+        for i, is_speech in enumerate(raw):
+            if is_speech:
+                self._speech_run += 1
+                self._silence_run = 0
+            else:
+                self._speech_run = 0
+                self._silence_run += 1
+
+            if not self._triggered and self._speech_run >= self.onset_frames:
+                self._triggered = True
+            elif self._triggered and self._silence_run > self.hangover_frames:
+                self._triggered = False
+
+            mask[i] = self._triggered
+        return mask
+
+    def is_speech(self, block: np.ndarray) -> bool:
+        # Any smoothed speech frame in the block counts
+        return bool(self.speech_mask(block).any())
+
+
+class AdaptiveEnergyVAD(_FrameVAD):
+    """
+    Per-frame energy VAD with an adaptive noise floor.
+
+    A frame is speech when its energy is `snr_db` above the noise floor and
+    above `min_gate` (the old fixed `energy_gate`, now only a lower bound).
+    The floor drops at once to the quietest frame and rises towards the
+    non-speech frames with a time constant of `floor_rise_sec`, so it tracks
+    changing background noise without climbing onto sustained speech.
+    """
+
+    def __init__(self, sample_rate=16000, frame_ms=30, min_gate=0.0005, snr_db=9.0,
+                 floor_rise_sec=10.0, onset_frames=2, hangover_frames=8):
+        self.min_gate = min_gate
+        self.snr = 10.0 ** (snr_db / 10.0)
+        self.floor_rise_sec = floor_rise_sec
+        super().__init__(sample_rate, frame_ms, onset_frames, hangover_frames)
+
+    def reset(self):
+        super().reset()
+        self.noise_floor = None
+
+    def raw_mask(self, block: np.ndarray) -> np.ndarray:
+        frames = self._frames(np.asarray(block, dtype=np.float32).reshape(-1))
+        if not len(frames):
+            return np.zeros(0, dtype=bool)
+        energy = np.mean(frames * frames, axis=1)
+
+        quietest = float(energy.min())
+        if self.noise_floor is None or quietest < self.noise_floor:
+            self.noise_floor = quietest
+        mask = energy > max(self.min_gate, self.noise_floor * self.snr)
+
+        # Let the floor rise slowly towards the non-speech frames; when the whole
+        # block is speech, ten times slower, so a lasting rise in noise is still learned
+        block_sec = len(frames) * self.frame_len / self.sample_rate
+        quiet = energy[~mask]
+        if quiet.size:
+            target, tau = float(quiet.mean()), self.floor_rise_sec
+        else:
+            target, tau = quietest, self.floor_rise_sec * 10.0
+        self.noise_floor += (1.0 - math.exp(-block_sec / tau)) * (target - self.noise_floor)
+        return mask
+
+
 # Optional: WebRTC VAD for better results on noisy audio
-class WebRTCVADWrapper:
-    def __init__(self, sample_rate=16000, aggressiveness=2):
+class WebRTCVADWrapper(_FrameVAD):
+    """Frame-based WebRTC VAD; webrtcvad only accepts 10/20/30 ms frames."""
+
+    SAMPLE_RATES = (8000, 16000, 32000, 48000)
+    FRAME_MS = (10, 20, 30)
+
+    def __init__(self, sample_rate=16000, aggressiveness=2, frame_ms=30, onset_frames=2, hangover_frames=8):
         import webrtcvad
+        if sample_rate not in self.SAMPLE_RATES:
+            raise ValueError(f"webrtcvad supports sample rates {self.SAMPLE_RATES}, got {sample_rate}")
+        if frame_ms not in self.FRAME_MS:
+            raise ValueError(f"webrtcvad supports frames of {self.FRAME_MS} ms, got {frame_ms}")
+
         self.vad = webrtcvad.Vad(aggressiveness)
-        self.sample_rate = sample_rate
+        super().__init__(sample_rate, frame_ms, onset_frames, hangover_frames)
 
-    def is_speech(self, block: np.ndarray) -> bool:
-        # Convert float32 [-1,1] to 16-bit PCM and ensure 20/30 ms frames
-        import struct
-        pcm16 = np.clip(block.squeeze() * 32768.0, -32768, 32767).astype(np.int16).tobytes()
-        # Assume block length was set from block_seconds; for a quick start
-        # we just feed as one chunk; for best results, split into 20 ms frames.
-        try:
-            return self.vad.is_speech(pcm16, self.sample_rate)
-        except Exception:
-            return False
+    def raw_mask(self, block: np.ndarray) -> np.ndarray:
+        """Unsmoothed WebRTC decision for every complete frame in carry + block."""
+        frames = self._frames(float_to_pcm16(block))
+        mask = np.zeros(len(frames), dtype=bool)
+        for i in range(len(frames)):
+            mask[i] = self.vad.is_speech(frames[i].tobytes(), self.sample_rate)
+        return mask
@@ -0,0 +1,116 @@
+# Scaling of the multi-process ASR pool (app/asr_pool.py): the same phrases
+# are transcribed by 1..N worker processes, all submitted at once like N busy
+# streams, and throughput is compared with one worker.
+#
+#   throughput  seconds of audio transcribed per wall-clock second
+#   speedup     throughput / throughput with 1 worker
+#   latency     submit -> result per phrase (includes waiting behind other phrases)
+#   handoff     copy into shared memory + submit, per phrase, in the parent
+#
+# Each worker gets --cpu-threads CTranslate2 threads (default: cores // workers).
+# Model loading is not timed. --stub runs FakeWhisperModel in the workers;
+# with --spin it burns CPU instead of sleeping, so it only scales with free cores.
+#
+#   python -m benchmarks.asr_pool_scaling recordings/*.wav --max-workers 4
+#   python -m benchmarks.asr_pool_scaling --stub --spin --max-workers 4 --json scaling.json
+import argparse
+import functools
+import glob
+import json
+import os
+import time
+
+import yaml
+
+from app.asr_pool import ASRPool, make_asr
+from app.audio_io import read_audio
+from app.endpointer import make_endpointer
+from benchmarks.pipeline_latency import summarize, git_revision, synthetic_fixture
+
+
+def split_phrases(audio, cfg):
+    """Phrases of a recording, cut by the live pipeline's endpointer."""
+    sr = cfg["audio"]["sample_rate"]
+    endpointer = make_endpointer(cfg["vad"], sr)
+    events = []
+    for i in range(0, len(audio), sr):
+        events += endpointer.push(audio[i:i + sr])
+    last = endpointer.flush()
+    if last is not None:
+        events.append(last)
+    return [e["pcm"] for e in events if e["type"] == "phrase" and len(e["pcm"])]
+
+
+def run(phrases, workers, cpu_threads, cfg, args):
+    sr = cfg["audio"]["sample_rate"]
+    if args.stub:
+        from benchmarks.fakes import make_fake_asr
+        factory = functools.partial(make_fake_asr, rtf=args.asr_rtf, sample_rate=sr, spin=args.spin)
+    else:
+        factory = functools.partial(make_asr, {**cfg["asr"], "cpu_threads": cpu_threads})
+
+    with ASRPool(cfg["asr"], workers=workers, factory=factory) as pool:
+        latencies, handoff, done = [], [], []
+        t0 = time.perf_counter()
+        futures = []
+        for pcm in phrases:
+            t = time.perf_counter()
+            future = pool.submit(pcm)
+            handoff.append(time.perf_counter() - t)
+            future.add_done_callback(lambda f, t=t: done.append(time.perf_counter() - t))
+            futures.append(future)
+        texts = [f.result()["text"] for f in futures]
+        wall = time.perf_counter() - t0
+        latencies = list(done)
+
+    audio_sec = sum(len(p) for p in phrases) / sr
+    return {"workers": workers, "cpu_threads": cpu_threads, "wall_sec": wall, "throughput": audio_sec / wall,
+            "phrases": len(texts), "empty": sum(1 for t in texts if not t),
+            "latency": summarize(latencies), "handoff": summarize(handoff)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("wavs", nargs="*", help="recordings to split into phrases (default: a synthetic fixture)")
+    parser.add_argument("--profile", default="config/cpu_safe.yaml")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--cpu-threads", type=int, default=None, help="per worker (default: cores // workers)")
+    parser.add_argument("--repeat", type=int, default=2, help="submit every phrase this many times")
+    parser.add_argument("--json", default=None, help="write the results here")
+    parser.add_argument("--stub", action="store_true", help="fake Whisper model in the workers")
+    parser.add_argument("--spin", action="store_true", help="stub burns CPU instead of sleeping")
+    parser.add_argument("--asr-rtf", type=float, default=0.15)
+    args = parser.parse_args()
+
+    with open(args.profile, "r", encoding="utf-8") as f:
+        cfg = yaml.safe_load(f)
+    if not args.stub and cfg["asr"]["device"] == "auto":
+        from app.config import cuda_available
+        cfg["asr"]["device"] = "cuda" if cuda_available() else "cpu"
+    sr = cfg["audio"]["sample_rate"]
+
+    wavs = [p for pattern in args.wavs for p in sorted(glob.glob(pattern))]
+    recordings = [read_audio(p, sr) for p in wavs] or [synthetic_fixture(sr)]
+    phrases = [pcm for audio in recordings for pcm in split_phrases(audio, cfg)] * args.repeat
+    cores = os.cpu_count() or 1
+    print(f"{len(phrases)} phrases, {sum(len(p) for p in phrases) / sr:.1f}s of audio, {cores} cores")
+
+    results = []
+    for workers in range(1, args.max_workers + 1):
+        threads = args.cpu_threads if args.cpu_threads is not None else max(1, cores // workers)
+        result = run(phrases, workers, threads, cfg, args)
+        result["speedup"] = result["throughput"] / results[0]["throughput"] if results else 1.0
+        results.append(result)
+        lat, hand = result["latency"], result["handoff"]
+        print(f"workers {workers:2d} x {threads:2d} threads: {result['throughput']:6.2f}x real time "
+              f"| speedup {result['speedup']:5.2f} | latency p50 {lat['p50']:7.0f}ms p95 {lat['p95']:7.0f}ms "
+              f"| handoff p50 {hand['p50']:5.2f}ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"commit": git_revision(), "stub": args.stub, "cores": cores, "runs": results}, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# End-of-speech → ASR hand-off latency on recorded audio: the old endpointing
+# (block energy gate, pause timer checked once per 0.5 s block) vs the
+# frame-level Endpointer at several block sizes.
+#
+# Audio time is simulated: a block "arrives" when its last sample would have
+# been captured, so latency = arrival of the block that closes the phrase +
+# processing time - end of the last speech frame. End of speech is taken from
+# a frame-level energy VAD pass over the whole file, the same for every method.
+#
+#   python -m benchmarks.endpoint_latency recordings/*.wav --profile config/default.yaml
+import argparse
+import glob
+import time
+
+import numpy as np
+import yaml
+
+from app.audio_io import read_audio
+from app.endpointer import make_endpointer
+from app.vad import AdaptiveEnergyVAD, energy_vad
+
+
+def load_audio(path, sr, pad_sec):
+    # Trailing silence so the last phrase can end
+    return np.concatenate((read_audio(path, sr), np.zeros(int(pad_sec * sr), dtype=np.float32)))
+
+
+def speech_ends(audio, vad_cfg, sr):
+    """Stream position just after every raw speech frame."""
+    vad = AdaptiveEnergyVAD(sample_rate=sr, frame_ms=vad_cfg.get("frame_ms", 30),
+                            min_gate=vad_cfg.get("energy_gate", 0.0005),
+                            snr_db=vad_cfg.get("snr_db", 9.0),
+                            floor_rise_sec=vad_cfg.get("floor_rise_sec", 10.0))
+    mask = vad.raw_mask(audio)
+    return (np.flatnonzero(mask) + 1) * vad.frame_len
+
+
+def last_speech_before(ends, start, pos):
+    i = np.searchsorted(ends, pos, side="right") - 1
+    if i >= 0 and ends[i] > start:
+        return int(ends[i])
+    return None
+
+
+def old_endpointing(audio, sr, block_sec, gate, pause_timeout, ends):
+    """The pre-Endpointer loop, with wall-clock time replaced by block arrival time."""
+    block_len = int(sr * block_sec)
+    latencies = []
+    active, start, last_voice = False, 0, 0.0
+    for pos in range(0, len(audio) - block_len + 1, block_len):
+        t0 = time.perf_counter()
+        block = audio[pos:pos + block_len]
+        arrival = (pos + block_len) / sr
+        if energy_vad(block, gate):
+            if not active:
+                active, start = True, pos
+            last_voice = arrival
+        elif active and arrival - last_voice >= pause_timeout:
+            active = False
+            end = last_speech_before(ends, start, pos + block_len)
+            if end is not None:
+                latencies.append(arrival + time.perf_counter() - t0 - end / sr)
+    return latencies
+
+
+def new_endpointing(audio, sr, block_sec, vad_cfg, ends):
+    block_len = int(sr * block_sec)
+    endpointer = make_endpointer(vad_cfg, sr, on_log=print)
+    latencies = []
+    for pos in range(0, len(audio) - block_len + 1, block_len):
+        t0 = time.perf_counter()
+        events = endpointer.push(audio[pos:pos + block_len])
+        spent = time.perf_counter() - t0
+        arrival = (pos + block_len) / sr
+        for ev in events:
+            if ev["type"] != "phrase":
+                continue
+            end = last_speech_before(ends, ev["start"], ev["detected"])
+            if end is not None:
+                latencies.append(arrival + spent - end / sr)
+    return latencies
+
+
+def report(name, latencies):
+    if not latencies:
+        print(f"{name:<24} no phrases")
+        return
+    ms = np.array(latencies) * 1e3
+    p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+    print(f"{name:<24} p50 {p50:7.0f}ms | p90 {p90:7.0f}ms | p99 {p99:7.0f}ms | "
+          f"max {ms.max():7.0f}ms | phrases={len(ms)}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("wavs", nargs="*", help="recordings (default: recordings/phrases/mic_phrase_*.wav, "
+                        "see python -m app.recorder --export)")
+    parser.add_argument("--profile", default="config/default.yaml")
+    parser.add_argument("--block-sizes", type=float, nargs="+", default=[0.5, 0.1, 0.03])
+    parser.add_argument("--pad", type=float, default=2.0, help="seconds of silence appended to each file")
+    args = parser.parse_args()
+
+    with open(args.profile, "r") as f:
+        cfg = yaml.safe_load(f)
+    sr = cfg["audio"]["sample_rate"]
+    vad_cfg = cfg["vad"]
+
+    paths = args.wavs or sorted(glob.glob("recordings/phrases/mic_phrase_*.wav"))
+    if not paths:
+        parser.error("no recordings given and none found in recordings/")
+
+    old, new = [], {b: [] for b in args.block_sizes}
+    for path in paths:
+        audio = load_audio(path, sr, args.pad)
+        ends = speech_ends(audio, vad_cfg, sr)
+        old += old_endpointing(audio, sr, 0.5, vad_cfg["energy_gate"], vad_cfg["pause_timeout"], ends)
+        for block_sec in args.block_sizes:
+            new[block_sec] += new_endpointing(audio, sr, block_sec, vad_cfg, ends)
+
+    print(f"{len(paths)} file(s), pause_timeout={vad_cfg['pause_timeout']}s")
+    report("before: 0.5s blocks", old)
+    for block_sec, latencies in new.items():
+        report(f"Endpointer {block_sec}s blocks", latencies)
+
+
+if __name__ == "__main__":
+    main()
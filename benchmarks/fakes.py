@@ -0,0 +1,177 @@
+# Deterministic stand-ins for Faster-Whisper, Argos and Piper, so the pipeline
+# can be benchmarked on any CPU box without models. Each fake sleeps for a
+# fixed cost model (per call + per second of audio / per character) and
+# returns text derived only from its input, so two runs on the same audio do
+# the same work.
+#
+# Only the model calls are faked: FakeASR runs the real ASR/ASRStream code
+# around FakeWhisperModel, FakeTranslator the real cache, idiom tagging and
+# sentence splitting around a fake Argos call.
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.asr import ASR
+from app.translate import Translator, get_idiom_matcher
+
+VOCAB = ("hello", "world", "how", "are", "you", "today", "thank", "very", "much",
+         "please", "again", "where", "is", "the", "station", "coffee", "good", "morning")
+
+
+class FakeWhisperModel:
+    """
+    WhisperModel.transcribe() look-alike. Every `word_sec` slot of audio
+    louder than `gate` becomes one word picked from VOCAB by the slot's
+    energy; segments hold up to `words_per_segment` words and each costs
+    `rtf` × its duration (plus `call_sec` once per call), paid lazily while
+    the caller iterates, like the real generator. With `spin` the cost is
+    burned on the CPU instead of slept, so several models compete for cores.
+    """
+
+    def __init__(self, rtf=0.15, call_sec=0.02, word_sec=0.4, words_per_segment=8, gate=0.01,
+                 sample_rate=16000, spin=False):
+        self.rtf = rtf
+        self.call_sec = call_sec
+        self.word_sec = word_sec
+        self.words_per_segment = words_per_segment
+        self.gate = gate
+        self.sample_rate = sample_rate
+        self.spin = spin
+        # One decode at a time, like a single CTranslate2 model on a busy CPU
+        self._lock = threading.Lock()
+
+    def _words(self, audio):
+        slot = int(self.word_sec * self.sample_rate)
+        words = []
+        for i in range(0, len(audio) - slot + 1, slot):
+            rms = float(np.sqrt(np.mean(audio[i:i + slot] ** 2)))
+            if rms >= self.gate:
+                t = i / self.sample_rate
+                words.append(SimpleNamespace(start=t, end=t + self.word_sec,
+                                             word=" " + VOCAB[int(rms * 1000) % len(VOCAB)]))
+        return words
+
+    def transcribe(self, audio, language=None, word_timestamps=False, **options):
+        audio = np.asarray(audio, dtype="float32").reshape(-1)
+        info = SimpleNamespace(language=language or "en", duration=len(audio) / self.sample_rate)
+        return self._segments(audio, word_timestamps), info
+
+    def _segments(self, audio, word_timestamps):
+        words = self._words(audio)
+        with self._lock:
+            self._cost(self.call_sec)
+        for i in range(0, len(words), self.words_per_segment):
+            group = words[i:i + self.words_per_segment]
+            start, end = group[0].start, group[-1].end
+            with self._lock:
+                self._cost(self.rtf * (end - start))
+            text = "".join(w.word for w in group)
+            if i + self.words_per_segment >= len(words):
+                text += "."
+            yield SimpleNamespace(start=start, end=end, text=text, avg_logprob=-0.2, no_speech_prob=0.01,
+                                  words=group if word_timestamps else None)
+
+
+    def _cost(self, sec):
+        if not self.spin:
+            time.sleep(sec)
+            return
+        # CPU time, not wall time: a model that shares its core takes longer, like a real decode
+        deadline = time.thread_time() + sec
+        while time.thread_time() < deadline:
+            pass
+
+
+class FakeASR(ASR):
+    """ASR session over a FakeWhisperModel instead of the shared Faster-Whisper model."""
+
+    def __init__(self, model=None, language=None, beam_size=5, temperature=0.0):
+        self.model = model or FakeWhisperModel()
+        self.language = language
+        self.beam_size = beam_size
+        self.temperature = temperature
+
+
+def make_fake_asr(rtf=0.15, sample_rate=16000, spin=False, language=None):
+    """FakeASR on its own FakeWhisperModel: an ASRPool worker factory (wrap it in functools.partial)."""
+    return FakeASR(FakeWhisperModel(rtf=rtf, sample_rate=sample_rate, spin=spin), language=language)
+
+
+class _FakeArgosTranslation:
+    def __init__(self, to_lang, call_sec, sec_per_char, lock):
+        self.to_lang = to_lang
+        self.call_sec = call_sec
+        self.sec_per_char = sec_per_char
+        self._lock = lock
+
+    def translate_many(self, texts):
+        with self._lock:
+            time.sleep(self.call_sec + self.sec_per_char * sum(len(t) for t in texts))
+        return [f"{self.to_lang}:{t}" for t in texts]
+
+    def translate(self, text):
+        return self.translate_many([text])[0]
+
+
+class FakeTranslator(Translator):
+    """Translator whose Argos call costs `call_sec` per model call plus `sec_per_char`."""
+
+    def __init__(self, from_lang, to_lang, call_sec=0.03, sec_per_char=0.0005):
+        self.from_lang = from_lang
+        self.to_lang = to_lang
+        self._translation = _FakeArgosTranslation(to_lang, call_sec, sec_per_char, threading.Lock())
+        self.matcher = get_idiom_matcher(from_lang, to_lang)
+
+    def _translate_many(self, texts, max_batch_size):
+        out = []
+        for i in range(0, len(texts), max_batch_size):
+            out += self._translation.translate_many(texts[i:i + max_batch_size])
+        return out
+
+
+class FakeTTSEngine:
+    """
+    TTSEngine look-alike. Synthesis costs `call_sec` + `rtf` × the audio it
+    produces (`chars_per_sec` of text per second of speech); play() takes
+    the audio's duration divided by `playback_speed` (0 = instant).
+    """
+
+    def __init__(self, rtf=0.05, call_sec=0.01, chars_per_sec=15.0, sample_rate=22050,
+                 playback_speed=1.0, max_voices=3):
+        self.rtf = rtf
+        self.call_sec = call_sec
+        self.chars_per_sec = chars_per_sec
+        self.sample_rate = sample_rate
+        self.playback_speed = playback_speed
+        self.max_voices = max_voices
+        self._voice = SimpleNamespace(config=SimpleNamespace(sample_rate=sample_rate))
+
+    def get_voice(self, voice_path, voice_config):
+        return self._voice
+
+    def loaded_voices(self):
+        return [None]
+
+    def synthesize(self, text, voice_path, voice_config):
+        if not text.strip():
+            return
+        duration = len(text) / self.chars_per_sec
+        time.sleep(self.call_sec + self.rtf * duration)
+        yield np.zeros(int(duration * self.sample_rate), dtype=np.int16)
+
+    def play(self, pcm, sample_rate, cancel_event=None):
+        if not self.playback_speed:
+            return False
+        deadline = time.perf_counter() + pcm.size / sample_rate / self.playback_speed
+        while True:
+            left = deadline - time.perf_counter()
+            if left <= 0:
+                return False
+            if cancel_event is not None and cancel_event.is_set():
+                return True
+            time.sleep(min(left, 0.1))
+
+    def close(self):
+        pass
@@ -0,0 +1,86 @@
+# Idiom tagging speed: the old per-call sort + str.find tagger vs the
+# precompiled IdiomMatcher, on the real idiom table and on synthetic large ones.
+#
+#   python -m benchmarks.idiom_matcher --sizes 78 1000 5000 20000
+import argparse
+import random
+import time
+
+from app.idiom_matcher import IdiomMatcher, normalize_quotes
+from app.idioms_loader import load_idiom_dict
+
+TEXTS = [
+    "It's raining cats and dogs so I should go inside.",
+    "Don't worry, that exam was a piece of cake and we are all in the same boat.",
+    "He was caught red-handed, and then all hell broke loose at the office.",
+    "Can you repeat that, please? I did not hear the last part of the sentence.",
+]
+
+
+# Old translate.py behavior, kept here as the reference
+def legacy_get_items(base: dict):
+    normalized = {}
+    for k, v in base.items():
+        normalized[normalize_quotes(k).lower()] = v
+    return sorted(normalized.items(), key=lambda kv: len(kv[0]), reverse=True)
+
+
+def legacy_tag(text: str, items):
+    new_text = normalize_quotes(text)
+    lower_text = new_text.lower()
+    for i, (idiom_norm, _idiom_trans) in enumerate(items):
+        idx = lower_text.find(idiom_norm)
+        if idx == -1:
+            continue
+        placeholder = f"__IDIOM_{i}__"
+        end = idx + len(idiom_norm)
+        new_text = new_text[:idx] + placeholder + new_text[end:]
+        lower_text = lower_text[:idx] + placeholder.lower() + lower_text[end:]
+    return new_text
+
+
+def make_table(base: dict, size: int, rng: random.Random):
+    """Real idioms padded with random 2-6 word phrases up to `size` entries."""
+    vocab = [f"w{n}" for n in range(5000)]
+    table = dict(base)
+    while len(table) < size:
+        phrase = " ".join(rng.choice(vocab) for _ in range(rng.randint(2, 6)))
+        table[phrase] = phrase.upper()
+    return table
+
+
+def time_per_call(fn, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for text in TEXTS:
+            fn(text)
+    return (time.perf_counter() - t0) / (repeat * len(TEXTS))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[78, 1000, 5000, 20000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    base = load_idiom_dict()["en_to_es"]
+
+    print(f"{'idioms':>8} | {'legacy/call':>12} | {'matcher/call':>12} | {'speedup':>8} | {'build':>8}")
+    for size in args.sizes:
+        table = make_table(base, size, rng)
+
+        # Legacy path re-normalized and re-sorted the table on every translate_text call
+        legacy = time_per_call(lambda t: legacy_tag(t, legacy_get_items(table)), args.repeat)
+
+        t0 = time.perf_counter()
+        matcher = IdiomMatcher(table)
+        build = time.perf_counter() - t0
+        compiled = time_per_call(matcher.tag, args.repeat)
+
+        print(f"{len(table):>8} | {legacy * 1e6:>10.1f}us | {compiled * 1e6:>10.1f}us | "
+              f"{legacy / compiled:>7.1f}x | {build * 1e3:>6.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+# End-to-end latency of the live pipeline: WAV files are replayed through
+# PipelineEngine (endpointer, ASR / MT / TTS workers, bounded queues) in place
+# of the microphone, and every phrase is timed from the end of its speech.
+#
+# --stub swaps Faster-Whisper, Argos and Piper for the deterministic fakes in
+# benchmarks/fakes.py, so the numbers measure the pipeline's own scheduling
+# on any CPU box; without it the profile's real models are used.
+#
+# Per phrase (all relative to when the phrase's last sample was captured):
+#   endpoint   speech end -> phrase queued for ASR
+#   asr        queued -> first ASR segment handed to MT
+#   asr_final  queued -> whole transcript
+#   mt         first ASR segment -> first translated sentence handed to TTS
+#   tts        first sentence handed to TTS -> first audio played
+#   ttfa       speech end -> first audio (time to first audio)
+# RTF is wall time (first block -> last phrase's first audio) / audio length.
+#
+#   python -m benchmarks.pipeline_latency --stub --json before.json        (synthetic fixture)
+#   python -m benchmarks.pipeline_latency recordings/*.wav --stub --speed 0 --json after.json
+#   python -m benchmarks.pipeline_latency --compare before.json after.json
+import argparse
+import glob
+import json
+import os
+import subprocess
+import threading
+import time
+
+import numpy as np
+import yaml
+
+from app.audio_io import read_audio
+from app.engine import PipelineEngine
+
+STAGES = ("endpoint", "asr", "asr_final", "mt", "tts", "ttfa")
+
+
+class ReplaySource:
+    """
+    Stands in for AudioIn: hands out `audio` block by block at `speed` ×
+    real time (0 = as fast as the capture loop asks), then silence in real
+    time until the engine stops. `done` is set once the audio is used up.
+    """
+
+    def __init__(self, audio, sample_rate, block_sec, speed=1.0):
+        self.audio = audio
+        self.sample_rate = sample_rate
+        self.block_len = int(sample_rate * block_sec)
+        self.speed = speed
+        self.pos = 0
+        self.arrivals = []      # wall time each block was handed out
+        self.done = threading.Event()
+        self._t0 = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def get_block(self):
+        if self._t0 is None:
+            self._t0 = time.perf_counter()
+        end = self.pos + self.block_len
+        block = self.audio[self.pos:end]
+        if len(block) < self.block_len:
+            block = np.concatenate((block, np.zeros(self.block_len - len(block), dtype=np.float32)))
+
+        if self.done.is_set():
+            time.sleep(self.block_len / self.sample_rate)
+        elif self.speed:
+            # The block is complete when its last sample would have been captured
+            wait = self._t0 + end / self.sample_rate / self.speed - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+
+        self.arrivals.append(time.perf_counter())
+        self.pos = end
+        if end >= len(self.audio):
+            self.done.set()
+        return block
+
+    @property
+    def start_time(self):
+        return self._t0
+
+    def capture_time(self, pos):
+        """Wall time at which stream position `pos` was captured."""
+        i = min(max(0, (pos - 1) // self.block_len), len(self.arrivals) - 1)
+        if not self.speed:
+            return self.arrivals[i]
+        return self.arrivals[i] - ((i + 1) * self.block_len - pos) / self.sample_rate / self.speed
+
+
+def synthetic_fixture(sr, seed=0, phrases=12):
+    """Speech-like bursts (harmonics under a syllable envelope) separated by quiet gaps."""
+    rng = np.random.default_rng(seed)
+    parts = []
+    for _ in range(phrases):
+        gap = rng.uniform(0.8, 2.0)
+        parts.append(rng.normal(0, 0.002, int(gap * sr)))
+        dur = rng.uniform(1.0, 4.0)
+        t = np.arange(int(dur * sr)) / sr
+        f0 = rng.uniform(110, 220)
+        voice = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 5))
+        envelope = 0.5 + 0.5 * np.sin(2 * np.pi * rng.uniform(3, 5) * t) ** 2
+        parts.append(0.1 * voice * envelope + rng.normal(0, 0.002, len(t)))
+    return np.concatenate(parts).astype(np.float32)
+
+
+class Timeline:
+    """Timestamps per phrase id, collected from the engine's queues and messages."""
+
+    def __init__(self):
+        self.marks = {}
+        self.bounds = {}     # phrase id -> (start, end) stream positions
+        self.texts = {}      # phrase id -> final transcript
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def mark(self, pid, name):
+        with self._lock:
+            self.marks.setdefault(pid, {}).setdefault(name, time.perf_counter())
+
+    def emit(self, msg):
+        kind = msg.get("type")
+        if kind == "final":
+            self.texts[msg["id"]] = msg["text"]
+            self.mark(msg["id"], "final")
+        elif kind == "translation":
+            self.mark(msg["id"], "translation")
+        elif kind == "log" and msg.get("phrase_id") is not None:
+            self.mark(msg["phrase_id"], "first_audio")
+        elif kind == "queue_depth":
+            self.dropped = msg["value"]["dropped"]
+
+    def attach(self, engine):
+        asr_put, mt_put, submit = engine.asr_q.put, engine.mt_q.put, engine.tts_worker.submit
+
+        def put_asr(item, *args, **kwargs):
+            self.bounds.setdefault(item["id"], (item["start"], item["start"] + len(item["pcm"])))
+            self.mark(item["id"], "queued")
+            return asr_put(item, *args, **kwargs)
+
+        def put_mt(item, *args, **kwargs):
+            if item["text"]:
+                self.mark(item["id"], "asr_first")
+            return mt_put(item, *args, **kwargs)
+
+        def submit_tts(text, *args, phrase_id=None, **kwargs):
+            if text:
+                self.mark(phrase_id, "mt_first")
+            return submit(text, *args, phrase_id=phrase_id, **kwargs)
+
+        engine.asr_q.put, engine.mt_q.put, engine.tts_worker.submit = put_asr, put_mt, submit_tts
+
+    def finished(self, speak):
+        """True when every queued phrase has gone all the way through."""
+        with self._lock:
+            marks = {pid: dict(m) for pid, m in self.marks.items()}
+        for pid, m in marks.items():
+            if "final" not in m:
+                return False
+            if self.texts.get(pid) and ("first_audio" if speak else "translation") not in m:
+                return False
+        return True
+
+    def latencies(self, source, speak):
+        """{stage: [seconds]} over the phrases that produced text, plus the last output time."""
+        out = {stage: [] for stage in STAGES}
+        last = None
+        for pid, m in sorted(self.marks.items()):
+            if pid not in self.bounds or not self.texts.get(pid):
+                continue
+            speech_end = source.capture_time(self.bounds[pid][1])
+            sentence = m.get("mt_first") if speak else m.get("translation")
+            audio = m.get("first_audio") if speak else None
+            spans = {
+                "endpoint": (speech_end, m.get("queued")),
+                "asr": (m.get("queued"), m.get("asr_first")),
+                "asr_final": (m.get("queued"), m.get("final")),
+                "mt": (m.get("asr_first"), sentence),
+                "tts": (sentence, audio),
+                "ttfa": (speech_end, audio),
+            }
+            for stage, (a, b) in spans.items():
+                if a is not None and b is not None:
+                    out[stage].append(b - a)
+            for t in (m.get("final"), sentence, audio):
+                if t is not None and (last is None or t > last):
+                    last = t
+        return out, last
+
+
+def run_fixture(name, audio, cfg, args, fakes):
+    sr = cfg["audio"]["sample_rate"]
+    # Trailing silence so the last phrase can end
+    pad = np.zeros(int((cfg["vad"]["pause_timeout"] + 1.0) * sr), dtype=np.float32)
+    source = ReplaySource(np.concatenate((audio, pad)), sr, cfg["audio"]["block_seconds"], speed=args.speed)
+    speak = cfg["tts"].get("enabled", True)
+
+    timeline = Timeline()
+    engine = PipelineEngine(cfg, timeline.emit, speak=speak, audio_source=source, **fakes)
+    timeline.attach(engine)
+
+    runner = threading.Thread(target=engine.run, name="capture", daemon=True)
+    runner.start()
+    source.done.wait()
+    deadline = time.perf_counter() + args.drain_timeout
+    while not timeline.finished(speak) and time.perf_counter() < deadline:
+        time.sleep(0.05)
+    engine.stop()
+    runner.join(timeout=5.0)
+
+    latencies, last = timeline.latencies(source, speak)
+    audio_sec = len(audio) / sr
+    wall = (last or time.perf_counter()) - source.start_time
+    print(f"{name}: {audio_sec:.1f}s audio, {len(latencies['asr_final'])} phrase(s), "
+          f"wall {wall:.1f}s, dropped {timeline.dropped}")
+    return {"name": name, "audio_sec": audio_sec, "wall_sec": wall, "rtf": wall / audio_sec,
+            "phrases": len(latencies["asr_final"]), "dropped": timeline.dropped}, latencies
+
+
+def summarize(values):
+    if not values:
+        return {"n": 0}
+    ms = np.array(values) * 1e3
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"n": len(ms), "mean": float(ms.mean()), "p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+
+def git_revision():
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True).stdout.strip()
+        return rev + ("-dirty" if dirty else "")
+    except Exception:
+        return None
+
+
+def stub_engines(cfg, args):
+    from benchmarks.fakes import FakeASR, FakeTranslator, FakeTTSEngine, FakeWhisperModel
+
+    sr = cfg["audio"]["sample_rate"]
+    return {
+        "asr": FakeASR(FakeWhisperModel(rtf=args.asr_rtf, sample_rate=sr), language=cfg["asr"]["language"]),
+        "translator": FakeTranslator(cfg["translate"]["from_lang"], cfg["translate"]["to_lang"],
+                                     call_sec=args.mt_call_ms / 1e3),
+        "tts_engine": FakeTTSEngine(rtf=args.tts_rtf, playback_speed=args.speed),
+    }
+
+
+def print_report(result):
+    print(f"\n{result['mode']} @ {result['commit'] or '?'}  speed {result['speed']}x  "
+          f"RTF {result['rtf']:.3f}  phrases {result['phrases']}  dropped {result['dropped']}")
+    for stage in STAGES:
+        s = result["stages"][stage]
+        if not s["n"]:
+            print(f"{stage:>10}: -")
+            continue
+        print(f"{stage:>10}: p50 {s['p50']:7.0f}ms | p95 {s['p95']:7.0f}ms | p99 {s['p99']:7.0f}ms | n={s['n']}")
+
+
+def compare(before_path, after_path):
+    with open(before_path, "r", encoding="utf-8") as f:
+        before = json.load(f)
+    with open(after_path, "r", encoding="utf-8") as f:
+        after = json.load(f)
+    print(f"{before['commit'] or before_path} -> {after['commit'] or after_path}")
+    for stage in STAGES:
+        a, b = before["stages"].get(stage, {}), after["stages"].get(stage, {})
+        cells = []
+        for p in ("p50", "p95", "p99"):
+            if p in a and p in b:
+                change = f"{(b[p] - a[p]) / a[p] * 100:+.0f}%" if a[p] else ""
+                cells.append(f"{p} {a[p]:6.0f} -> {b[p]:6.0f}ms {change:>5}")
+        print(f"{stage:>10}: " + (" | ".join(cells) or "-"))
+    print(f"{'rtf':>10}: {before['rtf']:.3f} -> {after['rtf']:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("wavs", nargs="*", help="recordings to replay (default: a synthetic fixture)")
+    parser.add_argument("--profile", default="config/default.yaml")
+    parser.add_argument("--stub", action="store_true", help="fake ASR/MT/TTS engines instead of real models")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed (x real time, 0 = unpaced)")
+    parser.add_argument("--no-tts", action="store_true", help="stop at translation")
+    parser.add_argument("--drain-timeout", type=float, default=30.0)
+    parser.add_argument("--json", default=None, help="write the results here")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two --json results")
+    # Stub cost model
+    parser.add_argument("--asr-rtf", type=float, default=0.15)
+    parser.add_argument("--mt-call-ms", type=float, default=30.0)
+    parser.add_argument("--tts-rtf", type=float, default=0.05)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    with open(args.profile, "r", encoding="utf-8") as f:
+        cfg = yaml.safe_load(f)
+    sr = cfg["audio"]["sample_rate"]
+    if args.no_tts:
+        cfg["tts"]["enabled"] = False
+    if not args.speed:
+        # Unpaced replay measures throughput: back-pressure the replay instead of dropping phrases
+        cfg.setdefault("pipeline", {})["overflow"] = "block"
+    # Memory-only translation cache: a persisted one would carry over between runs
+    cfg["translate"].setdefault("cache", {})["persist_path"] = None
+    if args.stub:
+        fakes = stub_engines(cfg, args)
+    else:
+        from app.config import cuda_available
+        if cfg["asr"]["device"] == "auto":
+            cfg["asr"]["device"] = "cuda" if cuda_available() else "cpu"
+        fakes = {}
+
+    wavs = [p for pattern in args.wavs for p in sorted(glob.glob(pattern))]
+    fixtures = [(os.path.basename(p), read_audio(p, sr)) for p in wavs] or [("synthetic", synthetic_fixture(sr))]
+
+    runs, stages = [], {stage: [] for stage in STAGES}
+    for name, audio in fixtures:
+        run, latencies = run_fixture(name, audio, cfg, args, fakes)
+        runs.append(run)
+        for stage, values in latencies.items():
+            stages[stage] += values
+
+    audio_sec = sum(r["audio_sec"] for r in runs)
+    result = {
+        "benchmark": "pipeline_latency",
+        "commit": git_revision(),
+        "mode": "stub" if args.stub else "real",
+        "profile": args.profile,
+        "speed": args.speed,
+        "stub_costs": {"asr_rtf": args.asr_rtf, "mt_call_ms": args.mt_call_ms, "tts_rtf": args.tts_rtf}
+        if args.stub else None,
+        "phrases": sum(r["phrases"] for r in runs),
+        "dropped": sum(r["dropped"] for r in runs),
+        "rtf": sum(r["wall_sec"] for r in runs) / audio_sec if audio_sec else None,
+        "stages": {stage: summarize(values) for stage, values in stages.items()},
+        "fixtures": runs,
+    }
+    print_report(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
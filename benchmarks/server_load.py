@@ -0,0 +1,215 @@
+# Load generator for app.server: N simulated clients replay WAV files over
+# WebSocket, paced like a live microphone, and every phrase is timed from the
+# moment its last sample was sent.
+#
+#   final        phrase's last sample sent -> transcript received
+#   translation  phrase's last sample sent -> translation received
+#   tts          phrase's last sample sent -> TTS audio received (with --tts)
+#
+# "lag" is how far each client's sending fell behind real time: with
+# server.overflow "block", that is the server pushing back on the client.
+# Throughput is seconds of audio served per wall-clock second, all clients together.
+#
+# --stub serves the deterministic fake engines from benchmarks/fakes.py in
+# this process (no models needed); otherwise start the server first:
+#
+#   python -m app.server &
+#   python -m benchmarks.server_load recordings/*.wav --clients 8
+#   python -m benchmarks.server_load --stub --clients 16 --json load16.json
+import argparse
+import asyncio
+import bisect
+import glob
+import json
+import time
+
+import numpy as np
+import yaml
+
+from app.audio_io import read_audio
+from benchmarks.pipeline_latency import summarize, git_revision, synthetic_fixture
+
+STAGES = ("final", "translation", "tts")
+
+
+async def connect(url, retries=50):
+    import websockets
+    for attempt in range(retries):
+        try:
+            return await websockets.connect(url, max_size=2 ** 22)
+        except OSError:
+            if attempt == retries - 1:
+                raise
+            await asyncio.sleep(0.1)
+
+
+async def run_client(idx, url, audio, sr, args, start_delay):
+    """Replay `audio` as one client; returns its per-phrase latencies and counters."""
+    await asyncio.sleep(start_delay)
+    ws = await connect(url)
+    result = {"client": idx, "latencies": {stage: [] for stage in STAGES},
+              "dropped": 0, "errors": [], "audio_sec": len(audio) / sr}
+    sent_pos, sent_at = [], []     # samples sent so far -> when
+
+    def latency(end_sec):
+        i = bisect.bisect_left(sent_pos, int(end_sec * sr))
+        return time.perf_counter() - sent_at[min(i, len(sent_at) - 1)]
+
+    async def receive():
+        async for message in ws:
+            if isinstance(message, bytes):
+                continue   # TTS audio that goes with the last "tts" message
+            msg = json.loads(message)
+            t = msg["type"]
+            if t in ("final", "translation") and msg.get("text"):
+                result["latencies"][t].append(latency(msg["end_sec"]))
+            elif t == "tts":
+                result["latencies"]["tts"].append(latency(tts_end[msg["id"]]))
+            elif t == "dropped":
+                result["dropped"] += 1
+            elif t == "error":
+                result["errors"].append(msg["text"])
+            elif t == "done":
+                return
+            if t == "translation":
+                tts_end[msg["id"]] = msg["end_sec"]
+
+    tts_end = {}
+    try:
+        ready = json.loads(await ws.recv())
+        await ws.send(json.dumps({"type": "start", "from": args.from_lang, "to": args.to_lang,
+                                  "tts": args.tts, "conversation": args.conversation}))
+        receiver = asyncio.create_task(receive())
+
+        chunk = int(sr * args.chunk_ms / 1000)
+        t0 = time.perf_counter()
+        for i, start in enumerate(range(0, len(audio), chunk)):
+            pcm = (np.clip(audio[start:start + chunk], -1.0, 1.0) * 32767).astype("<i2")
+            await ws.send(pcm.tobytes())
+            sent_pos.append(start + len(pcm))
+            sent_at.append(time.perf_counter())
+            if args.speed:
+                wait = t0 + (i + 1) * chunk / sr / args.speed - time.perf_counter()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+        result["lag_sec"] = max(0.0, time.perf_counter() - t0 - len(audio) / sr / (args.speed or float("inf")))
+        await ws.send(json.dumps({"type": "end"}))
+        await asyncio.wait_for(receiver, timeout=args.drain_timeout)
+        result["session"] = ready.get("session")
+    except Exception as e:
+        result["errors"].append(f"{type(e).__name__}: {e}")
+    finally:
+        await ws.close()
+    return result
+
+
+def stub_server(cfg, args):
+    from app.server import TranslationServer
+    from benchmarks.fakes import FakeASR, FakeTranslator, FakeTTSEngine, FakeWhisperModel
+
+    translators = {}
+
+    def translator_for(from_lang, to_lang):
+        if (from_lang, to_lang) not in translators:
+            translators[(from_lang, to_lang)] = FakeTranslator(from_lang, to_lang, call_sec=args.mt_call_ms / 1e3)
+        return translators[(from_lang, to_lang)]
+
+    sr = cfg["audio"]["sample_rate"]
+    return TranslationServer(cfg, asr=FakeASR(FakeWhisperModel(rtf=args.asr_rtf, sample_rate=sr)),
+                             translator_for=translator_for, tts_engine=FakeTTSEngine(rtf=args.tts_rtf))
+
+
+async def run(cfg, fixtures, args):
+    sr = cfg["audio"]["sample_rate"]
+    stop = server_task = None
+    if args.stub:
+        stop = asyncio.get_running_loop().create_future()
+        server_task = asyncio.create_task(stub_server(cfg, args).serve(stop))
+
+    rng = np.random.default_rng(0)
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(
+        run_client(i, args.url, fixtures[i % len(fixtures)], sr, args, rng.uniform(0, args.stagger))
+        for i in range(args.clients)))
+    wall = time.perf_counter() - t0
+
+    if server_task is not None:
+        stop.set_result(None)
+        await server_task
+    return results, wall
+
+
+def print_report(report):
+    print(f"\n{report['clients']} clients @ {report['commit'] or '?'}  speed {report['speed']}x  "
+          f"throughput {report['throughput']:.2f}x real time  phrases {report['phrases']}  "
+          f"dropped {report['dropped']}  errors {report['errors']}")
+    for stage in STAGES:
+        s = report["stages"][stage]
+        if not s["n"]:
+            print(f"{stage:>12}: -")
+            continue
+        print(f"{stage:>12}: p50 {s['p50']:7.0f}ms | p95 {s['p95']:7.0f}ms | p99 {s['p99']:7.0f}ms | n={s['n']}")
+    lag = report["lag"]
+    if lag["n"]:
+        print(f"{'lag':>12}: p50 {lag['p50']:7.0f}ms | max {lag['max']:7.0f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("wavs", nargs="*", help="recordings to replay (default: synthetic fixtures)")
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--url", default=None, help="server to load (default: the profile's server.host/port)")
+    parser.add_argument("--profile", default="config/default.yaml")
+    parser.add_argument("--from", dest="from_lang", default="en")
+    parser.add_argument("--to", dest="to_lang", default="es")
+    parser.add_argument("--tts", action="store_true", help="ask for TTS audio too")
+    parser.add_argument("--conversation", action="store_true")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed (x real time, 0 = unpaced)")
+    parser.add_argument("--chunk-ms", type=float, default=100.0, help="audio per WebSocket message")
+    parser.add_argument("--stagger", type=float, default=1.0, help="clients start at random times in this window")
+    parser.add_argument("--drain-timeout", type=float, default=60.0)
+    parser.add_argument("--json", default=None, help="write the results here")
+    # --stub: in-process server on the fake engines, with their cost model
+    parser.add_argument("--stub", action="store_true")
+    parser.add_argument("--asr-rtf", type=float, default=0.15)
+    parser.add_argument("--mt-call-ms", type=float, default=30.0)
+    parser.add_argument("--tts-rtf", type=float, default=0.05)
+    args = parser.parse_args()
+
+    with open(args.profile, "r", encoding="utf-8") as f:
+        cfg = yaml.safe_load(f)
+    cfg["translate"].setdefault("cache", {})["persist_path"] = None
+    server = cfg.get("server", {})
+    args.url = args.url or f"ws://{server.get('host', '127.0.0.1')}:{server.get('port', 8765)}"
+    sr = cfg["audio"]["sample_rate"]
+
+    wavs = [p for pattern in args.wavs for p in sorted(glob.glob(pattern))]
+    # Different synthetic audio per client, so phrases don't end in lockstep
+    fixtures = [read_audio(p, sr) for p in wavs] or [synthetic_fixture(sr, seed=i, phrases=8)
+                                                   for i in range(args.clients)]
+
+    results, wall = asyncio.run(run(cfg, fixtures, args))
+
+    stages = {stage: [v for r in results for v in r["latencies"][stage]] for stage in STAGES}
+    lags = [r["lag_sec"] for r in results if "lag_sec" in r]
+    report = {
+        "commit": git_revision(), "clients": args.clients, "speed": args.speed, "wall_sec": wall,
+        "throughput": sum(r["audio_sec"] for r in results) / wall,
+        "phrases": len(stages["final"]),
+        "dropped": sum(r["dropped"] for r in results),
+        "errors": sum(len(r["errors"]) for r in results),
+        "stages": {stage: summarize(values) for stage, values in stages.items()},
+        "lag": {**summarize(lags), "max": max(lags) * 1e3 if lags else 0.0},
+    }
+    print_report(report)
+    for r in results:
+        for error in r["errors"][:3]:
+            print(f"  client {r['client']}: {error}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
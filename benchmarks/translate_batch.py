@@ -0,0 +1,103 @@
+# Translation throughput (sentences/sec) against batch size on CPU, plus a
+# check that translate_batch() returns exactly what a translate() loop does,
+# on single sentences and on multi-sentence, multi-paragraph texts with
+# idioms. Exits non-zero if any output differs.
+#
+# Sentences are distinct, so every one reaches the model; --repeat makes a
+# share of them repeats and reports what answering those once saves, separately.
+#
+#   python -m benchmarks.translate_batch --from en --to es --sentences 256 --max-batch-size 64
+import os
+
+# Argos reads the device from the environment at import time
+os.environ.setdefault("ARGOS_DEVICE_TYPE", "cpu")
+
+import argparse
+import random
+import sys
+import time
+
+from app import translate as tr
+
+WORDS = (
+    "the a my your this that house car friend meeting weather train office city "
+    "is was will be can should go come see make take find tell leave open "
+    "today tomorrow later again quickly slowly near far very really"
+).split()
+
+# Several sentences per text, paragraph breaks, idioms
+MULTI_SENTENCE = [
+    "It's raining cats and dogs. We should stay inside today! Do you agree?",
+    "The exam was a piece of cake.\nThen all hell broke loose at the office. Nobody knew why.",
+    "Can you repeat that, please? I did not hear the last part. Thank you.",
+    "Dr. Smith arrived at 5 p.m. and left early… The meeting went on without him.",
+]
+
+
+def make_sentences(n, rng):
+    out = set()
+    while len(out) < n:
+        words = [rng.choice(WORDS) for _ in range(rng.randint(4, 14))]
+        out.add(" ".join(words).capitalize() + ".")
+    return sorted(out, key=lambda s: rng.random())
+
+
+def batch_sizes(largest):
+    size = 1
+    while size < largest:
+        yield size
+        size *= 2
+    yield largest
+
+
+def timed(fn, n):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, n / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--from", dest="from_lang", default="en")
+    parser.add_argument("--to", dest="to_lang", default="es")
+    parser.add_argument("--sentences", type=int, default=128)
+    parser.add_argument("--max-batch-size", type=int, default=64, help="sweep 1, 2, 4, … up to this")
+    parser.add_argument("--repeat", type=float, default=0.0,
+                        help="also time input where this share of sentences repeats an earlier one")
+    args = parser.parse_args()
+
+    # Every call must reach the model
+    tr.configure_cache(max_entries=0)
+    translator = tr.Translator(args.from_lang, args.to_lang)
+    rng = random.Random(0)
+    sentences = make_sentences(args.sentences, rng)
+    translator.translate_batch(sentences[:1])  # load the model and check the batched path
+
+    reference, rate = timed(lambda: [translator.translate(s) for s in sentences], len(sentences))
+    multi_reference = [translator.translate(t) for t in MULTI_SENTENCE]
+    print(f"{'loop':>10}: {rate:8.1f} sentences/s")
+
+    different = 0
+    for size in batch_sizes(args.max_batch_size):
+        out, rate = timed(lambda: translator.translate_batch(sentences, max_batch_size=size), len(sentences))
+        multi = translator.translate_batch(MULTI_SENTENCE, max_batch_size=size)
+        same = out == reference and multi == multi_reference
+        different += not same
+        print(f"{'batch ' + str(size):>10}: {rate:8.1f} sentences/s "
+              f"({'identical' if same else 'DIFFERENT from loop'})")
+
+    if args.repeat > 0:
+        repeated = list(sentences)
+        for i in range(1, len(repeated)):
+            if rng.random() < args.repeat:
+                repeated[i] = rng.choice(repeated[:i])
+        _, loop_rate = timed(lambda: [translator.translate(s) for s in repeated], len(repeated))
+        _, batch_rate = timed(lambda: translator.translate_batch(repeated, max_batch_size=args.max_batch_size),
+                              len(repeated))
+        print(f"\nwith {args.repeat:.0%} repeats: loop {loop_rate:8.1f} | batch {args.max_batch_size} "
+              f"{batch_rate:8.1f} sentences/s (repeats translated once)")
+    sys.exit(1 if different else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# Per-call translation overhead: the old path (ensure_pack + argostranslate's
+# translate(), which rescans packages and languages every call) vs a Translator
+# resolved once. The translation cache is disabled so every call hits Argos.
+#
+#   python -m benchmarks.translate_overhead --from en --to es --runs 20
+import argparse
+import statistics
+import time
+
+from argostranslate import translate as T
+
+from app import translate as tr
+
+SENTENCES = [
+    "Hello, how are you?",
+    "Can you repeat that, please?",
+    "I think it's going to rain this afternoon.",
+    "Thank you very much for your help.",
+]
+
+
+def per_call(fn, runs):
+    times = []
+    for _ in range(runs):
+        for s in SENTENCES:
+            t0 = time.perf_counter()
+            fn(s)
+            times.append(time.perf_counter() - t0)
+    return times
+
+
+def report(name, times):
+    print(f"{name:<28} mean {statistics.mean(times) * 1e3:8.2f}ms | "
+          f"median {statistics.median(times) * 1e3:8.2f}ms | n={len(times)}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--from", dest="from_lang", default="en")
+    parser.add_argument("--to", dest="to_lang", default="es")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+    src, tgt = args.from_lang, args.to_lang
+
+    tr.configure_cache(max_entries=0)
+    translator = tr.Translator(src, tgt)
+    # Load the CTranslate2 model before timing anything
+    translator.translate(SENTENCES[0])
+
+    # Lookup work alone, without any model inference
+    report("ensure_pack()", per_call(lambda s: tr.ensure_pack(src, tgt), args.runs))
+    report("get_translation_from_codes()", per_call(lambda s: T.get_translation_from_codes(src, tgt), args.runs))
+
+    # Full calls
+    def old_path(s):
+        tr.ensure_pack(src, tgt)
+        return T.translate(translator.matcher.tag(s) if translator.matcher else s, src, tgt)
+
+    old = per_call(old_path, args.runs)
+    new = per_call(translator.translate, args.runs)
+    report("before: per-call lookups", old)
+    report("after: Translator", new)
+    print(f"saved per call: {(statistics.mean(old) - statistics.mean(new)) * 1e3:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
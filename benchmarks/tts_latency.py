@@ -0,0 +1,66 @@
+# Time-to-first-audio for Piper TTS: cold (load voice + open stream per phrase,
+# the old speak() behavior) vs warm (one long-lived TTSEngine).
+#
+#   python -m benchmarks.tts_latency --profile config/default.yaml --runs 5
+import argparse
+import statistics
+
+import yaml
+
+from app.tts import TTSEngine
+
+PHRASES = [
+    "Hello, how are you today?",
+    "Can you repeat that, please?",
+    "Thank you very much for your help.",
+]
+
+
+def summarize(name, values):
+    values = [v for v in values if v is not None]
+    if not values:
+        print(f"{name:>6}: no audio produced")
+        return
+    print(f"{name:>6}: mean {statistics.mean(values):.3f}s | "
+          f"min {min(values):.3f}s | max {max(values):.3f}s | n={len(values)}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--profile", default="config/default.yaml")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    with open(args.profile, "r", encoding="utf-8") as f:
+        cfg = yaml.safe_load(f)
+    voice_path = cfg["tts"]["voice_path"]
+    voice_cfg = cfg["tts"]["voice_config"]
+
+    # Before: every phrase pays voice load + device open
+    cold = []
+    for _ in range(args.runs):
+        for text in PHRASES:
+            engine = TTSEngine()
+            try:
+                cold.append(engine.speak(text, voice_path, voice_cfg)["first_audio_sec"])
+            finally:
+                engine.close()
+
+    # After: one engine for the whole run (first phrase warms it up)
+    warm = []
+    engine = TTSEngine()
+    try:
+        engine.speak(PHRASES[0], voice_path, voice_cfg)
+        for _ in range(args.runs):
+            for text in PHRASES:
+                warm.append(engine.speak(text, voice_path, voice_cfg)["first_audio_sec"])
+    finally:
+        engine.close()
+
+    print("Time to first audio per phrase:")
+    summarize("cold", cold)
+    summarize("warm", warm)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 # test.py (one level above app/)
-from app.translate import translate_text, _get_idiom_items, _tag_idioms_with_items
+from app.translate import translate_text, get_idiom_matcher
 
 sentences = [
     "It's raining cats and dogs",
@@ -8,15 +8,15 @@ sentences = [
     "I should go inside because it's raining cats and dogs."
 ]
 
-# Get idiom items for EN->ES
-items = _get_idiom_items("en", "es")
-print("idioms loaded:", len(items))
+# Get idiom matcher for EN->ES
+matcher = get_idiom_matcher("en", "es")
+print("idioms loaded:", len(matcher))
 
 for s in sentences:
     print("\n---")
     print("INPUT :", repr(s))
 
-    tagged = _tag_idioms_with_items(s, items)
+    tagged = matcher.tag(s)
     print("TAGGED:", tagged)
 
     final = translate_text(s, "en", "es")
@@ -0,0 +1,52 @@
+# test_conversation.py (one level above app/)
+# Conversation-mode routing check (app/conversation.py): replays sequences of
+# language-detection results through LanguageRouter and checks the language
+# each phrase is routed as. Runs under pytest, or as a script that exits
+# non-zero on a mismatch:
+#
+#   python test_conversation.py
+import sys
+
+from app.conversation import LanguageRouter
+
+# (name, [(probs, continued)], expected languages)
+CASES = [
+    # Two people taking turns; the Spanish speaker's detections are less sure
+    ("alternating turns",
+     [({"en": 0.95}, False), ({"es": 0.70}, False), ({"en": 0.90}, False),
+      ({"es": 0.75}, False), ({"en": 0.90}, False), ({"es": 0.79}, False)],
+     ["en", "es", "en", "es", "en", "es"]),
+    # A long Spanish utterance cut twice; the cut pieces' prefixes lean English
+    ("forced cuts stay sticky",
+     [({"es": 0.85}, False), ({"en": 0.60, "es": 0.30}, True), ({"en": 0.90}, True),
+      ({"en": 0.92}, False)],
+     ["es", "es", "es", "en"]),
+    # Detection failed (no probabilities): keep the last language
+    ("no detection",
+     [({"es": 0.80}, False), ({}, False), ({"fr": 0.90}, False)],
+     ["es", "es", "es"]),
+]
+
+
+def route_all(phrases):
+    router = LanguageRouter(["en", "es"])
+    return [router.route(probs, continued=continued) for probs, continued in phrases]
+
+
+def test_routing():
+    for name, phrases, expected in CASES:
+        assert route_all(phrases) == expected, name
+
+
+def main():
+    failed = 0
+    for name, phrases, expected in CASES:
+        got = route_all(phrases)
+        ok = got == expected
+        failed += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {name}: {' '.join(got)}" + ("" if ok else f" (expected {' '.join(expected)})"))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()